@@ -1,69 +1,335 @@
-from fastapi import APIRouter, HTTPException
-from app.services.patient_service import PatientService
-from app.services.ai_service import AIService
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import List, Optional
+from app.services.patient_service import PatientService, LIST_FIELDS
+from app.services.ai_service import AIService, AI_COMBINED_GENERATION
+from app.services.ai_cache import ai_cache
+from app.services.model_health import Deadline, model_breaker
+from app.services.pregeneration import pregenerator
+from app.services.prompt_builder import token_usage
+from app.services.section_sync import SYNC_HEARTBEAT_INTERVAL, SYNC_POLL_INTERVAL, section_hashes, section_tracker
+from app.utils.serialization import FastJSONResponse, dumps
+from app.utils.telemetry import render_metrics
 import asyncio
+import hashlib
+import pandas as pd
 
 router = APIRouter()
 patient_service = PatientService()
 
-@APIRouter.get(router, "/getMinimalPatientInfo")
-async def get_minimal_patient_info():
-    # Reuse old logic slightly modified or just load data and return minimal
-    # For now, let's keep it simple as user focused on Page 2
-    from app.utils.data_loader import load_data
-    df = load_data()
-    # Minimal fields for list
-    patients = []
-    for _, row in df.iterrows():
-        # Quick logic matching old format
-        patients.append({
-            "uid": str(row.get('Patient_ID', '')),
-            "name": str(row.get('Name', '')),
-            "age": int(row.get('Age', 0)),
-            "sex": str(row.get('Sex', '')),
-            "primary_cancer_type": str(row.get('Primary_Diagnosis', '')),
-            "disease_status": str(row.get('Response', 'unknown')) # Simplified
-        })
-    return patients
+def _etag(*parts):
+    return '"' + hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:20] + '"'
+
+def _not_modified(request, etag):
+    # If-None-Match may list several tags, weak (W/) or "*"
+    header = request.headers.get("if-none-match")
+    if not etag or not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
 
 @router.get("/getMinimalPatientInfo")
-async def get_minimal_info():
-    # Redundant definition fix
-    from app.utils.data_loader import load_data
-    df = load_data()
-    patients = []
-    for _, row in df.iterrows():
-        patients.append({
-            "uid": str(row.get('Patient_ID', '')),
-            "name": str(row.get('Name', '')),
-            "age": int(row.get('Age', 0)),
-            "sex": str(row.get('Sex', '')),
-            "primary_cancer_type": str(row.get('Primary_Diagnosis', '')),
-            "disease_status": str(row.get('Response', 'Unknown'))
-        })
-    return patients
+async def get_minimal_info(
+    request: Request,
+    search: Optional[str] = None,
+    sort_by: Optional[str] = Query(None, pattern="^(" + "|".join(LIST_FIELDS) + ")$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+):
+    # The page depends only on the dataset content and the query
+    etag = _etag(patient_service.dataset_fingerprint(), request.url.query)
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
 
-@router.get("/getFullPatientDetails")
-async def get_full_patient_details(name: str):
-    data = patient_service.get_patient_details(name)
-    if not data:
+    # Body stays a plain list for existing clients; the match count is sent as a header
+    total, patients = patient_service.get_patient_list(
+        search=search, sort_by=sort_by, order=order, limit=limit, offset=offset
+    )
+    # Returned as a response so FastAPI does not walk the page through jsonable_encoder first
+    return FastJSONResponse(patients, headers={"X-Total-Count": str(total), "ETag": etag})
+
+async def _lookup_patient(name, uid):
+    # `uid` is the Patient_ID returned by /getMinimalPatientInfo
+    if name is None and uid is None:
+        raise HTTPException(status_code=400, detail="Provide either name or uid")
+    # In a thread: the first lookup after a new dataset version builds every document
+    details = await asyncio.to_thread(patient_service.get_patient_details, name=name, uid=uid)
+    if details is None:
         raise HTTPException(status_code=404, detail="Patient not found")
-    
+    return details
+
+def _details_etag(row_hash, raw_data):
+    """
+    Tag of a full details response: the patient row plus the cached AI entries it embeds.
+    Entry creation times are part of the tag, so output regenerated for the same input (after
+    invalidation or TTL expiry) gets a new one.
+    None while either AI part is uncached, since the response then carries a fallback that is not kept.
+    """
+    keys = [AIService.insight_cache_key(raw_data), AIService.alert_cache_key(raw_data)]
+    created = [ai_cache.created_at(key) for key in keys]
+    if None in created:
+        return None
+    return _etag(row_hash, *keys, *created)
+
+@router.get("/getFullPatientDetails")
+async def get_full_patient_details(request: Request, name: str = None, uid: str = None, since: Optional[str] = None):
+    """
+    The patient's dashboard document. X-Patient-Version identifies its content; polling clients pass it
+    back as `since` and get {"version", "since", "full", "sections"} with only the sections that changed.
+    """
+    details = await _lookup_patient(name, uid)
+
     # Extract Raw Data for AI
-    raw_data = data.pop('raw_data', {})
-    
-    # Generate Cross-Domain Insights (real call)
-    ai_insights_task = AIService.generate_cross_domain_insight(raw_data)
-    ai_alerts_task = AIService.generate_clinical_alert_insights(raw_data)
-    
-    ai_insights = ai_insights_task
-    ai_alerts = ai_alerts_task
-    
-    # Attach to response
-    data['cross_domain_insights'] = ai_insights
-    if 'header' in data:
-        data['header']['ai_generated_alerts'] = ai_alerts
-        # Clear old rule-based alerts to prioritize AI ones if frontend uses them
-        # Or let frontend decide. I'll add the new field.
-    
-    return data
+    raw_data = details.raw_data()
+
+    # Answer revalidations before touching the AI path or serializing anything
+    etag = _details_etag(details.row_hash, raw_data)
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    # Generate Cross-Domain Insights and AI alerts concurrently, off the event loop
+    ai_insights, ai_alerts = await AIService.agenerate_all(raw_data)
+
+    # Attach to response; the shared record is copied, not changed
+    record = details.record.with_ai(ai_insights, ai_alerts)
+
+    if since:
+        delta = section_tracker.delta(record, since)
+        return FastJSONResponse(delta, headers={"X-Patient-Version": delta["version"]})
+
+    headers = {"X-Patient-Version": section_tracker.remember(section_hashes(record))}
+    # The AI output may have just been cached
+    etag = etag or _details_etag(details.row_hash, raw_data)
+    if etag:
+        headers["ETag"] = etag
+    return FastJSONResponse(record, headers=headers)
+
+class BulkPatientRequest(BaseModel):
+    names: List[str] = []
+    uids: List[str] = []
+    include_ai: bool = False
+
+async def _with_ai(details, include_ai):
+    # Optionally attach AI output (cache first, then generation); the raw row is only built for that
+    if not include_ai:
+        return details.record
+    return details.record.with_ai(*await AIService.agenerate_all(details.raw_data()))
+
+def _ndjson(payload):
+    return dumps(payload) + b"\n"
+
+@router.post("/getBulkPatientDetails")
+async def get_bulk_patient_details(request: BulkPatientRequest):
+    """
+    Patient details for a list of names and/or uids, streamed as NDJSON (one line per requested key):
+    {"key": ..., "uid": ..., "document": ...}, or {"key": ..., "error": "Patient not found"} for unknown keys.
+    """
+    async def lines():
+        snapshot = await asyncio.to_thread(patient_service.prepared_snapshot)
+        for key, details in patient_service.iter_patient_details(request.names, request.uids, snapshot=snapshot):
+            if details is None:
+                yield _ndjson({"key": key, "error": "Patient not found"})
+            else:
+                yield _ndjson({"key": key, "uid": details.uid, "document": await _with_ai(details, request.include_ai)})
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.get("/exportPatients")
+async def export_patients(include_ai: bool = False):
+    # Every patient as {"uid": ..., "document": ...} NDJSON lines, generated one row at a time so memory stays flat
+    async def lines():
+        snapshot = await asyncio.to_thread(patient_service.prepared_snapshot)
+        for details in patient_service.iter_all_patient_details(snapshot=snapshot):
+            yield _ndjson({"uid": details.uid, "document": await _with_ai(details, include_ai)})
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="patients.ndjson"'},
+    )
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {dumps(payload).decode('utf-8')}\n\n"
+
+@router.get("/streamFullPatientDetails")
+async def stream_full_patient_details(name: str = None, uid: str = None):
+    """
+    Server-Sent Events variant of /getFullPatientDetails.
+    Events: `sections` (everything deterministic, sent immediately), then
+    `cross_domain_insights` and `ai_generated_alerts` as each generation finishes, then `done`.
+    """
+    details = await _lookup_patient(name, uid)
+    raw_data = details.raw_data()
+
+    async def events():
+        yield _sse("sections", details.record)
+
+        deadline = Deadline()
+        if AI_COMBINED_GENERATION:
+            # One generation produces both; they are sent together when it finishes
+            tasks = {
+                asyncio.ensure_future(AIService.agenerate_all(raw_data, deadline)): ("cross_domain_insights", "ai_generated_alerts"),
+            }
+        else:
+            tasks = {
+                asyncio.ensure_future(AIService.agenerate_cross_domain_insight(raw_data, deadline)): ("cross_domain_insights",),
+                asyncio.ensure_future(AIService.agenerate_clinical_alert_insights(raw_data, deadline)): ("ai_generated_alerts",),
+            }
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    names = tasks[task]
+                    results = task.result() if len(names) > 1 else (task.result(),)
+                    for event, result in zip(names, results):
+                        yield _sse(event, result)
+            yield _sse("done", {})
+        finally:
+            # Client went away - don't keep queued generations around
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/subscribePatientDetails")
+async def subscribe_patient_details(name: str = None, uid: str = None, since: Optional[str] = None):
+    """
+    Server-Sent Events for dashboards left open: a `delta` event (same shape as
+    /getFullPatientDetails?since=) on connect, then one whenever a new dataset version changes
+    any of the patient's sections. `removed` is sent, and the stream ends, if the patient disappears.
+    """
+    await _lookup_patient(name, uid)
+
+    async def events():
+        version = since
+        fingerprint = None
+        first = True
+        last_sent = 0.0
+        loop = asyncio.get_running_loop()
+        while True:
+            # Reading the snapshot also picks up a changed source, as any request would
+            current = await asyncio.to_thread(patient_service.dataset_fingerprint)
+            if current != fingerprint:
+                fingerprint = current
+                details = await asyncio.to_thread(patient_service.get_patient_details, name=name, uid=uid)
+                if details is None:
+                    yield _sse("removed", {"since": version})
+                    return
+                record = details.record.with_ai(*await AIService.agenerate_all(details.raw_data()))
+                delta = section_tracker.delta(record, version)
+                # The first event always goes out, so the client learns its version is current
+                if delta["sections"] or first:
+                    yield _sse("delta", delta)
+                    last_sent = loop.time()
+                version = delta["version"]
+                first = False
+            if loop.time() - last_sent >= SYNC_HEARTBEAT_INTERVAL:
+                # Comment line: keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                last_sent = loop.time()
+            await asyncio.sleep(SYNC_POLL_INTERVAL)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/getAICacheStats")
+async def get_ai_cache_stats():
+    # Hit/miss counters for sizing AI_CACHE_MAX_ENTRIES / AI_CACHE_TTL
+    return ai_cache.get_stats()
+
+@router.post("/invalidateAICache")
+async def invalidate_ai_cache(uid: Optional[str] = None):
+    # Drop cached generations for one patient, or everything if no uid is given
+    if uid is None:
+        ai_cache.clear()
+        return {"invalidated": "all"}
+    return {"invalidated": ai_cache.invalidate_patient(uid)}
+
+@router.get("/getTokenUsage")
+async def get_token_usage():
+    # Prompt/response token counts per generation kind, from Gemini usage metadata
+    return token_usage.get_stats()
+
+@router.get("/metrics")
+async def metrics():
+    # Prometheus text format: request, stage and model-attempt latency histograms
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@router.get("/getModelHealth")
+async def get_model_health():
+    # Circuit breaker state per Gemini model (open models are skipped until their cool-down ends)
+    return model_breaker.get_status()
+
+@router.get("/getPregenerationStatus")
+async def get_pregeneration_status():
+    # Progress of the background AI pre-generation job (AI_PREGENERATE=1)
+    return pregenerator.status
+
+@router.get("/cohort")
+async def get_cohort(
+    metastatic_status: List[str] = Query([]),
+    new_lesions: List[str] = Query([]),
+    response: List[str] = Query([]),
+    recist: List[str] = Query([]),
+    primary_diagnosis: List[str] = Query([]),
+    renal_flag: List[str] = Query([]),
+    liver_flag: List[str] = Query([]),
+    egfr: List[str] = Query([]),
+    alk: List[str] = Query([]),
+    ros1: List[str] = Query([]),
+    kras: List[str] = Query([]),
+    braf: List[str] = Query([]),
+    met_exon14: List[str] = Query([]),
+    ret: List[str] = Query([]),
+    her2: List[str] = Query([]),
+    ntrk: List[str] = Query([]),
+    ecog_min: Optional[int] = Query(None, ge=0, le=5),
+    ecog_max: Optional[int] = Query(None, ge=0, le=5),
+    limit: int = Query(100, ge=1, le=10000),
+    offset: int = Query(0, ge=0),
+):
+    """
+    Cohort slice, e.g. /cohort?metastatic_status=yes&egfr=positive&ecog_min=2&response=PD.
+    Repeat a parameter to OR values (response=PD&response=SD); different parameters are ANDed.
+    Mutation fields also accept "positive" / "negative". Values are case-insensitive.
+    """
+    filters = {
+        "metastatic_status": metastatic_status, "new_lesions": new_lesions, "response": response,
+        "recist": recist, "primary_diagnosis": primary_diagnosis, "renal_flag": renal_flag,
+        "liver_flag": liver_flag, "egfr": egfr, "alk": alk, "ros1": ros1, "kras": kras, "braf": braf,
+        "met_exon14": met_exon14, "ret": ret, "her2": her2, "ntrk": ntrk,
+    }
+    return patient_service.query_cohort(filters, ecog_min=ecog_min, ecog_max=ecog_max, limit=limit, offset=offset)
+
+@router.get("/getAlertSummary")
+async def get_alert_summary():
+    # Rule-based alert counts across the cohort (by rule, category and level)
+    return patient_service.get_alert_summary()
+
+@router.get("/getLabValues")
+async def get_lab_values(
+    label: Optional[str] = None,
+    panel: Optional[str] = Query(None, pattern="^(cbc|cmp|electrolytes)$"),
+    limit: int = Query(100, ge=1, le=10000),
+    offset: int = Query(0, ge=0),
+):
+    # Cohort-level lab query, e.g. every patient's Hb, from the parsed lab table
+    labs = patient_service.get_lab_values(label=label, panel=panel)
+    page = labs.iloc[offset:offset + limit]
+    return {
+        "total": len(labs),
+        "values": [
+            {"uid": uid, "panel": p, "label": l, "value": None if pd.isna(v) else float(v), "raw": raw}
+            for uid, p, l, v, raw in zip(page["patient_id"], page["panel"], page["label"], page["value"], page["raw"])
+        ],
+    }
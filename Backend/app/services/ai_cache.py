@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# On-disk tier lives next to the dataset so it survives restarts
+AI_CACHE_PATH = os.getenv("AI_CACHE_PATH", os.path.join(os.getcwd(), "data/ai_cache.sqlite"))
+# Seconds before a generation is considered stale (default 7 days)
+AI_CACHE_TTL = float(os.getenv("AI_CACHE_TTL", str(7 * 24 * 3600)))
+# Entries kept in the in-memory LRU tier
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "512"))
+
+
+def hash_fields(fields):
+    """
+    Stable hash of the patient fields a prompt is built from.
+    NaN/None and numpy scalars are normalised through str() so equal rows hash equally.
+    """
+    payload = json.dumps(fields, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AICache:
+    """
+    Two-tier cache for LLM outputs.
+    Keys are content-addressed: kind + prompt/model version + hash of the patient fields,
+    so a changed row simply misses. Old entries for that patient are dropped on the next write.
+    """
+
+    def __init__(self, path=AI_CACHE_PATH, ttl=AI_CACHE_TTL, max_entries=AI_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expired": 0,
+            "invalidated": 0,
+        }
+
+    def _conn(self):
+        # Opened lazily so importing the module never touches the filesystem
+        if self._db is None and self.path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._db = sqlite3.connect(self.path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS ai_cache ("
+                    "key TEXT PRIMARY KEY, kind TEXT, patient_id TEXT, fields_hash TEXT, "
+                    "value TEXT, created_at REAL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS ai_cache_patient ON ai_cache (patient_id, kind)")
+                self._db.commit()
+            except Exception as e:
+                logger.warning("AI cache disk tier unavailable (memory only).", extra={"path": self.path, "error": str(e)})
+                self.path = None
+                self._db = None
+        return self._db
+
+    @staticmethod
+    def make_key(kind, version, fields):
+        return f"{kind}:{version}:{hash_fields(fields)}"
+
+    def _remember(self, key, value, created_at):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get(self, key):
+        now = time.time()
+        expired = False
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+                expired = True
+
+            db = self._conn()
+            if db is not None:
+                row = db.execute("SELECT value, created_at FROM ai_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    value, created_at = json.loads(row[0]), row[1]
+                    if now - created_at <= self.ttl:
+                        self._remember(key, value, created_at)
+                        self.stats["disk_hits"] += 1
+                        return value
+                    db.execute("DELETE FROM ai_cache WHERE key = ?", (key,))
+                    db.commit()
+                    expired = True
+
+            # Counted once, whether the entry expired in one tier or both
+            if expired:
+                self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, key, value, patient_id=None):
+        parts = key.split(":")
+        kind, fields_hash = parts[0], parts[-1]
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self.stats["sets"] += 1
+            db = self._conn()
+            if db is not None:
+                if patient_id is not None:
+                    # The patient's row changed since these were generated - they can never hit again
+                    stale = db.execute(
+                        "DELETE FROM ai_cache WHERE patient_id = ? AND kind = ? AND fields_hash != ?",
+                        (str(patient_id), kind, fields_hash),
+                    ).rowcount
+                    self.stats["invalidated"] += max(stale, 0)
+                db.execute(
+                    "INSERT OR REPLACE INTO ai_cache (key, kind, patient_id, fields_hash, value, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, kind, None if patient_id is None else str(patient_id), fields_hash, json.dumps(value), now),
+                )
+                db.commit()
+
+    def contains(self, key):
+        """Existence check that does not touch hit/miss counters or LRU order."""
+        return self.created_at(key) is not None
+
+    def created_at(self, key):
+        """
+        When the live entry for `key` was generated (None if absent or expired), without touching counters or LRU order.
+        Keys are content-addressed on the input, so this is what tells a regenerated entry from the old one.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] <= self.ttl:
+                return entry[1]
+            db = self._conn()
+            if db is None:
+                return None
+            row = db.execute("SELECT created_at FROM ai_cache WHERE key = ?", (key,)).fetchone()
+            return row[0] if row is not None and now - row[0] <= self.ttl else None
+
+    def known_patients(self, kind):
+        """Patient ids with at least one persisted generation of `kind` (current or stale)."""
+        with self._lock:
+            db = self._conn()
+            if db is None:
+                return set()
+            rows = db.execute("SELECT DISTINCT patient_id FROM ai_cache WHERE kind = ? AND patient_id IS NOT NULL", (kind,))
+            return {row[0] for row in rows}
+
+    def invalidate_patient(self, patient_id):
+        """Drops every cached generation for one patient. Returns the number of disk entries removed."""
+        with self._lock:
+            # Memory keys carry no patient id, so the memory tier is cleared wholesale
+            self._memory.clear()
+            removed = 0
+            db = self._conn()
+            if db is not None:
+                removed = db.execute("DELETE FROM ai_cache WHERE patient_id = ?", (str(patient_id),)).rowcount
+                db.commit()
+            self.stats["invalidated"] += max(removed, 0)
+            return removed
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            db = self._conn()
+            if db is not None:
+                db.execute("DELETE FROM ai_cache")
+                db.commit()
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+            disk_entries = 0
+            db = self._conn()
+            if db is not None:
+                disk_entries = db.execute("SELECT COUNT(*) FROM ai_cache").fetchone()[0]
+            return {
+                **self.stats,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+            }
+
+
+ai_cache = AICache()
@@ -1,52 +1,88 @@
 import os
-from google import genai
+import time
+from concurrent.futures import ThreadPoolExecutor
 import asyncio
+import contextvars
+import json
+import logging
+import pandas as pd
+from app.services.ai_cache import ai_cache
+from app.services.alert_rules import evaluate_rules, render_prompt_rules
+from app.services.llm_provider import get_provider
+from app.services.model_health import Deadline, model_breaker
+from app.services.prompt_builder import build_patient_context, token_usage
+from app.utils.telemetry import timed, record_model_attempt
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on concurrent Gemini generations per worker process.
+# The SDK call is blocking, so generations run on this pool instead of the event loop.
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+# Generations allowed to wait for a slot; beyond this, requests get the fallback at once instead of queueing
+AI_MAX_QUEUE = int(os.getenv("AI_MAX_QUEUE", "64"))
+_ai_executor = ThreadPoolExecutor(max_workers=AI_MAX_CONCURRENCY, thread_name_prefix="gemini")
+_ai_semaphore = None
+_ai_semaphore_loop = None
+# Generations running or waiting for a slot (for AI_MAX_QUEUE)
+_ai_pending = 0
+# Cache key -> task of the generation currently running for it (see AIService._single_flight)
+_ai_inflight = {}
+
+def _get_ai_semaphore():
+    # asyncio primitives belong to one loop; recreate if the app is served from a new one
+    global _ai_semaphore, _ai_semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _ai_semaphore is None or _ai_semaphore_loop is not loop:
+        _ai_semaphore = asyncio.Semaphore(AI_MAX_CONCURRENCY)
+        _ai_semaphore_loop = loop
+        _ai_inflight.clear()
+    return _ai_semaphore
+
+# Model Chain: Pro -> Flash -> Lite
+# "gemini 3 pro" request mapped to current best (1.5-pro)
+INSIGHT_MODELS = [
+    "gemini-3-pro-preview",
+    "gemini-3-flash-preview",
+    "gemini-2.5-pro",
+    "gemini-2.5-flash",
+    "gemini-2.5-flash-lite"
+]
+ALERT_MODELS = INSIGHT_MODELS + [
+    "gemini-1.5-pro",
+    "gemini-1.5-flash"
+]
+# Fields the alert prompt is allowed to see
+ALERT_FIELDS = ["Abnormal_Labs", "Renal_Flag", "Liver_Flag", "Lab_Flag_Trend", "Biomarker_Trend", "Radiology_Trend", "Response", "New_Lesions", "Performance_Status", "Toxicities", "Ambiguous_Pathology"]
+
+# Bump when a prompt or its parsing changes so cached generations are not reused
+INSIGHT_PROMPT_VERSION = "insight-v2:" + ",".join(INSIGHT_MODELS)
+ALERT_PROMPT_VERSION = "alerts-v2:" + ",".join(ALERT_MODELS)
+
+# One JSON call returning insights and alerts together instead of two free-text calls (0 = separate prompts)
+AI_COMBINED_GENERATION = os.getenv("AI_COMBINED_GENERATION", "1") == "1"
+COMBINED_MODELS = INSIGHT_MODELS
+COMBINED_PROMPT_VERSION = "combined-v1:" + ",".join(COMBINED_MODELS)
+# Response key -> (min items, max items)
+COMBINED_LIMITS = {"insights": (5, 5), "alerts": (3, 4)}
+# Plain JSON Schema, so any provider can pass it on (see llm_provider)
+COMBINED_SCHEMA = {
+    "type": "object",
+    "properties": {
+        key: {"type": "array", "items": {"type": "string"}, "minItems": low, "maxItems": high}
+        for key, (low, high) in COMBINED_LIMITS.items()
+    },
+    "required": list(COMBINED_LIMITS),
+}
 
 class AIService:
     @staticmethod
     def generate_clinical_alerts(patient_data):
         """
         Rule-based detection (NOT AI).
-        Alerts are triggered ONLY from existing structured fields.
+        Alerts are triggered ONLY from existing structured fields, using the rules in ALERT_RULES.
+        Documents read the same result from the per-version alert matrix instead of calling this per row.
         """
-        alerts = []
-        
-        # 1. Disease-related
-        if str(patient_data.get('Metastatic_Status', '')).lower() == 'yes':
-            alerts.append({"category": "Disease", "message": "Metastatic disease present", "level": "high"})
-        
-        if str(patient_data.get('New_Lesions', '')).lower() == 'yes':
-            alerts.append({"category": "Disease", "message": "New lesions identified", "level": "high"})
-            
-        if str(patient_data.get('Response', '')).upper() == 'PD' or str(patient_data.get('RECIST', '')).upper() == 'PD':
-            alerts.append({"category": "Disease", "message": "Radiographic progression", "level": "high"})
-
-        # 2. Functional / Safety
-        try:
-            ecog_str = str(patient_data.get('Performance_Status', ''))
-            # simple extract digit
-            ecog_val = int(''.join(filter(str.isdigit, ecog_str))) if any(c.isdigit() for c in ecog_str) else 0
-            if ecog_val >= 2:
-                alerts.append({"category": "Functional", "message": "Reduced functional reserve", "level": "medium"})
-        except:
-            pass # Fallback if parsing fails
-
-        if str(patient_data.get('Liver_Flag', '')).lower() == 'yes':
-             alerts.append({"category": "Safety", "message": "Hepatic dysfunction", "level": "medium"})
-             
-        if str(patient_data.get('Renal_Flag', '')).lower() == 'yes':
-             alerts.append({"category": "Safety", "message": "Renal impairment", "level": "medium"})
-
-        # 3. Treatment Tolerance
-        toxicities = str(patient_data.get('Toxicities', ''))
-        if toxicities and toxicities.lower() != 'nan' and toxicities.lower() != 'none':
-             alerts.append({"category": "Tolerance", "message": "Treatment-related toxicities documented", "level": "medium"})
-
-        # 4. Data Quality
-        if str(patient_data.get('Ambiguous_Pathology', '')).lower() == 'yes':
-             alerts.append({"category": "Data", "message": "Pathology uncertainty", "level": "low"})
-
-        return alerts
+        return evaluate_rules(pd.DataFrame([dict(patient_data)])).alerts_for(0)
 
     @staticmethod
     def generate_ai_summary(alerts, patient_data):
@@ -58,17 +94,64 @@ class AIService:
         return "Clinical signals under review. Refer to Comprehensive AI Insights below for detailed analysis."
 
     @staticmethod
-    def generate_cross_domain_insight(raw_patient_data):
+    def patient_context(raw_patient_data):
+        # One pruned representation for both prompts; alert inputs are never cut by the budget
+        with timed("prompt"):
+            return build_patient_context(raw_patient_data, protected=ALERT_FIELDS)
+
+    @staticmethod
+    def insight_cache_key(raw_patient_data):
+        # Keyed on what the prompt actually contains, so link or empty-field edits do not invalidate it
+        context = AIService.patient_context(raw_patient_data)
+        if AI_COMBINED_GENERATION:
+            return ai_cache.make_key("insights", COMBINED_PROMPT_VERSION, context.fields)
+        return ai_cache.make_key("insights", INSIGHT_PROMPT_VERSION, context.fields)
+
+    @staticmethod
+    def alert_cache_key(raw_patient_data):
+        context = AIService.patient_context(raw_patient_data)
+        if AI_COMBINED_GENERATION:
+            # The combined prompt shows the model every field, so the alerts depend on all of them
+            return ai_cache.make_key("alerts", COMBINED_PROMPT_VERSION, context.fields)
+        return ai_cache.make_key("alerts", ALERT_PROMPT_VERSION, context.subset(ALERT_FIELDS))
+
+    @staticmethod
+    def generate_cross_domain_insight(raw_patient_data, deadline=None):
         """
         Generates cross-domain clinical insights using Google Gemini Models.
-        Strategy: Try superior models first, fallback to faster/cheaper ones.
+        Model output is cached by patient data + prompt version; fallbacks are never cached.
         """
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            print("WARNING: GEMINI_API_KEY not found in environment.")
+        key = AIService.insight_cache_key(raw_patient_data)
+        cached = ai_cache.get(key)
+        if cached is not None:
+            return cached
+        return AIService._insight_on_miss(raw_patient_data, key, deadline or Deadline())
+
+    @staticmethod
+    def _insight_on_miss(raw_patient_data, key, deadline):
+        if AI_COMBINED_GENERATION:
+            return AIService._combined_on_miss(raw_patient_data, deadline)[0]
+
+        provider = get_provider()
+        if not provider.available:
+            logger.warning("LLM provider unavailable (GEMINI_API_KEY not found in environment?).")
+            return AIService._get_fallback_insight()
+
+        insights = AIService._generate_cross_domain_insight(raw_patient_data, provider, deadline)
+        if insights is None:
+            logger.warning("No model succeeded within the deadline; returning fallback.", extra={"kind": "insights", "patient_id": raw_patient_data.get('Patient_ID')})
             return AIService._get_fallback_insight()
 
-        client = genai.Client(api_key=api_key)
+        ai_cache.set(key, insights, patient_id=raw_patient_data.get('Patient_ID'))
+        return insights
+
+    @staticmethod
+    def _generate_cross_domain_insight(raw_patient_data, provider, deadline):
+        """
+        Strategy: Try superior models first, fallback to faster/cheaper ones.
+        Returns None if every model failed.
+        """
+        context = AIService.patient_context(raw_patient_data)
 
         # Prompt Construction
         prompt = f"""
@@ -76,8 +159,8 @@ class AIService:
 
         Here is the structured clinical data for a single patient, covering pathology, molecular findings, treatment history, imaging response, biomarkers, functional status, and organ function.
 
-        Data: 
-        {raw_patient_data}
+        Data:
+        {context.render()}
 
         Your task is to generate EXACTLY 5 bullet points that provide cross-domain clinical insights.
 
@@ -110,49 +193,46 @@ class AIService:
         Assume this output is assistive only and intended to help a clinician reflect on how the available information fits together clinically.
         """
 
-        # Model Chain: Pro -> Flash -> Pro 1.0
-        # "gemini 3 pro" request mapped to current best (1.5-pro)
-        models_to_try = [
-            "gemini-3-pro-preview",
-            "gemini-3-flash-preview",
-            "gemini-2.5-pro",
-            "gemini-2.5-flash",
-            "gemini-2.5-flash-lite"
-        ]
-
-        for model_name in models_to_try:
-            try:
-                # print(f"Attempting generation with {model_name}...")
-                # Run sync in thread if needed, but google sdk might be blocking
-                # Using to_thread for non-blocking in async endpoint
-                response = client.models.generate_content(model = model_name, contents = prompt)
-                
-                if response.text:
-                    # Parse into list of strings (bullets)
-                    # Expecting raw text like "* Point 1\n* Point 2" or "- Point 1"
-                    print(response.text)
-                    lines = [line.strip().lstrip('*-• ').strip() for line in response.text.split('\n') if line.strip()]
-                    
-                    # Ensure we have about 5. If strictly 5 requested, just take top 5.
-                    return lines[:5]
-            except Exception as e:
-                print(f"Model {model_name} failed: {str(e)}")
-                continue # Try next model
-
-        print("All models failed. Returning fallback.")
-        return AIService._get_fallback_insight()
+        # Ensure we have about 5. If strictly 5 requested, just take top 5.
+        return AIService._run_model_chain(
+            provider, INSIGHT_MODELS, prompt, deadline, lambda text: AIService._parse_bullets(text, limit=5),
+            kind="insights", estimated_tokens=context.estimated_tokens(),
+        )
 
     @staticmethod
-    def generate_clinical_alert_insights(raw_patient_data):
+    def generate_clinical_alert_insights(raw_patient_data, deadline=None):
         """
         Generates strict rule-based clinical alerts using AI.
         Replaces the Python rule engine with an LLM prompt.
         """
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
+        key = AIService.alert_cache_key(raw_patient_data)
+        cached = ai_cache.get(key)
+        if cached is not None:
+            return cached
+        return AIService._alerts_on_miss(raw_patient_data, key, deadline or Deadline())
+
+    @staticmethod
+    def _alerts_on_miss(raw_patient_data, key, deadline):
+        if AI_COMBINED_GENERATION:
+            return AIService._combined_on_miss(raw_patient_data, deadline)[1]
+
+        provider = get_provider()
+        if not provider.available:
             return ["Missing API Key - Cannot generate alerts."]
 
-        client = genai.Client(api_key=api_key)
+        alerts = AIService._generate_clinical_alert_insights(raw_patient_data, provider, deadline)
+        if alerts is None:
+            return AIService._rule_based_alert_messages(raw_patient_data)
+
+        ai_cache.set(key, alerts, patient_id=raw_patient_data.get('Patient_ID'))
+        return alerts
+
+    @staticmethod
+    def _generate_clinical_alert_insights(raw_patient_data, provider, deadline):
+        """
+        Walks the alert model chain. Returns None if every model failed.
+        """
+        context = AIService.patient_context(raw_patient_data)
 
         prompt = f"""You are an assistive clinical summarization system.
         Here's the structured data for a single oncology patient containing the following fields:
@@ -160,8 +240,10 @@ class AIService:
         Radiology_Trend, Response, New_Lesions, Performance_Status,
         Toxicities, Ambiguous_Pathology.
 
+        Fields that do not appear under Data are missing.
+
         Data:
-        { {k: raw_patient_data.get(k) for k in ["Abnormal_Labs", "Renal_Flag", "Liver_Flag", "Lab_Flag_Trend", "Biomarker_Trend", "Radiology_Trend", "Response", "New_Lesions", "Performance_Status", "Toxicities", "Ambiguous_Pathology"]} }
+        {context.render(ALERT_FIELDS)}
 
         –––––––––––––––––––––––––
         ALERT DETECTION LOGIC (STRICT, RULE-BASED)
@@ -170,49 +252,7 @@ class AIService:
 
         Trigger an alert ONLY if the condition below is met:
 
-        1. Abnormal_Labs
-        - If value exists AND value != "None"
-        → Alert: "Laboratory abnormalities: <value>"
-
-        2. Renal_Flag
-        - If value == "Yes"
-        → Alert: "Renal function abnormality present"
-
-        3. Liver_Flag
-        - If value == "Yes"
-        → Alert: "Hepatic function abnormality present"
-
-        4. Lab_Flag_Trend
-        - If value contains "Progressive" OR "Worsening"
-        → Alert: "Worsening laboratory trend: <value>"
-
-        5. Biomarker_Trend
-        - If value contains "rising" OR "increasing"
-        → Alert: "Rising tumor biomarker trend: <value>"
-
-        6. Radiology_Trend
-        - If value == "Worsening"
-        → Alert: "Worsening radiographic disease trend"
-
-        7. Response
-        - If value == "PD"
-        → Alert: "Radiographic progression by Response"
-
-        8. New_Lesions
-        - If value == "Yes"
-        → Alert: "New lesions identified on imaging"
-
-        9. Performance_Status
-        - If value is ECOG 2, ECOG 3, or ECOG 4
-        → Alert: "Reduced functional reserve (ECOG <value>)"
-
-        10. Toxicities
-        - If value exists AND value != "None"
-        → Alert: "Treatment-related toxicities: <value>"
-
-        11. Ambiguous_Pathology
-        - If value == "Yes"
-        → Alert: "Pathology findings are ambiguous"
+        {render_prompt_rules(ALERT_FIELDS)}
 
         –––––––––––––––––––––––––
         MISSING CRITICAL DATA LOGIC
@@ -258,29 +298,291 @@ class AIService:
 
         DO NOT MENTION ANYTHING OTHER THAN THE BULLETED INSIGHTS IN YOUR RESPONSE.
 """
-        models_to_try = [
-            "gemini-3-pro-preview",
-            "gemini-3-flash-preview",
-            "gemini-2.5-pro",
-            "gemini-2.5-flash",
-            "gemini-2.5-flash-lite",
-            "gemini-1.5-pro",
-            "gemini-1.5-flash"
-        ]
+        return AIService._run_model_chain(
+            provider, ALERT_MODELS, prompt, deadline, AIService._parse_bullets,
+            kind="alerts", estimated_tokens=context.estimated_tokens(ALERT_FIELDS),
+        )
 
-        for model_name in models_to_try:
-            try:
-                response = client.models.generate_content(model = model_name, contents = prompt)
+    @staticmethod
+    def _combined_on_miss(raw_patient_data, deadline):
+        """
+        One generation for both outputs. Returns (insights, alerts); fallbacks are used (and not cached) on failure.
+        """
+        provider = get_provider()
+        if not provider.available:
+            logger.warning("LLM provider unavailable (GEMINI_API_KEY not found in environment?).")
+            return AIService._get_fallback_insight(), ["Missing API Key - Cannot generate alerts."]
+
+        result = AIService._generate_combined(raw_patient_data, provider, deadline)
+        if result is None:
+            logger.warning("No model succeeded within the deadline; returning fallback.", extra={"kind": "combined", "patient_id": raw_patient_data.get('Patient_ID')})
+            return AIService._get_fallback_insight(), AIService._rule_based_alert_messages(raw_patient_data)
+
+        patient_id = raw_patient_data.get('Patient_ID')
+        ai_cache.set(AIService.insight_cache_key(raw_patient_data), result["insights"], patient_id=patient_id)
+        ai_cache.set(AIService.alert_cache_key(raw_patient_data), result["alerts"], patient_id=patient_id)
+        return result["insights"], result["alerts"]
+
+    @staticmethod
+    def _generate_combined(raw_patient_data, provider, deadline):
+        """
+        Asks for {"insights": [...5], "alerts": [...3-4]} as schema-constrained JSON.
+        Returns the validated dict, or None if every model failed.
+        """
+        context = AIService.patient_context(raw_patient_data)
+
+        prompt = f"""You are an assistive clinical reasoning and summarization system for oncology.
+
+        Here is the structured clinical data for a single patient. Fields not listed are missing.
+
+        Data:
+        {context.render()}
+
+        Respond with ONE JSON object with two keys, "insights" and "alerts".
 
-                if response.text:
-                    print(response.text)
-                    lines = [line.strip().lstrip('*-• ').strip() for line in response.text.split('\n') if line.strip()]
-                    if lines: return lines
+        –––––––––––––––––––––––––
+        "insights": EXACTLY 5 strings, cross-domain clinical insights.
+        Each insight MUST:
+        Connect findings across domains (e.g., pathology → therapy, therapy → response, response → functional tolerance)
+        Highlight alignment or discordance between tumor biology, treatment choice, and observed outcomes
+        Surface clinically relevant patterns or monitoring considerations WITHOUT giving instructions
+        Use concise, neutral, factual, clinician-appropriate language, 1-2 sentences each
+
+        Insights MUST NOT:
+        Repeat raw data values, dates, or measurements
+        Summarize the patient record section by section
+        Flag abnormalities or generate alerts
+        Recommend treatments or changes in management
+        Predict outcomes or prognosis
+        Introduce external guidelines, reference ranges, or medical knowledge
+
+        –––––––––––––––––––––––––
+        "alerts": 3 to 4 strings, based ONLY on these fields:
+        {", ".join(ALERT_FIELDS)}.
+
+        Trigger an alert ONLY if the condition below is met:
+
+        {render_prompt_rules(ALERT_FIELDS)}
+
+        If any of these fields are missing, include ONE alert in the format:
+        "Missing critical data: <field names>"
+
+        Each alert MUST be one plain sentence that includes the actual value or finding.
+        Alerts MUST NOT mention absence of findings, recommend actions, or predict outcomes.
+
+        Priority order when more than 4 alerts apply:
+        Disease activity (Response, New_Lesions, Radiology_Trend)
+        Organ safety (Liver_Flag, Renal_Flag)
+        Functional / tolerance (ECOG, Toxicities)
+        Data quality (Ambiguous / Missing)
+
+        Assume this output is assistive only and intended to help a clinician.
+"""
+        return AIService._run_model_chain(
+            provider, COMBINED_MODELS, prompt, deadline, AIService._parse_combined,
+            kind="combined", estimated_tokens=context.estimated_tokens(), response_schema=COMBINED_SCHEMA,
+            repair=AIService._repair_prompt,
+        )
+
+    @staticmethod
+    def _parse_bullets(text, limit=None):
+        # Free-text prompts: expecting raw text like "* Point 1\n* Point 2" or "- Point 1"
+        lines = [line.strip().lstrip('*-• ').strip() for line in (text or "").split('\n') if line.strip()]
+        if limit:
+            lines = lines[:limit]
+        if not lines:
+            raise ValueError("empty response")
+        return lines
+
+    @staticmethod
+    def _parse_combined(text):
+        """Parses and validates the combined JSON response. Raises ValueError describing what is wrong."""
+        text = (text or "").strip()
+        # Tolerate a fenced or prefixed object; everything else goes through the repair prompt
+        start, end = text.find("{"), text.rfind("}")
+        if start < 0 or end < start:
+            raise ValueError("response is not a JSON object")
+        try:
+            data = json.loads(text[start:end + 1])
+        except json.JSONDecodeError as e:
+            raise ValueError(f"invalid JSON: {e}")
+        if not isinstance(data, dict):
+            raise ValueError("response is not a JSON object")
+
+        result = {}
+        for key, (low, high) in COMBINED_LIMITS.items():
+            items = data.get(key)
+            if not isinstance(items, list):
+                raise ValueError(f'"{key}" must be a list of strings')
+            items = [" ".join(item.split()).lstrip('*-• ') for item in items if isinstance(item, str) and item.strip()]
+            if len(items) < low:
+                raise ValueError(f'"{key}" needs at least {low} non-empty strings, got {len(items)}')
+            result[key] = items[:high]
+        return result
+
+    @staticmethod
+    def _repair_prompt(prompt, text, error):
+        return f"""{prompt}
+
+        Your previous response could not be used: {error}
+        Previous response:
+        {(text or "")[:2000]}
+
+        Return ONLY the corrected JSON object."""
+
+    @staticmethod
+    def _call_model(provider, model_name, contents, budget, response_schema, kind, estimated_tokens):
+        # The provider applies `budget` as the per-attempt timeout, so a hung call cannot outlive the request
+        response = provider.generate(model_name, contents, budget, response_schema=response_schema)
+        token_usage.record(kind, model_name, estimated_tokens, response)
+        return response.text
+
+    @staticmethod
+    def _run_model_chain(provider, models, prompt, deadline, parse, kind="generation", estimated_tokens=0, response_schema=None, repair=None):
+        """
+        Tries each model in order until `parse(text)` accepts its output (parse raises ValueError otherwise).
+        With `repair`, an invalid answer gets one follow-up call on the same model with repair(prompt, text, error).
+        Models the circuit breaker knows to be failing (or too slow for the remaining budget) are skipped,
+        and the chain stops once the request deadline is spent. Returns None if nothing succeeded.
+        Token counts of every answered call are recorded under `kind` (see prompt_builder.TokenUsage).
+        `models` is the Gemini chain; the provider may substitute its own (a local server has one model).
+        """
+        for model_name in provider.model_chain(models):
+            budget = deadline.remaining()
+            if budget <= 0:
+                logger.warning("AI deadline reached before a model succeeded.", extra={"kind": kind})
+                return None
+            if not model_breaker.allow(model_name, budget):
+                continue
+
+            started = time.monotonic()
+            outcome = "ok"
+            try:
+                text = AIService._call_model(provider, model_name, prompt, budget, response_schema, kind, estimated_tokens)
+                try:
+                    result = parse(text)
+                except ValueError as e:
+                    if repair is None or deadline.remaining() <= 0:
+                        raise
+                    logger.info("Model returned unusable output; asking for a repair.", extra={"model": model_name, "kind": kind, "error": str(e)})
+                    outcome = "repaired"
+                    text = AIService._call_model(
+                        provider, model_name, repair(prompt, text, e), deadline.remaining(), response_schema, kind, estimated_tokens
+                    )
+                    result = parse(text)
+                model_breaker.record_success(model_name, time.monotonic() - started)
+                record_model_attempt(model_name, outcome, time.monotonic() - started)
+                return result
             except Exception as e:
-                print(f"Model {model_name} failed: {str(e)}")
+                outcome = "invalid" if isinstance(e, ValueError) else "error"
+                model_breaker.record_failure(model_name, time.monotonic() - started, e)
+                record_model_attempt(model_name, outcome, time.monotonic() - started)
+                logger.warning("Model attempt failed.", extra={"model": model_name, "kind": kind, "outcome": outcome, "error": str(e)})
                 continue # Try next model
 
-        return generate_clinical_alerts(raw_patient_data)
+        return None
+
+    @staticmethod
+    async def _run_blocking(deadline, func, *args):
+        """
+        Runs a blocking generation on the AI pool.
+        Waiting for a slot happens on the event loop, so a burst of requests queues cheaply;
+        returns None if the deadline runs out while still queued, or right away if AI_MAX_QUEUE
+        generations are already waiting (callers then serve their fallback).
+        """
+        global _ai_pending
+        if _ai_pending >= AI_MAX_CONCURRENCY + AI_MAX_QUEUE:
+            logger.warning("AI queue full; shedding generation.", extra={"pending": _ai_pending})
+            return None
+        semaphore = _get_ai_semaphore()
+        _ai_pending += 1
+        try:
+            try:
+                await asyncio.wait_for(semaphore.acquire(), timeout=deadline.remaining())
+            except asyncio.TimeoutError:
+                logger.warning("AI deadline reached while queued for a generation slot.")
+                return None
+            try:
+                loop = asyncio.get_running_loop()
+                # Run in a copy of this context so stage timings land on the calling request
+                context = contextvars.copy_context()
+                return await loop.run_in_executor(_ai_executor, context.run, func, *args)
+            finally:
+                semaphore.release()
+        finally:
+            _ai_pending -= 1
+
+    @staticmethod
+    async def _single_flight(key, deadline, func, *args):
+        """
+        _run_blocking, shared by every concurrent caller with the same cache key (which covers the
+        prompt version and the patient data), so a page opened by several clinicians at once costs one generation.
+        All callers get the same result or exception. The generation runs on the first caller's deadline,
+        but each caller waits at most its own and gets None (its fallback) once that is spent.
+        A caller that times out or is cancelled stops waiting; the generation keeps running for the others.
+        """
+        _get_ai_semaphore()
+        task = _ai_inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(AIService._run_blocking(deadline, func, *args))
+            _ai_inflight[key] = task
+            task.add_done_callback(lambda done: _ai_inflight.pop(key, None) if _ai_inflight.get(key) is done else None)
+        else:
+            logger.debug("Joining in-flight generation.", extra={"key": key})
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), deadline.remaining())
+        except asyncio.TimeoutError:
+            logger.warning("AI deadline reached while waiting for a shared generation.", extra={"key": key})
+            return None
+
+    @staticmethod
+    async def agenerate_cross_domain_insight(raw_patient_data, deadline=None):
+        # Cache hits are answered without taking a pool slot
+        key = AIService.insight_cache_key(raw_patient_data)
+        cached = ai_cache.get(key)
+        if cached is not None:
+            return cached
+        deadline = deadline or Deadline()
+        insights = await AIService._single_flight(key, deadline, AIService._insight_on_miss, raw_patient_data, key, deadline)
+        return AIService._get_fallback_insight() if insights is None else insights
+
+    @staticmethod
+    async def agenerate_clinical_alert_insights(raw_patient_data, deadline=None):
+        key = AIService.alert_cache_key(raw_patient_data)
+        cached = ai_cache.get(key)
+        if cached is not None:
+            return cached
+        deadline = deadline or Deadline()
+        alerts = await AIService._single_flight(key, deadline, AIService._alerts_on_miss, raw_patient_data, key, deadline)
+        return AIService._rule_based_alert_messages(raw_patient_data) if alerts is None else alerts
+
+    @staticmethod
+    async def agenerate_all(raw_patient_data, deadline=None):
+        """
+        Insights and alerts under one shared deadline. Returns (insights, alerts).
+        In combined mode this is a single generation; otherwise the two prompts run concurrently.
+        """
+        deadline = deadline or Deadline()
+        if AI_COMBINED_GENERATION:
+            key = AIService.insight_cache_key(raw_patient_data)
+            insights = ai_cache.get(key)
+            alerts = ai_cache.get(AIService.alert_cache_key(raw_patient_data))
+            if insights is not None and alerts is not None:
+                return insights, alerts
+            result = await AIService._single_flight("combined:" + key, deadline, AIService._combined_on_miss, raw_patient_data, deadline)
+            if result is None:
+                return AIService._get_fallback_insight(), AIService._rule_based_alert_messages(raw_patient_data)
+            return result
+
+        return await asyncio.gather(
+            AIService.agenerate_cross_domain_insight(raw_patient_data, deadline),
+            AIService.agenerate_clinical_alert_insights(raw_patient_data, deadline),
+        )
+
+    @staticmethod
+    def _rule_based_alert_messages(raw_patient_data):
+        # Same shape as the AI output: plain alert messages
+        return [alert["message"] for alert in AIService.generate_clinical_alerts(raw_patient_data)]
 
     @staticmethod
     def _get_fallback_insight():
@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+from app.utils.cohort_index import ecog_scores
+
+# Clinical alert rules, defined once and evaluated column-wise over the whole dataset.
+# "when" lists (column, op, value) conditions; a rule fires if any of them holds.
+#   equals    case-insensitive equality
+#   contains  case-insensitive substring match on any of the values
+#   present   value exists and is not "None"
+#   ecog_min  ECOG score (see cohort_index.ecog_scores; "ECOG 1-2" -> 2) is at least `value`
+# "message"/"category"/"level" describe the dashboard alert (None: not shown on the dashboard).
+# "prompt" is the alert text the Gemini alerts prompt is told to emit (None: not part of the prompt).
+# Dashboard alerts keep the order of this table.
+ALERT_RULES = [
+    {"id": "metastatic", "category": "Disease", "level": "high", "message": "Metastatic disease present",
+     "when": [("Metastatic_Status", "equals", "Yes")], "prompt": None},
+    {"id": "new_lesions", "category": "Disease", "level": "high", "message": "New lesions identified",
+     "when": [("New_Lesions", "equals", "Yes")], "prompt": "New lesions identified on imaging"},
+    {"id": "progression", "category": "Disease", "level": "high", "message": "Radiographic progression",
+     "when": [("Response", "equals", "PD"), ("RECIST", "equals", "PD")], "prompt": "Radiographic progression by Response"},
+    {"id": "ecog", "category": "Functional", "level": "medium", "message": "Reduced functional reserve",
+     "when": [("Performance_Status", "ecog_min", 2)], "prompt": "Reduced functional reserve (ECOG <value>)"},
+    {"id": "liver", "category": "Safety", "level": "medium", "message": "Hepatic dysfunction",
+     "when": [("Liver_Flag", "equals", "Yes")], "prompt": "Hepatic function abnormality present"},
+    {"id": "renal", "category": "Safety", "level": "medium", "message": "Renal impairment",
+     "when": [("Renal_Flag", "equals", "Yes")], "prompt": "Renal function abnormality present"},
+    {"id": "toxicities", "category": "Tolerance", "level": "medium", "message": "Treatment-related toxicities documented",
+     "when": [("Toxicities", "present", None)], "prompt": "Treatment-related toxicities: <value>"},
+    {"id": "ambiguous_pathology", "category": "Data", "level": "low", "message": "Pathology uncertainty",
+     "when": [("Ambiguous_Pathology", "equals", "Yes")], "prompt": "Pathology findings are ambiguous"},
+    # Prompt-only rules (tracked in the alert matrix, not shown as dashboard alerts)
+    {"id": "abnormal_labs", "category": None, "level": None, "message": None,
+     "when": [("Abnormal_Labs", "present", None)], "prompt": "Laboratory abnormalities: <value>"},
+    {"id": "lab_trend", "category": None, "level": None, "message": None,
+     "when": [("Lab_Flag_Trend", "contains", ("Progressive", "Worsening"))], "prompt": "Worsening laboratory trend: <value>"},
+    {"id": "biomarker_trend", "category": None, "level": None, "message": None,
+     "when": [("Biomarker_Trend", "contains", ("rising", "increasing"))], "prompt": "Rising tumor biomarker trend: <value>"},
+    {"id": "radiology_trend", "category": None, "level": None, "message": None,
+     "when": [("Radiology_Trend", "equals", "Worsening")], "prompt": "Worsening radiographic disease trend"},
+]
+
+
+def _text(df, column):
+    # Same strings the row-wise rules saw: str(value), '' for a missing column
+    if column not in df.columns:
+        return pd.Series('', index=df.index, dtype=object)
+    values = df[column]
+    return values.astype(str).where(values.notna(), 'nan').astype(object)
+
+
+def _condition(df, column, op, value):
+    text = _text(df, column)
+    lowered = text.str.lower()
+    if op == "equals":
+        mask = lowered == str(value).lower()
+    elif op == "contains":
+        mask = pd.Series(False, index=df.index)
+        for needle in value:
+            mask |= lowered.str.contains(needle.lower(), regex=False)
+    elif op == "present":
+        mask = (text != '') & ~lowered.isin(['nan', 'none'])
+    elif op == "ecog_min":
+        mask = ecog_scores(text) >= value
+    else:
+        raise ValueError(f"Unknown alert rule op: {op}")
+    return mask.to_numpy(dtype=bool)
+
+
+class AlertMatrix:
+    """
+    Patient x rule boolean matrix for one dataset version (rows in snapshot order, columns in ALERT_RULES order).
+    """
+
+    def __init__(self, matrix, rules=ALERT_RULES):
+        self.matrix = matrix
+        self.rules = rules
+        self._dashboard = [i for i, rule in enumerate(rules) if rule["message"]]
+
+    def alerts_for(self, pos):
+        """Dashboard alerts of one patient, in the shape generate_clinical_alerts returns."""
+        fired = self.matrix[pos]
+        return [
+            {"category": self.rules[i]["category"], "message": self.rules[i]["message"], "level": self.rules[i]["level"]}
+            for i in self._dashboard if fired[i]
+        ]
+
+    def summary(self, mask=None):
+        """Cohort alert counts by rule, category and level. `mask` optionally restricts the rows."""
+        matrix = self.matrix if mask is None else self.matrix[mask]
+        per_rule = matrix.sum(axis=0)
+        by_category = {}
+        by_level = {}
+        for i in self._dashboard:
+            rule = self.rules[i]
+            by_category[rule["category"]] = by_category.get(rule["category"], 0) + int(per_rule[i])
+            by_level[rule["level"]] = by_level.get(rule["level"], 0) + int(per_rule[i])
+        dashboard = matrix[:, self._dashboard] if len(self._dashboard) else np.zeros((len(matrix), 0), dtype=bool)
+        return {
+            "patients": len(matrix),
+            "patients_with_alerts": int(dashboard.any(axis=1).sum()),
+            "by_rule": {rule["id"]: int(count) for rule, count in zip(self.rules, per_rule)},
+            "by_category": by_category,
+            "by_level": by_level,
+        }
+
+
+def evaluate_rules(df, rules=ALERT_RULES):
+    matrix = np.zeros((len(df), len(rules)), dtype=bool)
+    for i, rule in enumerate(rules):
+        for column, op, value in rule["when"]:
+            matrix[:, i] |= _condition(df, column, op, value)
+    return AlertMatrix(matrix, rules)
+
+
+def build_alert_matrix(snapshot):
+    return evaluate_rules(snapshot.df)
+
+
+def _describe(op, value):
+    if op == "equals":
+        return f'If value == "{value}"'
+    if op == "contains":
+        return "If value contains " + " OR ".join(f'"{v}"' for v in value)
+    if op == "present":
+        return 'If value exists AND value != "None"'
+    if op == "ecog_min":
+        scores = [f"ECOG {score}" for score in range(value, 5)]
+        return "If value is " + (", ".join(scores[:-1]) + ", or " + scores[-1] if len(scores) > 1 else scores[0])
+    raise ValueError(f"Unknown alert rule op: {op}")
+
+
+def render_prompt_rules(fields, rules=ALERT_RULES, indent="        "):
+    """
+    Numbered prose version of the rules for the alerts prompt, one block per field in `fields` order.
+    Only conditions on `fields` are described, since the prompt shows the model nothing else.
+    """
+    blocks = []
+    for field in fields:
+        for rule in rules:
+            if not rule["prompt"]:
+                continue
+            for column, op, value in rule["when"]:
+                if column == field:
+                    blocks.append((column, _describe(op, value), rule["prompt"]))
+    lines = []
+    for number, (column, condition, alert) in enumerate(blocks, start=1):
+        lines.append(f"{number}. {column}\n{indent}- {condition}\n{indent}→ Alert: \"{alert}\"")
+    return f"\n\n{indent}".join(lines)
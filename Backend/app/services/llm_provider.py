@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import random
+import logging
+import threading
+from abc import ABC, abstractmethod
+from google import genai
+from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+# gemini (default) | fake (offline, deterministic answers) | openai (local OpenAI-compatible server, e.g. Ollama, vLLM)
+AI_PROVIDER = os.getenv("AI_PROVIDER", "gemini")
+# Local OpenAI-compatible server; the model chain collapses to this one model
+LOCAL_LLM_BASE_URL = os.getenv("LOCAL_LLM_BASE_URL", "http://localhost:11434/v1")
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL", "llama3.1")
+# Fake provider behaviour, for offline load tests
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.05"))
+FAKE_LLM_FAILURE_RATE = float(os.getenv("FAKE_LLM_FAILURE_RATE", "0"))
+
+
+class LLMResponse:
+    def __init__(self, text, prompt_tokens=0, response_tokens=0, thinking_tokens=0):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.response_tokens = response_tokens
+        self.thinking_tokens = thinking_tokens
+
+
+class LLMProvider(ABC):
+    """
+    What AIService needs from a model backend.
+    `generate` is blocking and raises on failure; `response_schema` (JSON Schema) asks for a JSON answer.
+    """
+
+    name = "base"
+
+    @property
+    def available(self):
+        return True
+
+    def model_chain(self, default):
+        # Models to try in order; providers with a single model ignore the Gemini chain
+        return default
+
+    @abstractmethod
+    def generate(self, model, prompt, timeout, response_schema=None):
+        """Returns an LLMResponse."""
+
+    def close(self):
+        pass
+
+
+class GeminiProvider(LLMProvider):
+    """
+    One google-genai client for the whole process, so HTTP connections and TLS sessions are reused.
+    """
+
+    name = "gemini"
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key if api_key is not None else os.getenv("GEMINI_API_KEY")
+        self._client = genai.Client(api_key=self.api_key) if self.api_key else None
+
+    @property
+    def available(self):
+        return self._client is not None
+
+    def generate(self, model, prompt, timeout, response_schema=None):
+        # Per-attempt HTTP timeout so a hung call cannot outlive the request budget
+        config = {"http_options": types.HttpOptions(timeout=max(1, int(timeout * 1000)))}
+        if response_schema is not None:
+            config.update(response_mime_type="application/json", response_json_schema=response_schema)
+        response = self._client.models.generate_content(
+            model=model, contents=prompt, config=types.GenerateContentConfig(**config)
+        )
+        usage = getattr(response, "usage_metadata", None)
+        return LLMResponse(
+            response.text,
+            prompt_tokens=getattr(usage, "prompt_token_count", None) or 0,
+            response_tokens=getattr(usage, "candidates_token_count", None) or 0,
+            thinking_tokens=getattr(usage, "thoughts_token_count", None) or 0,
+        )
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """
+    Locally hosted model behind an OpenAI-compatible /chat/completions endpoint, over one pooled HTTP client.
+    """
+
+    name = "openai"
+
+    def __init__(self, base_url=LOCAL_LLM_BASE_URL, model=LOCAL_LLM_MODEL, api_key=None):
+        import httpx
+
+        self.model = model
+        headers = {}
+        api_key = api_key if api_key is not None else os.getenv("LOCAL_LLM_API_KEY")
+        if api_key:
+            headers["Authorization"] = f"Bearer {api_key}"
+        self._http = httpx.Client(base_url=base_url.rstrip("/"), headers=headers)
+
+    def model_chain(self, default):
+        return [self.model]
+
+    def generate(self, model, prompt, timeout, response_schema=None):
+        body = {"model": model, "messages": [{"role": "user", "content": prompt}]}
+        if response_schema is not None:
+            # Servers differ in schema support; JSON mode plus local validation covers all of them
+            body["response_format"] = {"type": "json_object"}
+        response = self._http.post("/chat/completions", json=body, timeout=timeout)
+        response.raise_for_status()
+        data = response.json()
+        usage = data.get("usage") or {}
+        return LLMResponse(
+            data["choices"][0]["message"]["content"],
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            response_tokens=usage.get("completion_tokens", 0),
+        )
+
+    def close(self):
+        self._http.close()
+
+
+class FakeProvider(LLMProvider):
+    """
+    Offline provider with fixed answers, configurable latency and failure rate (for load tests and demos).
+    """
+
+    name = "fake"
+
+    def __init__(self, latency=FAKE_LLM_LATENCY, failure_rate=FAKE_LLM_FAILURE_RATE, seed=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate(self, model, prompt, timeout, response_schema=None):
+        with self._lock:
+            fail = self._rng.random() < self.failure_rate
+        time.sleep(min(self.latency, timeout))
+        if fail:
+            raise RuntimeError(f"fake provider: {model} unavailable")
+        if response_schema is not None:
+            text = json.dumps({
+                "insights": [f"Placeholder insight {i} (fake provider)." for i in range(1, 6)],
+                "alerts": [f"Placeholder alert {i} (fake provider)." for i in range(1, 4)],
+            })
+        else:
+            text = "\n".join(f"* Placeholder point {i} (fake provider)." for i in range(1, 6))
+        return LLMResponse(text, prompt_tokens=len(prompt) // 4, response_tokens=len(text) // 4)
+
+
+PROVIDERS = {"gemini": GeminiProvider, "openai": OpenAICompatibleProvider, "fake": FakeProvider}
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def create_provider(name=None):
+    name = name or AI_PROVIDER
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown AI_PROVIDER {name!r}; expected one of {sorted(PROVIDERS)}")
+    provider = PROVIDERS[name]()
+    logger.info("LLM provider created.", extra={"provider": provider.name, "available": provider.available})
+    return provider
+
+
+def set_provider(provider):
+    """Installs the process-wide provider (done in the app lifespan). Returns the previous one."""
+    global _provider
+    with _provider_lock:
+        previous, _provider = _provider, provider
+    return previous
+
+
+def get_provider():
+    # Created on first use when no lifespan installed one (CLI jobs, scripts)
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = create_provider()
+    return _provider
@@ -0,0 +1,126 @@
+import os
+import time
+import threading
+
+# Consecutive failures before a model is skipped
+MODEL_BREAKER_FAILURES = int(os.getenv("MODEL_BREAKER_FAILURES", "2"))
+# Seconds a tripped model is skipped before one trial request is let through
+MODEL_BREAKER_COOLDOWN = float(os.getenv("MODEL_BREAKER_COOLDOWN", "300"))
+# Overall time budget (seconds) for the AI part of one request
+AI_REQUEST_DEADLINE = float(os.getenv("AI_REQUEST_DEADLINE", "20"))
+
+
+class Deadline:
+    """Wall-clock budget shared by every model attempt of one request."""
+
+    def __init__(self, seconds=AI_REQUEST_DEADLINE):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+
+class ModelCircuitBreaker:
+    """
+    Remembers recent failures and latency per model so the fallback chain can skip
+    known-bad models instead of failing through them on every request.
+    closed -> (N consecutive failures) -> open -> (cooldown) -> half-open -> closed/open
+    A model too slow for the remaining budget is skipped the same way: for one cooldown, then a single
+    trial refreshes its latency estimate (otherwise the estimate, and the skip, would never change).
+    """
+
+    def __init__(self, failure_threshold=MODEL_BREAKER_FAILURES, cooldown=MODEL_BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _state(self, model):
+        if model not in self._models:
+            self._models[model] = {
+                "consecutive_failures": 0,
+                "open_until": 0.0,
+                "slow_until": 0.0,
+                "trial_in_flight": False,
+                "avg_latency": None,
+                "successes": 0,
+                "failures": 0,
+                "last_error": None,
+            }
+        return self._models[model]
+
+    def allow(self, model, budget=None):
+        """
+        True if `model` should be attempted now.
+        With a `budget` (seconds left), models whose typical latency exceeds it are skipped too.
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(model)
+            if state["open_until"] > now:
+                return False
+            slow = budget is not None and state["avg_latency"] is not None and state["avg_latency"] > budget
+            if slow and not state["open_until"]:
+                if not state["slow_until"]:
+                    state["slow_until"] = now + self.cooldown
+                if state["slow_until"] > now:
+                    return False
+            if state["open_until"] or slow:
+                # Half-open (or slow past its cool-down): let exactly one trial through
+                if state["trial_in_flight"]:
+                    return False
+                state["trial_in_flight"] = True
+                if slow:
+                    state["slow_until"] = now + self.cooldown
+            return True
+
+    def _record_latency(self, state, latency):
+        if state["avg_latency"] is None:
+            state["avg_latency"] = latency
+        else:
+            # Exponentially weighted, so the estimate follows recent behaviour
+            state["avg_latency"] = 0.7 * state["avg_latency"] + 0.3 * latency
+
+    def record_success(self, model, latency):
+        with self._lock:
+            state = self._state(model)
+            self._record_latency(state, latency)
+            state["successes"] += 1
+            state["consecutive_failures"] = 0
+            state["open_until"] = 0.0
+            state["slow_until"] = 0.0
+            state["trial_in_flight"] = False
+
+    def record_failure(self, model, latency, error=None):
+        with self._lock:
+            state = self._state(model)
+            self._record_latency(state, latency)
+            state["failures"] += 1
+            state["consecutive_failures"] += 1
+            state["last_error"] = None if error is None else str(error)[:200]
+            state["trial_in_flight"] = False
+            if state["open_until"] or state["consecutive_failures"] >= self.failure_threshold:
+                state["open_until"] = time.monotonic() + self.cooldown
+
+    def get_status(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                model: {
+                    "state": "open" if state["open_until"] > now else ("half_open" if state["open_until"] else "closed"),
+                    "retry_in_seconds": round(max(0.0, state["open_until"] - now), 1),
+                    "slow_skip_seconds": round(max(0.0, state["slow_until"] - now), 1),
+                    "avg_latency_seconds": None if state["avg_latency"] is None else round(state["avg_latency"], 3),
+                    "successes": state["successes"],
+                    "failures": state["failures"],
+                    "consecutive_failures": state["consecutive_failures"],
+                    "last_error": state["last_error"],
+                }
+                for model, state in self._models.items()
+            }
+
+
+model_breaker = ModelCircuitBreaker()
@@ -0,0 +1,164 @@
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional
+
+# Dashboard document sections. Documents are built once per dataset version and shared by every
+# request, so the records are frozen; per-request AI output goes into a copy (PatientRecord.with_ai).
+# Field order is the JSON key order.
+
+
+@dataclass(frozen=True, slots=True)
+class Header:
+    name: str
+    age: int
+    sex: str
+    performance_status: str
+    primary_diagnosis: str
+    histology: str
+    last_visit: str
+    stage_progression: str
+    clinical_alerts: List[dict]
+    ai_alert_summary: str
+    # Filled per request by the AI path; null until then
+    ai_generated_alerts: Optional[List[str]] = None
+
+
+@dataclass(frozen=True, slots=True)
+class DiseaseStatus:
+    treatment_response: str
+    recurrence_status: str
+    current_trend: str
+    longitudinal_trend: str
+    metastatic_status: str
+    metastatic_sites: List[str]
+    new_lesions: str
+    lesion_count_size: str
+    radiology_findings: List[str]
+    radiology_report_link: str
+
+
+@dataclass(frozen=True, slots=True)
+class TimelineEvent:
+    date: str
+    label: str
+    description: str
+    original_field: str
+
+
+@dataclass(frozen=True, slots=True)
+class TreatmentContext:
+    current_line: str
+    prior_therapies: str
+    reason_for_change: str
+    regimen: str
+    response_timeline: str
+    plan_summary: str
+    disease_course_summary: str
+
+
+@dataclass(frozen=True, slots=True)
+class Timeline:
+    events: List[TimelineEvent]
+    treatment_dates: str
+    context: TreatmentContext
+
+
+@dataclass(frozen=True, slots=True)
+class OrganRisk:
+    renal_function: str
+    hepatic_function: str
+    lab_abnormalities: List[str]
+    lab_trend: str
+    toxicities: List[str]
+    pathology_uncertainty: str
+
+
+@dataclass(frozen=True, slots=True)
+class Comorbidities:
+    active_conditions: List[str]
+    smoking_history: str
+
+
+@dataclass(frozen=True, slots=True)
+class Pathology:
+    summary: str
+    grade: str
+    margins: str
+    features: List[str]
+    keywords: str
+    ihc: str
+    num_reports: str
+
+
+@dataclass(frozen=True, slots=True)
+class Genomics:
+    mutations: Dict[str, str]
+    pdl1: str
+    tmb: str
+    msi: str
+    ctdna: str
+    actionable: str
+    new_mutations: str
+
+
+@dataclass(frozen=True, slots=True)
+class Biomarkers:
+    trend: str
+    longitudinal: str
+    # Keyed by display name ("CA19-9" is not an identifier)
+    markers: Dict[str, str]
+
+
+@dataclass(frozen=True, slots=True)
+class EvidenceDocs:
+    pathology_links: str
+    radiology_links: str
+    genomic_links: str
+    notes: str
+
+
+@dataclass(frozen=True, slots=True)
+class Evidence:
+    pathology: Pathology
+    genomics: Genomics
+    biomarkers: Biomarkers
+    # Panel -> parsed lab values, as produced by lab_parser
+    labs: Dict[str, list]
+    docs: EvidenceDocs
+
+
+@dataclass(frozen=True, slots=True)
+class PatientRecord:
+    header: Header
+    disease_status: DiseaseStatus
+    timeline: Timeline
+    organ_risk: OrganRisk
+    comorbidities: Comorbidities
+    evidence: Evidence
+    # Filled per request by the AI path; null until then
+    cross_domain_insights: Optional[List[str]] = None
+
+    def with_ai(self, insights, alerts):
+        # Copies only the two records that change; the sections stay shared
+        return replace(self, header=replace(self.header, ai_generated_alerts=alerts), cross_domain_insights=insights)
+
+
+@dataclass(slots=True)
+class PatientDetails:
+    """
+    One request's handle on a patient: the shared record plus where its row lives.
+    `raw_data()` builds the row dict only when the AI path asks for it.
+    """
+    record: PatientRecord
+    snapshot: object
+    pos: int
+    row_hash: int
+
+    def raw_data(self):
+        return self.snapshot.df.iloc[self.pos].to_dict()
+
+    @property
+    def uid(self):
+        # Patient_ID of the row (the record itself carries no identifier)
+        if "Patient_ID" not in self.snapshot.df.columns:
+            return None
+        return str(self.snapshot.df["Patient_ID"].iloc[self.pos])
@@ -1,8 +1,172 @@
+import logging
+import numpy as np
 import pandas as pd
-from app.utils.data_loader import load_data
+from app.utils.data_loader import get_snapshot
+from app.utils.lab_parser import parse_lab_text, build_lab_table
+from app.utils.cohort_index import build_cohort_index
+from app.services.alert_rules import build_alert_matrix
+from app.utils.date_normalizer import normalize_dates, format_date, date_sort_key
 from app.services.ai_service import AIService
+from app.services.patient_records import (
+    Biomarkers, Comorbidities, DiseaseStatus, Evidence, EvidenceDocs, Genomics, Header, OrganRisk,
+    Pathology, PatientDetails, PatientRecord, Timeline, TimelineEvent, TreatmentContext,
+)
+from app.utils.telemetry import timed
+
+logger = logging.getLogger(__name__)
+
+def _build_patient_index(snapshot):
+    # Case-insensitive Name -> row position and Patient_ID -> row position.
+    # First occurrence wins, matching the old `.iloc[0]` behaviour on duplicates.
+    df = snapshot.df
+    by_name = {}
+    by_id = {}
+    if 'Name' in df.columns:
+        for pos, name in enumerate(df['Name']):
+            if pd.notna(name):
+                by_name.setdefault(str(name).lower(), pos)
+    if 'Patient_ID' in df.columns:
+        for pos, uid in enumerate(df['Patient_ID']):
+            if pd.notna(uid):
+                by_id.setdefault(str(uid), pos)
+    return {"name": by_name, "uid": by_id}
+
+# Fields returned by /getMinimalPatientInfo, in response order
+LIST_FIELDS = ["uid", "name", "age", "sex", "primary_cancer_type", "disease_status"]
+
+def _build_patient_list(snapshot):
+    # Columnar projection of the list fields, computed once per dataset version
+    df = snapshot.df
+
+    def text_col(col, default=''):
+        if col not in df.columns:
+            return pd.Series(default, index=df.index, dtype=object)
+        return df[col].astype(str)
+
+    if 'Age' in df.columns:
+        age = pd.to_numeric(df['Age'], errors='coerce').fillna(0).astype(int)
+    else:
+        age = pd.Series(0, index=df.index, dtype=int)
+
+    projection = pd.DataFrame({
+        "uid": text_col('Patient_ID'),
+        "name": text_col('Name'),
+        "age": age,
+        "sex": text_col('Sex'),
+        "primary_cancer_type": text_col('Primary_Diagnosis'),
+        "disease_status": text_col('Response', 'Unknown'),
+    }).reset_index(drop=True)
+    return projection
+
+def _coerce_age(value):
+    age = pd.to_numeric(value, errors='coerce')
+    return int(age) if pd.notna(age) else 0
+
+def _build_name_search(snapshot):
+    projection = snapshot.derive("patient_list", _build_patient_list)
+    return projection['name'].str.lower()
+
+def _sort_order(snapshot, sort_by):
+    # Stable row order for one list column, cached per dataset version
+    def build(snap):
+        projection = snap.derive("patient_list", _build_patient_list)
+        values = projection[sort_by]
+        # pandas 3 gives text columns the `str` dtype rather than object
+        if pd.api.types.is_string_dtype(values):
+            values = values.str.lower()
+        return values.argsort(kind='stable').to_numpy()
+    return snapshot.derive(f"patient_list_order:{sort_by}", build)
+
+def row_hashes(df):
+    # One uint64 per row from the row's contents and the column names (the document reads fields by name,
+    # so a renamed column changes it); equal rows under the same columns hash equally across versions
+    columns = pd.util.hash_array(np.array(["\x1f".join(map(str, df.columns))], dtype=object))[0]
+    return pd.util.hash_pandas_object(df, index=False).to_numpy() ^ columns
 
 class PatientService:
+    def __init__(self):
+        # Documents of the most recent build, keyed by row hash, reused for unchanged rows
+        self._last_documents = {}
+
+    def _build_documents(self, snapshot):
+        """
+        Materializes the dashboard document of every row for one dataset version.
+        Rows whose content hash matches the previous build reuse that document.
+        A row that fails to build is logged and left as None, so it only breaks its own page (see _details_at).
+        """
+        df = snapshot.df
+        hashes = row_hashes(df)
+        alerts = snapshot.derive("alert_matrix", build_alert_matrix)
+        previous = self._last_documents
+        rows = dates = labs = None
+        if not all(row_hash in previous for row_hash in hashes):
+            # Row dicts and lab slices for the whole frame in one pass each, rather than an iloc per row
+            rows = df.to_dict('records')
+            dates = snapshot.dates.to_dict('records')
+            labs = snapshot.derive("lab_table", build_lab_table).by_row(len(df))
+        documents = []
+        by_hash = {}
+        rebuilt = failed = 0
+        for pos, row_hash in enumerate(hashes):
+            doc = previous.get(row_hash) or by_hash.get(row_hash)
+            if doc is None:
+                try:
+                    doc = self._build_details(rows[pos], labs=labs[pos], dates=dates[pos], alerts=alerts.alerts_for(pos))
+                except Exception as e:
+                    logger.error("Patient document failed to build.", extra={"dataset_version": snapshot.version, "row": pos, "error": str(e)})
+                    failed += 1
+                    documents.append(None)
+                    continue
+                rebuilt += 1
+            by_hash[row_hash] = doc
+            documents.append(doc)
+        self._last_documents = by_hash
+        logger.info("Patient documents materialized.", extra={"dataset_version": snapshot.version, "built": rebuilt, "reused": len(documents) - rebuilt - failed, "failed": failed})
+        return {"documents": documents, "hashes": hashes}
+
+    def _build_row(self, snapshot, pos, labs, alerts):
+        return self._build_details(
+            snapshot.df.iloc[pos], labs=labs.for_row(pos), dates=snapshot.dates.iloc[pos], alerts=alerts.alerts_for(pos)
+        )
+
+    def get_lab_values(self, label=None, panel=None):
+        # Cohort-level lab query over the parsed long-format table
+        snapshot = get_snapshot()
+        return snapshot.derive("lab_table", build_lab_table).query(label=label, panel=panel)
+
+    def query_cohort(self, filters=None, ecog_min=None, ecog_max=None, limit=100, offset=0):
+        """
+        Cohort slice over the structured fields, evaluated on the per-version bitmap index.
+        Values within a field are ORed, fields are ANDed. Returns counts, facets and one page of ids.
+        """
+        snapshot = get_snapshot()
+        index = snapshot.derive("cohort_index", build_cohort_index)
+        mask = index.match(filters, ecog_min=ecog_min, ecog_max=ecog_max)
+        ids = index.ids[mask]
+        return {
+            "version": snapshot.version,
+            "total": len(index.ids),
+            "count": len(ids),
+            "offset": offset,
+            "limit": limit,
+            "ids": ids[offset:offset + limit].tolist(),
+            "facets": index.counts(mask),
+        }
+
+    def get_alert_summary(self):
+        # Cohort alert counts from the per-version patient x rule matrix
+        snapshot = get_snapshot()
+        summary = snapshot.derive("alert_matrix", build_alert_matrix).summary()
+        summary["version"] = snapshot.version
+        return summary
+
+    def warm(self):
+        # Build indexes and documents for the current version ahead of the first request
+        snapshot = get_snapshot()
+        snapshot.derive("patient_index", _build_patient_index)
+        snapshot.derive("cohort_index", build_cohort_index)
+        snapshot.derive("patient_documents", self._build_documents)
+
     def _parse_pipe_list(self, value):
         if pd.isna(value) or str(value).lower() == 'nan' or not value:
             return []
@@ -12,225 +176,220 @@ class PatientService:
     def _parse_lab_data(self, text_data):
         # Parses strings like "Hb10.8 WBC3.4 Plt165" or "Sodium: 140|Potassium: 4.2"
         # Returns list of { label, value, is_abnormal }
-        if not text_data or str(text_data).lower() == 'nan':
-            return []
-        
-        # Try splitting by pipe first if structure exists
-        items = []
-        parts = str(text_data).replace(';', '|').replace(',', '|').split('|')
-        
-        # If no pipes, maybe it's space separated like "Hb10.8 WBC3.4"
-        if len(parts) == 1 and ' ' in text_data:
-             parts = text_data.split()
+        return parse_lab_text(text_data)
 
-        for p in parts:
-            p = p.strip()
-            if not p: continue
-            
-            # heuristic to separate LabelValue e.g. Hb10.8 -> Hb: 10.8
-            # or Label: Value
-            if ':' in p:
-                label, val = p.split(':', 1)
-                items.append({"label": label.strip(), "value": val.strip(), "is_abnormal": False})
-            else:
-                # Try to find where number starts
-                import re
-                match = re.search(r'\d', p)
-                if match:
-                    idx = match.start()
-                    label = p[:idx].strip()
-                    val = p[idx:].strip()
-                    items.append({"label": label, "value": val, "is_abnormal": False})
-                else:
-                    items.append({"label": p, "value": "", "is_abnormal": False})
-        return items
-
-    def get_patient_details(self, name: str):
-        df = load_data()
-        # Case insensitive search
-        patient_row = df[df['Name'].str.lower() == name.lower()]
-        
-        if patient_row.empty:
+    def get_patient_list(self, search=None, sort_by=None, order='asc', limit=None, offset=0):
+        """
+        Returns (total_matching, page_of_records) for the patient list.
+        `search` is a case-insensitive substring match on name.
+        """
+        snapshot = get_snapshot()
+        projection = snapshot.derive("patient_list", _build_patient_list)
+
+        if sort_by:
+            positions = _sort_order(snapshot, sort_by)
+            if order == 'desc':
+                positions = positions[::-1]
+            view = projection.iloc[positions]
+        else:
+            view = projection
+
+        if search:
+            names = snapshot.derive("patient_list_names", _build_name_search)
+            mask = names.str.contains(search.lower(), regex=False).to_numpy()
+            if sort_by:
+                mask = mask[positions]
+            view = view[mask]
+
+        total = len(view)
+        end = None if limit is None else offset + limit
+        return total, view.iloc[offset:end].to_dict('records')
+
+    def _find_position(self, snapshot, name=None, uid=None):
+        # O(1) lookup through the per-version index instead of scanning the Name column
+        with timed("lookup"):
+            index = snapshot.derive("patient_index", _build_patient_index)
+            if uid is not None:
+                return index["uid"].get(str(uid))
+            return index["name"].get(str(name).lower())
+
+    def _details_at(self, snapshot, pos):
+        with timed("sections"):
+            built = snapshot.derive("patient_documents", self._build_documents)
+            record = built["documents"][pos]
+            if record is None:
+                # Failed in the bulk build: retry so the error surfaces on this patient's request only
+                record = self._build_row(
+                    snapshot, pos, snapshot.derive("lab_table", build_lab_table), snapshot.derive("alert_matrix", build_alert_matrix)
+                )
+            # Records are frozen and shared between requests; the row dict is only built on demand
+            return PatientDetails(record, snapshot, pos, int(built["hashes"][pos]))
+
+    def get_patient_details(self, name: str = None, uid: str = None):
+        snapshot = get_snapshot()
+        pos = self._find_position(snapshot, name=name, uid=uid)
+        if pos is None:
             return None
-            
-        row = patient_row.iloc[0]
-        
+        return self._details_at(snapshot, pos)
+
+    def dataset_fingerprint(self):
+        # Identifies the source content (not the in-process version counter), so it is stable across restarts and workers
+        return get_snapshot().fingerprint
+
+    def prepared_snapshot(self):
+        """
+        The current snapshot with its documents built. The first call after a new dataset version builds
+        them, so async callers run this in a thread and pass the snapshot to the iterators below.
+        """
+        snapshot = get_snapshot()
+        snapshot.derive("patient_documents", self._build_documents)
+        return snapshot
+
+    def iter_patient_details(self, names=(), uids=(), snapshot=None):
+        """
+        Yields (key, details or None) for each requested name, then each uid.
+        All lookups use one dataset snapshot, and details are produced one at a time.
+        """
+        snapshot = snapshot or get_snapshot()
+        for key, lookup in [(n, {"name": n}) for n in names] + [(u, {"uid": u}) for u in uids]:
+            pos = self._find_position(snapshot, **lookup)
+            yield key, (None if pos is None else self._details_at(snapshot, pos))
+
+    def iter_all_patient_details(self, snapshot=None):
+        """Yields the details of every patient in dataset order, from one snapshot."""
+        snapshot = snapshot or get_snapshot()
+        for pos in range(len(snapshot.df)):
+            yield self._details_at(snapshot, pos)
+
+    def _build_details(self, row, labs=None, dates=None, alerts=None):
         # --- Section 1: Header & Alerts ---
-        alerts = AIService.generate_clinical_alerts(row)
-        header_data = {
-            "name": str(row.get('Name', '')),
-            "age": int(row['Age']) if pd.notna(row['Age']) else 0,
-            "sex": str(row.get('Sex', '')),
-            "performance_status": str(row.get('Performance_Status', '')),
-            "primary_diagnosis": str(row.get('Primary_Diagnosis', '')),
-            "histology": str(row.get('Histologic_Type', '')),
-            "last_visit": str(row.get('Last_Encounter_Date', '')),
-            "stage_progression": f"{row.get('Initial_TNM_Stage', '')} -> {row.get('Current_TNM_Stage', '')}",
-            "clinical_alerts": alerts,
-            "ai_alert_summary": AIService.generate_ai_summary(alerts, row)
-        }
+        if alerts is None:
+            alerts = AIService.generate_clinical_alerts(row)
+        header_data = Header(
+            name=str(row.get('Name', '')),
+            # Blank or non-numeric ages (e.g. '' from Sheets) become 0, as in the patient list
+            age=_coerce_age(row.get('Age')),
+            sex=str(row.get('Sex', '')),
+            performance_status=str(row.get('Performance_Status', '')),
+            primary_diagnosis=str(row.get('Primary_Diagnosis', '')),
+            histology=str(row.get('Histologic_Type', '')),
+            last_visit=str(row.get('Last_Encounter_Date', '')),
+            stage_progression=f"{row.get('Initial_TNM_Stage', '')} -> {row.get('Current_TNM_Stage', '')}",
+            clinical_alerts=alerts,
+            ai_alert_summary=AIService.generate_ai_summary(alerts, row),
+        )
 
         # --- Section 2: Disease Status ---
-        disease_status = {
-            "treatment_response": str(row.get('Response', '')) or str(row.get('RECIST', '')),
-            "recurrence_status": str(row.get('Recurrence_Status', '')),
-            "current_trend": str(row.get('Radiology_Trend', '')),
-            "longitudinal_trend": str(row.get('Radiology_Trends_Longitudinal', '')),
-            "metastatic_status": str(row.get('Metastatic_Status', '')),
-            "metastatic_sites": self._parse_pipe_list(row.get('Metastatic_Sites', '')),
-            "new_lesions": str(row.get('New_Lesions', '')),
-            "lesion_count_size": str(row.get('Lesion_Count_Size', '')),
-            "radiology_findings": self._parse_pipe_list(row.get('Radiology_Keywords', '')), 
-            "radiology_report_link": str(row.get('Radiology_Links', ''))
-        }
+        disease_status = DiseaseStatus(
+            treatment_response=str(row.get('Response', '')) or str(row.get('RECIST', '')),
+            recurrence_status=str(row.get('Recurrence_Status', '')),
+            current_trend=str(row.get('Radiology_Trend', '')),
+            longitudinal_trend=str(row.get('Radiology_Trends_Longitudinal', '')),
+            metastatic_status=str(row.get('Metastatic_Status', '')),
+            metastatic_sites=self._parse_pipe_list(row.get('Metastatic_Sites', '')),
+            new_lesions=str(row.get('New_Lesions', '')),
+            lesion_count_size=str(row.get('Lesion_Count_Size', '')),
+            radiology_findings=self._parse_pipe_list(row.get('Radiology_Keywords', '')),
+            radiology_report_link=str(row.get('Radiology_Links', '')),
+        )
 
         # --- Section 3: Timeline ---
         # "These 9 have dates, want them all to be arranged in ascending order"
         # Diagnosis, Biopsy, Brain MRI, PET CT, CT Chest, Surgery, Radiation, Treatment Dates
         
+        # Dates were normalized once at load time (see date_normalizer); events sort on the typed values
+        if dates is None:
+            dates = normalize_dates(row.to_frame().T).iloc[0]
+
         events = []
-        def add_event(date_key, label, desc_key=None, extra_desc=None, prefix_label=False):
-            date_val = str(row.get(date_key, ''))
-            
-            # Custom handling for specific DD-MM-YYYY fields
-            if date_key in ['Diagnosis_Date', 'Biopsy_Date'] and date_val and date_val.lower() != 'nan':
-                try:
-                    # Expecting DD-MM-YYYY, sanitize first
-                    clean_d = date_val.strip().split(' ')[0] # Remove potential time/text
-                    # Use pandas to parse with dayfirst=True
-                    dt = pd.to_datetime(clean_d, dayfirst=True, errors='coerce')
-                    if pd.notna(dt):
-                        date_val = dt.strftime('%Y-%m-%d')
-                except Exception:
-                    pass # Fallback to original string if parse fails
-
-            if date_val and date_val.lower() != 'nan':
-                # Heuristic: split by space to get date if it looks like "2024-01-01 Desc"
-                # But CSV fields vary. Let's try to extract date.
-                # Assuming YYYY-MM-DD is at start
-                d = date_val.split(' ')[0]
-                
-                desc = extra_desc if extra_desc else label
-                if desc_key:
-                    val = str(row.get(desc_key, ''))
-                    if val and val.lower() != 'nan':
-                        desc = f"{label}: {val}"
-                
-                # Check for "Result" style combination in source fields
-                # e.g Latest_Brain_MRI (Date & Result both)
-                if desc_key is None and len(date_val) > 10: 
-                     # If the field itself contains text after date
-                     desc = date_val[10:].strip(' -:')
-                     if not desc: desc = label
-                
-                if prefix_label and label.lower() not in desc.lower():
-                     desc = f"{label} - {desc}"
-
-                events.append({"date": d, "label": label, "description": desc, "original_field": date_key})
-
-        add_event('Diagnosis_Date', 'Diagnosis', extra_desc=f"{row.get('Primary_Diagnosis', '')}")
-        add_event('Biopsy_Date', 'Biopsy', extra_desc=f"Site: {row.get('Biopsy_Site', '')}")
-        add_event('Latest_Brain_MRI', 'Brain MRI', prefix_label=True)
-        add_event('Latest_PET_CT', 'PET/CT', prefix_label=True)
-        add_event('Latest_CT_Chest', 'CT Chest', prefix_label=True)
-        # add_event('Surgery', 'Surgery') # OLD
-
-        # Surgery Custom Parsing
+        def add_event(date_key, label, description):
+            token = dates[f"{date_key}_token"]
+            if pd.isna(token):
+                return
+            precision = dates[f"{date_key}_precision"]
+            precision = precision if isinstance(precision, str) else None
+            value = dates[date_key]
+            events.append((
+                date_sort_key(value, precision),
+                # Unparseable tokens are still shown, as the source gave them
+                TimelineEvent(format_date(value, precision) if precision else token, label, description, date_key),
+            ))
+
+        def date_text(date_key):
+            text = dates[f"{date_key}_text"]
+            return '' if pd.isna(text) else text
+
+        def imaging_desc(date_key, label):
+            # Text after the date is the result, e.g. "2024-01-01 No new lesions"
+            desc = date_text(date_key) or label
+            if label.lower() not in desc.lower():
+                desc = f"{label} - {desc}"
+            return desc
+
+        add_event('Diagnosis_Date', 'Diagnosis', f"{row.get('Primary_Diagnosis', '')}")
+        add_event('Biopsy_Date', 'Biopsy', f"Site: {row.get('Biopsy_Site', '')}")
+        add_event('Latest_Brain_MRI', 'Brain MRI', imaging_desc('Latest_Brain_MRI', 'Brain MRI'))
+        add_event('Latest_PET_CT', 'PET/CT', imaging_desc('Latest_PET_CT', 'PET/CT'))
+        add_event('Latest_CT_Chest', 'CT Chest', imaging_desc('Latest_CT_Chest', 'CT Chest'))
+
+        # Surgery: "RUL lobectomy 2023" -> year-only event; no trailing year -> undated event
         sx_val = str(row.get('Surgery', ''))
         if sx_val and sx_val.lower() != 'nan':
-            # Check if it ends with year "Text 2023"
-            parts = sx_val.strip().split(' ')
-            if len(parts) > 0:
-                possible_year = parts[-1]
-                if len(possible_year) == 4 and possible_year.isdigit():
-                    # Format: "RUL lobectomy 2023"
-                    date = possible_year
-                    desc = " ".join(parts[:-1])
-                    events.append({"date": date, "label": "Surgery", "description": desc, "original_field": "Surgery"})
-                else:
-                    # Fallback
-                    events.append({"date": "", "label": "Surgery", "description": sx_val, "original_field": "Surgery"})
+            if dates['Surgery_precision'] == 'year':
+                add_event('Surgery', 'Surgery', date_text('Surgery'))
+            else:
+                events.append(((0, 0, 0), TimelineEvent("", "Surgery", sx_val, "Surgery")))
 
         # Treatment Start Event
         tx_date_str = str(row.get('Treatment_Dates', ''))
-        if tx_date_str and tx_date_str.lower() != 'nan':
-            # Extract start date (first 10 chars assuming YYYY-MM-DD)
-            start_date = tx_date_str.split(' ')[0]
-            if len(start_date) >= 10:
-                # Helper to clean text
-                def clean(txt):
-                    val = str(txt).strip()
-                    if not val or val.lower() == 'nan': return ''
-                    return val
-
-                regimen = clean(row.get('Regimen', ''))
-                line = clean(row.get('Current_Line', ''))
-                
-                parts = []
-                if regimen: parts.append(regimen)
-                if line: parts.append(f"(Line {line})")
-                
-                desc = " ".join(parts)
-                
-                # Append Treatment Response Timeline if available
-                response_timeline = str(row.get('Treatment_Response_Timeline', ''))
-                if response_timeline and response_timeline.lower() != 'nan':
-                     desc += f"\n{response_timeline}"
-
-                events.append({
-                    "date": start_date, 
-                    "label": "Treatment start", 
-                    "description": desc, 
-                    "original_field": "Treatment_Dates"
-                })
+        if dates['Treatment_Dates_precision'] == 'day':
+            # Helper to clean text
+            def clean(txt):
+                val = str(txt).strip()
+                if not val or val.lower() == 'nan': return ''
+                return val
 
-        treatment_dates = tx_date_str
-        
-        # Sort events custom key
-        def event_sort_key(e):
-            d_str = e['date']
-            if not d_str: return (0, 0, 0)
+            regimen = clean(row.get('Regimen', ''))
+            line = clean(row.get('Current_Line', ''))
+            
+            parts = []
+            if regimen: parts.append(regimen)
+            if line: parts.append(f"(Line {line})")
             
-            # If "YYYY" -> Treat as End of Year (Year, 13, 32) so it comes after any specific date in that year
-            if len(d_str) == 4 and d_str.isdigit():
-                return (int(d_str), 13, 32)
-                
-            # If "YYYY-MM-DD"
-            try:
-                parts = d_str.split('-')
-                if len(parts) >= 3:
-                     # YYYY, MM, DD
-                     return (int(parts[0]), int(parts[1]), int(parts[2]))
-                elif len(parts) == 2:
-                     # YYYY-MM (treat as start or end? assuming start usually)
-                     return (int(parts[0]), int(parts[1]), 0)
-            except:
-                pass
+            desc = " ".join(parts)
             
-            return (0, 0, 0)
+            # Append Treatment Response Timeline if available
+            response_timeline = str(row.get('Treatment_Response_Timeline', ''))
+            if response_timeline and response_timeline.lower() != 'nan':
+                 desc += f"\n{response_timeline}"
+
+            add_event('Treatment_Dates', 'Treatment start', desc)
+
+        treatment_dates = tx_date_str
 
-        events.sort(key=event_sort_key)
+        events.sort(key=lambda item: item[0])
+        events = [event for _, event in events]
 
         # Treatment Context (Post Timeline)
-        tx_context = {
-            "current_line": str(row.get('Current_Line', '')),
-            "prior_therapies": str(row.get('Prior_Therapies', '')),
-            "reason_for_change": str(row.get('Reason_For_Change', '')),
-            "regimen": str(row.get('Regimen', '')),
-            "response_timeline": str(row.get('Treatment_Response_Timeline', '')),
-            "plan_summary": str(row.get('Treatment_Plan_Summary', '')),
-            "disease_course_summary": str(row.get('Disease_Course_Summary', ''))
-        }
+        tx_context = TreatmentContext(
+            current_line=str(row.get('Current_Line', '')),
+            prior_therapies=str(row.get('Prior_Therapies', '')),
+            reason_for_change=str(row.get('Reason_For_Change', '')),
+            regimen=str(row.get('Regimen', '')),
+            response_timeline=str(row.get('Treatment_Response_Timeline', '')),
+            plan_summary=str(row.get('Treatment_Plan_Summary', '')),
+            disease_course_summary=str(row.get('Disease_Course_Summary', '')),
+        )
 
         # --- Section 4: Organ Function & Lab Risk ---
-        organ_risk = {
-            "renal_function": "Abnormal" if str(row.get('Renal_Flag', '')).lower() == 'yes' else "Preserved",
-            "hepatic_function": "Abnormal" if str(row.get('Liver_Flag', '')).lower() == 'yes' else "Preserved",
-            "lab_abnormalities": self._parse_pipe_list(str(row.get('Abnormal_Labs', ''))),
-            "lab_trend": str(row.get('Lab_Flag_Trend', 'Stable')),
-            "toxicities": self._parse_pipe_list(str(row.get('Toxicities', ''))),
-            "pathology_uncertainty": str(row.get('Ambiguous_Pathology', 'No'))
-        }
+        organ_risk = OrganRisk(
+            renal_function="Abnormal" if str(row.get('Renal_Flag', '')).lower() == 'yes' else "Preserved",
+            hepatic_function="Abnormal" if str(row.get('Liver_Flag', '')).lower() == 'yes' else "Preserved",
+            lab_abnormalities=self._parse_pipe_list(str(row.get('Abnormal_Labs', ''))),
+            lab_trend=str(row.get('Lab_Flag_Trend', 'Stable')),
+            toxicities=self._parse_pipe_list(str(row.get('Toxicities', ''))),
+            pathology_uncertainty=str(row.get('Ambiguous_Pathology', 'No')),
+        )
         # --- Section 5: Comorbidities ---
         active_comorbidities = []
         
@@ -262,67 +421,63 @@ class PatientService:
         if is_present(val):
             active_comorbidities.append(val)
         
-        comorbidities = {
-            "active_conditions": active_comorbidities,
-            "smoking_history": str(row.get('Smoking_Status', ''))
-        }
+        comorbidities = Comorbidities(
+            active_conditions=active_comorbidities,
+            smoking_history=str(row.get('Smoking_Status', '')),
+        )
 
 
 
         # --- Section 6: Detailed Evidence ---
-        evidence = {
-            "pathology": {
-                "summary": str(row.get('Pathology_Diagnosis_Text', '')),
-                "grade": str(row.get('Tumor_Grade', '')),
-                "margins": str(row.get('Margin_Status', '')),
-                "features": self._parse_pipe_list(str(row.get('Histopathologic_Features', ''))),
-                "keywords": str(row.get('Pathology_Keywords', '')),
-                "ihc": str(row.get('IHC_Markers', '')),
-                "num_reports": str(row.get('Num_Pathology_Reports', ''))
-            },
-            "genomics": {
-                "mutations": {
+        evidence = Evidence(
+            pathology=Pathology(
+                summary=str(row.get('Pathology_Diagnosis_Text', '')),
+                grade=str(row.get('Tumor_Grade', '')),
+                margins=str(row.get('Margin_Status', '')),
+                features=self._parse_pipe_list(str(row.get('Histopathologic_Features', ''))),
+                keywords=str(row.get('Pathology_Keywords', '')),
+                ihc=str(row.get('IHC_Markers', '')),
+                num_reports=str(row.get('Num_Pathology_Reports', '')),
+            ),
+            genomics=Genomics(
+                mutations={
                     k: str(row.get(k, '')) for k in ['EGFR', 'ALK', 'ROS1', 'KRAS', 'BRAF', 'MET_Exon14', 'RET', 'HER2', 'NTRK']
                 },
-                "pdl1": str(row.get('PDL1_Percent', '')),
-                "tmb": str(row.get('TMB', '')),
-                "msi": str(row.get('MSI', '')),
-                "ctdna": str(row.get('ctDNA_Findings', '')),
-                "actionable": str(row.get('Actionable_Mutation_Summary', '')),
-                "new_mutations": str(row.get('New_Mutations', ''))
-            },
-            "biomarkers": {
-                "trend": str(row.get('Biomarker_Trend', '')),
-                "longitudinal": str(row.get('Biomarker_Trends_Longitudinal', '')),
-                "markers": {
+                pdl1=str(row.get('PDL1_Percent', '')),
+                tmb=str(row.get('TMB', '')),
+                msi=str(row.get('MSI', '')),
+                ctdna=str(row.get('ctDNA_Findings', '')),
+                actionable=str(row.get('Actionable_Mutation_Summary', '')),
+                new_mutations=str(row.get('New_Mutations', '')),
+            ),
+            biomarkers=Biomarkers(
+                trend=str(row.get('Biomarker_Trend', '')),
+                longitudinal=str(row.get('Biomarker_Trends_Longitudinal', '')),
+                markers={
                     "CEA": str(row.get('CEA', '')),
                     "CA19-9": str(row.get('CA19_9', '')),
-                    "Other": str(row.get('Other_Tumor_Markers', ''))
-                }
-            },
-            "labs": {
+                    "Other": str(row.get('Other_Tumor_Markers', '')),
+                },
+            ),
+            # Slice of the per-version lab table when building documents in bulk
+            labs=labs if labs is not None else {
                 "cbc": self._parse_lab_data(str(row.get('CBC', ''))),
                 "cmp": self._parse_lab_data(str(row.get('CMP', ''))),
                 "electrolytes": self._parse_lab_data(str(row.get('Electrolytes', '')))
             },
-            "docs": {
-                "pathology_links": str(row.get('Pathology_Links', '')),
-                "radiology_links": str(row.get('Radiology_Links', '')),
-                "genomic_links": str(row.get('Genomic_Links', '')),
-                "notes": str(row.get('Provider_Notes', ''))
-            }
-        }
+            docs=EvidenceDocs(
+                pathology_links=str(row.get('Pathology_Links', '')),
+                radiology_links=str(row.get('Radiology_Links', '')),
+                genomic_links=str(row.get('Genomic_Links', '')),
+                notes=str(row.get('Provider_Notes', '')),
+            ),
+        )
 
-        return {
-            "header": header_data,
-            "disease_status": disease_status,
-            "timeline": {
-                "events": events,
-                "treatment_dates": treatment_dates,
-                "context": tx_context
-            },
-            "organ_risk": organ_risk,
-            "comorbidities": comorbidities,
-            "evidence": evidence,
-            "raw_data": row.to_dict()
-        }
+        return PatientRecord(
+            header=header_data,
+            disease_status=disease_status,
+            timeline=Timeline(events=events, treatment_dates=treatment_dates, context=tx_context),
+            organ_risk=organ_risk,
+            comorbidities=comorbidities,
+            evidence=evidence,
+        )
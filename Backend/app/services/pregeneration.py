@@ -0,0 +1,207 @@
+import os
+import time
+import asyncio
+import logging
+import pandas as pd
+
+# Not available on Windows; there every process runs the job (see InsightPregenerator.acquire_leadership)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+from app.utils.data_loader import get_snapshot
+from app.services.ai_cache import AI_CACHE_PATH, ai_cache
+from app.services.ai_service import AIService, AI_COMBINED_GENERATION
+from app.services.model_health import Deadline
+
+logger = logging.getLogger(__name__)
+
+# Patients generated in parallel by the background job
+AI_PREGEN_WORKERS = int(os.getenv("AI_PREGEN_WORKERS", "2"))
+# Provider calls per minute the job may spend
+AI_PREGEN_RPM = float(os.getenv("AI_PREGEN_RPM", "30"))
+# Calls per patient: one combined generation, or the insight and alert prompts separately
+CALLS_PER_PATIENT = 1 if AI_COMBINED_GENERATION else 2
+# Time budget per patient; background work can afford more than an interactive request
+AI_PREGEN_DEADLINE = float(os.getenv("AI_PREGEN_DEADLINE", "120"))
+# Seconds between checks for a new dataset version when running inside the app
+AI_PREGEN_INTERVAL = float(os.getenv("AI_PREGEN_INTERVAL", "300"))
+# Exclusive lock held by the one process that pre-generates; next to the AI cache, which every worker shares
+AI_PREGEN_LOCK_PATH = os.getenv("AI_PREGEN_LOCK_PATH", AI_CACHE_PATH + ".pregen.lock")
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens=1):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+class InsightPregenerator:
+    """
+    Walks the dataset and fills the AI cache ahead of page views.
+    Patients whose current rows are already cached are skipped, so an interrupted run resumes where it stopped.
+    Order: rows that changed since their last generation, then never-generated rows, each by most recent encounter.
+    """
+
+    def __init__(self, workers=AI_PREGEN_WORKERS, rpm=AI_PREGEN_RPM, lock_path=AI_PREGEN_LOCK_PATH):
+        self.workers = workers
+        self.rpm = rpm
+        self.lock_path = lock_path
+        self._lock_file = None
+        self.status = {"state": "idle", "dataset_version": None, "total": 0, "done": 0, "failed": 0, "skipped": 0, "started_at": None, "finished_at": None}
+
+    def acquire_leadership(self):
+        """
+        True if this process should pre-generate. Every app worker starts the job, but only the one holding
+        the lock at lock_path generates; the others stand by and take over once it exits.
+        Without fcntl, or when the lock file cannot be opened, every process runs it.
+        """
+        if self._lock_file is not None or fcntl is None or not self.lock_path:
+            return True
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)), exist_ok=True)
+            handle = open(self.lock_path, "a")
+        except OSError as e:
+            logger.warning("AI pre-generation lock unavailable (running in this process).", extra={"path": self.lock_path, "error": str(e)})
+            return True
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._lock_file = handle
+        logger.info("AI pre-generation lock acquired.", extra={"path": self.lock_path, "pid": os.getpid()})
+        return True
+
+    def release_leadership(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def plan(self, snapshot):
+        """Returns raw rows still missing a cached insight or alert, highest priority first."""
+        df = snapshot.df
+        if 'Last_Encounter_Date' in df.columns:
+            encounter = pd.to_datetime(df['Last_Encounter_Date'], errors='coerce')
+        else:
+            encounter = pd.Series(pd.NaT, index=df.index)
+        generated_before = ai_cache.known_patients("insights") | ai_cache.known_patients("alerts")
+
+        todo = []
+        skipped = 0
+        for pos, raw in enumerate(df.to_dict('records')):
+            if ai_cache.contains(AIService.insight_cache_key(raw)) and ai_cache.contains(AIService.alert_cache_key(raw)):
+                skipped += 1
+                continue
+            changed = str(raw.get('Patient_ID')) in generated_before
+            seen = encounter.iloc[pos]
+            todo.append((0 if changed else 1, -(seen.value if pd.notna(seen) else 0), pos, raw))
+
+        todo.sort(key=lambda item: item[:3])
+        return [item[3] for item in todo], skipped
+
+    async def _generate(self, raw):
+        deadline = Deadline(AI_PREGEN_DEADLINE)
+        await AIService.agenerate_all(raw, deadline)
+        # Fallbacks are never cached, so the cache tells us whether the models actually answered
+        if ai_cache.contains(AIService.insight_cache_key(raw)) and ai_cache.contains(AIService.alert_cache_key(raw)):
+            self.status["done"] += 1
+        else:
+            self.status["failed"] += 1
+
+    async def run_once(self):
+        # Loading and planning walk the whole cohort (prompt contexts, sqlite lookups); keep them off the event loop
+        snapshot = await asyncio.to_thread(get_snapshot)
+        rows, skipped = await asyncio.to_thread(self.plan, snapshot)
+        self.status.update({
+            "state": "running",
+            "dataset_version": snapshot.version,
+            "total": len(rows),
+            "done": 0,
+            "failed": 0,
+            "skipped": skipped,
+            "started_at": time.time(),
+            "finished_at": None,
+        })
+        logger.info("AI pre-generation started.", extra={"dataset_version": snapshot.version, "to_generate": len(rows), "cached": skipped})
+
+        bucket = TokenBucket(rate=self.rpm / 60.0, capacity=max(float(CALLS_PER_PATIENT), self.rpm / 60.0 * 10))
+        queue = asyncio.Queue()
+        for raw in rows:
+            queue.put_nowait(raw)
+
+        async def worker():
+            while True:
+                try:
+                    raw = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await bucket.acquire(CALLS_PER_PATIENT)
+                try:
+                    await self._generate(raw)
+                except Exception as e:
+                    self.status["failed"] += 1
+                    logger.warning("AI pre-generation failed for a patient.", extra={"patient_id": raw.get('Patient_ID'), "error": str(e)})
+                processed = self.status["done"] + self.status["failed"]
+                if processed % 10 == 0 or processed == len(rows):
+                    logger.info("AI pre-generation progress.", extra={"processed": processed, "total": len(rows)})
+
+        await asyncio.gather(*(worker() for _ in range(max(1, self.workers))))
+        self.status.update({"state": "idle", "finished_at": time.time()})
+        return self.status
+
+    async def run_forever(self, interval=AI_PREGEN_INTERVAL):
+        """
+        Re-runs whenever the dataset version changes, in the process holding the pre-generation lock
+        (the others report "standby" and retry every `interval`). Cancel the task to stop.
+        """
+        last_version = None
+        try:
+            while True:
+                try:
+                    if not self.acquire_leadership():
+                        self.status["state"] = "standby"
+                    else:
+                        version = (await asyncio.to_thread(get_snapshot)).version
+                        if version != last_version:
+                            await self.run_once()
+                            last_version = version
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.status["state"] = "error"
+                    logger.exception("AI pre-generation run failed.")
+                await asyncio.sleep(interval)
+        finally:
+            self.release_leadership()
+
+
+pregenerator = InsightPregenerator()
+
+
+if __name__ == "__main__":
+    # CLI entry point: python -m app.services.pregeneration (from the Backend directory)
+    from dotenv import load_dotenv
+    from app.utils.telemetry import configure_logging
+
+    load_dotenv()
+    configure_logging()
+    if not pregenerator.acquire_leadership():
+        raise SystemExit(f"AI pre-generation is already running in another process (lock: {pregenerator.lock_path}).")
+    print(asyncio.run(pregenerator.run_once()))
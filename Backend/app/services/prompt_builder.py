@@ -0,0 +1,140 @@
+import os
+import math
+import logging
+import threading
+import pandas as pd
+
+# Token budget for the patient-data section of a prompt (instructions are not counted)
+PROMPT_TOKEN_BUDGET = int(os.getenv("AI_PROMPT_TOKEN_BUDGET", "1500"))
+# Rough chars-per-token for English/clinical text; used only to enforce the budget before sending
+CHARS_PER_TOKEN = 4
+# Values are never truncated below this many characters
+MIN_VALUE_CHARS = 60
+
+logger = logging.getLogger(__name__)
+
+_EMPTY = {"", "nan", "nat", "null"}
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _is_link(field, value):
+    return field.endswith(("_Links", "_Link", "_URL")) or value.startswith(("http://", "https://"))
+
+
+def _clean(value):
+    """Compact string for one value, or None if it carries no information."""
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        try:
+            if pd.isna(value):
+                return None
+        except (TypeError, ValueError):
+            pass
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+    text = " ".join(str(value).split())
+    # "None" is kept on purpose: for fields like Toxicities it is a finding, not missing data
+    return None if text.lower() in _EMPTY else text
+
+
+class PatientContext:
+    """
+    Pruned, ordered patient fields shared by every prompt.
+    Empty/NaN values and link columns are dropped; `truncated` and `dropped` record what the budget cut.
+    """
+
+    def __init__(self, fields, truncated=None, dropped=None):
+        self.fields = fields
+        self.truncated = truncated or []
+        self.dropped = dropped or []
+
+    def subset(self, keys):
+        return {k: self.fields[k] for k in keys if k in self.fields}
+
+    def render(self, keys=None):
+        fields = self.fields if keys is None else self.subset(keys)
+        return "\n".join(f"{k}: {v}" for k, v in fields.items())
+
+    def estimated_tokens(self, keys=None):
+        return estimate_tokens(self.render(keys))
+
+
+def build_patient_context(raw_patient_data, budget=PROMPT_TOKEN_BUDGET, protected=()):
+    """
+    Builds the PatientContext for one row.
+    Over budget, the longest values are shortened first, then unprotected fields are dropped from the end.
+    `protected` fields are never shortened or dropped.
+    """
+    fields = {}
+    for key, value in dict(raw_patient_data).items():
+        text = _clean(value)
+        if text is not None and not _is_link(str(key), text):
+            fields[str(key)] = text
+
+    context = PatientContext(fields)
+    while context.estimated_tokens() > budget:
+        # A value at MIN_VALUE_CHARS + 1 would come back the same length once the "…" is added
+        candidates = [k for k in fields if k not in protected and len(fields[k]) > MIN_VALUE_CHARS + 1]
+        if not candidates:
+            break
+        longest = max(candidates, key=lambda k: len(fields[k]))
+        fields[longest] = fields[longest][:max(MIN_VALUE_CHARS, len(fields[longest]) // 2)].rstrip() + "…"
+        if longest not in context.truncated:
+            context.truncated.append(longest)
+
+    for key in reversed(list(fields)):
+        if context.estimated_tokens() <= budget:
+            break
+        if key not in protected:
+            del fields[key]
+            context.dropped.append(key)
+    return context
+
+
+class TokenUsage:
+    """
+    Per-kind token accounting from the usage each provider reports with its responses.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._kinds = {}
+
+    def record(self, kind, model, estimated_prompt_tokens, response):
+        # `response` is an llm_provider.LLMResponse; providers that report no usage count as 0
+        prompt_tokens = getattr(response, "prompt_tokens", None) or 0
+        response_tokens = getattr(response, "response_tokens", None) or 0
+        thinking_tokens = getattr(response, "thinking_tokens", None) or 0
+        with self._lock:
+            stats = self._kinds.setdefault(kind, {
+                "calls": 0, "prompt_tokens": 0, "response_tokens": 0, "thinking_tokens": 0, "estimated_prompt_tokens": 0,
+            })
+            stats["calls"] += 1
+            stats["prompt_tokens"] += prompt_tokens
+            stats["response_tokens"] += response_tokens
+            stats["thinking_tokens"] += thinking_tokens
+            stats["estimated_prompt_tokens"] += estimated_prompt_tokens
+            stats["last"] = {
+                "model": model,
+                "prompt_tokens": prompt_tokens,
+                "response_tokens": response_tokens,
+                "thinking_tokens": thinking_tokens,
+            }
+        logger.info("Model token usage.", extra={
+            "kind": kind, "model": model, "prompt_tokens": prompt_tokens, "response_tokens": response_tokens,
+            "thinking_tokens": thinking_tokens, "estimated_prompt_tokens": estimated_prompt_tokens,
+        })
+
+    def get_stats(self):
+        with self._lock:
+            stats = {kind: dict(values) for kind, values in self._kinds.items()}
+        for values in stats.values():
+            values["avg_prompt_tokens"] = round(values["prompt_tokens"] / values["calls"], 1) if values["calls"] else 0
+        return stats
+
+
+token_usage = TokenUsage()
@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from app.services.ai_cache import AI_CACHE_PATH
+from app.utils.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# Section versions remembered for `since=` requests; older or unknown versions get the full document
+SYNC_HISTORY_SIZE = int(os.getenv("SYNC_HISTORY_SIZE", "10000"))
+# Shared by every worker, so `since=` works whichever worker answers (defaults to the AI cache's file)
+SYNC_HISTORY_PATH = os.getenv("SYNC_HISTORY_PATH", AI_CACHE_PATH)
+# New versions written between prunes of the on-disk history
+SYNC_PRUNE_EVERY = 500
+# Seconds between dataset version checks for open subscriptions
+SYNC_POLL_INTERVAL = float(os.getenv("SYNC_POLL_INTERVAL", "5"))
+# Seconds between keep-alive comments on an idle subscription
+SYNC_HEARTBEAT_INTERVAL = float(os.getenv("SYNC_HEARTBEAT_INTERVAL", "30"))
+
+# Top-level fields of a PatientRecord, in response order; AI output is part of header / cross_domain_insights
+SECTIONS = ("header", "disease_status", "timeline", "organ_risk", "comorbidities", "evidence", "cross_domain_insights")
+
+
+def section_hashes(record):
+    # Content hash of each section's JSON, so equal sections compare equal across dataset versions
+    return {
+        section: hashlib.blake2b(dumps(getattr(record, section)), digest_size=8).hexdigest()
+        for section in SECTIONS
+    }
+
+
+class SectionTracker:
+    """
+    Maps patient document versions to their section hashes.
+    A version is the hash of all section hashes, so it only changes when some section does.
+    The history has an in-memory LRU tier and a sqlite tier at SYNC_HISTORY_PATH. Behind several workers, or
+    after a restart, a version written by another process is still found, as long as it has not been pruned.
+    Without the disk tier (path unset or unwritable) versions are per process and other workers answer full=true.
+    """
+
+    def __init__(self, max_entries=SYNC_HISTORY_SIZE, path=SYNC_HISTORY_PATH):
+        self.max_entries = max_entries
+        self.path = path
+        self._versions = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._writes = 0
+
+    def _conn(self):
+        # Opened lazily, like the AI cache
+        if self._db is None and self.path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._db = sqlite3.connect(self.path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS section_versions (version TEXT PRIMARY KEY, hashes TEXT, created_at REAL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS section_versions_age ON section_versions (created_at)")
+                self._db.commit()
+            except Exception as e:
+                logger.warning("Section history disk tier unavailable (per-process only).", extra={"path": self.path, "error": str(e)})
+                self.path = None
+                self._db = None
+        return self._db
+
+    def _keep(self, version, hashes):
+        self._versions[version] = hashes
+        self._versions.move_to_end(version)
+        while len(self._versions) > self.max_entries:
+            self._versions.popitem(last=False)
+
+    def remember(self, hashes):
+        version = hashlib.blake2b("|".join(hashes[s] for s in SECTIONS).encode("utf-8"), digest_size=8).hexdigest()
+        with self._lock:
+            known = version in self._versions
+            self._keep(version, hashes)
+            db = None if known else self._conn()
+            if db is not None:
+                db.execute(
+                    "INSERT OR REPLACE INTO section_versions (version, hashes, created_at) VALUES (?, ?, ?)",
+                    (version, json.dumps(hashes), time.time()),
+                )
+                self._writes += 1
+                if self._writes % SYNC_PRUNE_EVERY == 0:
+                    db.execute(
+                        "DELETE FROM section_versions WHERE version NOT IN "
+                        "(SELECT version FROM section_versions ORDER BY created_at DESC LIMIT ?)",
+                        (self.max_entries,),
+                    )
+                db.commit()
+        return version
+
+    def lookup(self, version):
+        """Section hashes of `version`, or None if it is unknown (never seen, or pruned)."""
+        with self._lock:
+            hashes = self._versions.get(version)
+            if hashes is not None:
+                return hashes
+            db = self._conn()
+            if db is None:
+                return None
+            row = db.execute("SELECT hashes FROM section_versions WHERE version = ?", (version,)).fetchone()
+            if row is None:
+                return None
+            hashes = json.loads(row[0])
+            self._keep(version, hashes)
+            return hashes
+
+    def delta(self, record, since=None):
+        """
+        Returns {"version", "since", "full", "sections"}: the sections that differ from version `since`,
+        or every section (full=True) when `since` is missing or no longer known.
+        """
+        hashes = section_hashes(record)
+        previous = self.lookup(since) if since else None
+        version = self.remember(hashes)
+        if previous is None:
+            changed = list(SECTIONS)
+        else:
+            changed = [section for section in SECTIONS if previous.get(section) != hashes[section]]
+        return {
+            "version": version,
+            "since": since,
+            "full": previous is None,
+            "sections": {section: getattr(record, section) for section in changed},
+        }
+
+
+section_tracker = SectionTracker()
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+# Query parameter -> dataset column for the categorical cohort fields
+COHORT_FIELDS = {
+    "metastatic_status": "Metastatic_Status",
+    "new_lesions": "New_Lesions",
+    "response": "Response",
+    "recist": "RECIST",
+    "primary_diagnosis": "Primary_Diagnosis",
+    "renal_flag": "Renal_Flag",
+    "liver_flag": "Liver_Flag",
+}
+# Driver mutations (same list as the genomics section); each also gets "positive"/"negative" bitmaps
+MUTATION_FIELDS = {
+    "egfr": "EGFR",
+    "alk": "ALK",
+    "ros1": "ROS1",
+    "kras": "KRAS",
+    "braf": "BRAF",
+    "met_exon14": "MET_Exon14",
+    "ret": "RET",
+    "her2": "HER2",
+    "ntrk": "NTRK",
+}
+
+_NEGATIVE = {"negative", "neg", "not detected", "wild type", "wildtype", "wt", "none"}
+_UNKNOWN = {"", "nan", "not tested", "unknown", "na", "n/a"}
+
+
+def _normalize(series):
+    return series.astype(str).str.strip().str.lower().fillna("")
+
+
+class CohortIndex:
+    """
+    Per-value boolean arrays over the structured fields of one dataset version.
+    bitmaps[field][value] is True for the rows where `field` equals `value` (lower-cased).
+    A query ORs the bitmaps of the values given for a field, then ANDs the fields together.
+    """
+
+    def __init__(self, bitmaps, ecog, ids):
+        self.bitmaps = bitmaps
+        self.ecog = ecog
+        self.ids = ids
+
+    def _ecog_bitmap(self, ecog_min=None, ecog_max=None):
+        # OR of the per-score bitmaps in range; rows without a score never match a range
+        mask = np.zeros(len(self.ids), dtype=bool)
+        low = 0 if ecog_min is None else ecog_min
+        high = 5 if ecog_max is None else ecog_max
+        for score, bitmap in self.ecog.items():
+            if low <= score <= high:
+                mask |= bitmap
+        return mask
+
+    def match(self, filters=None, ecog_min=None, ecog_max=None):
+        """Boolean array of the rows matching every filter. `filters` maps field -> accepted values."""
+        mask = np.ones(len(self.ids), dtype=bool)
+        for field, values in (filters or {}).items():
+            if not values:
+                continue
+            bitmaps = self.bitmaps.get(field)
+            if bitmaps is None:
+                raise KeyError(field)
+            field_mask = np.zeros(len(self.ids), dtype=bool)
+            for value in values:
+                bitmap = bitmaps.get(str(value).strip().lower())
+                if bitmap is not None:
+                    field_mask |= bitmap
+            mask &= field_mask
+        if ecog_min is not None or ecog_max is not None:
+            mask &= self._ecog_bitmap(ecog_min, ecog_max)
+        return mask
+
+    def counts(self, mask):
+        """Per-field value counts within the matched rows (facets for narrowing a cohort)."""
+        facets = {}
+        for field, bitmaps in self.bitmaps.items():
+            facets[field] = {value: int(np.count_nonzero(bitmap & mask)) for value, bitmap in bitmaps.items()}
+        facets["ecog"] = {str(score): int(np.count_nonzero(bitmap & mask)) for score, bitmap in self.ecog.items()}
+        return facets
+
+
+def ecog_scores(values):
+    """
+    ECOG score per value: "ECOG 2" / "2" -> 2; a range takes its worst score ("ECOG 1-2" -> 2).
+    NaN where there is no 0-5 digit. Shared by the cohort index and the ecog alert rule so they agree.
+    """
+    text = pd.Series(values).astype(str)
+    digits = text.str.extractall(r'([0-5])')[0].astype(int)
+    return digits.groupby(level=0).max().reindex(text.index).astype(float)
+
+def build_cohort_index(snapshot):
+    df = snapshot.df
+    bitmaps = {}
+
+    for field, column in {**COHORT_FIELDS, **MUTATION_FIELDS}.items():
+        if column not in df.columns:
+            bitmaps[field] = {}
+            continue
+        values = _normalize(df[column]).to_numpy()
+        field_bitmaps = {value: values == value for value in pd.unique(values) if value not in _UNKNOWN}
+        if field in MUTATION_FIELDS:
+            negative = np.isin(values, list(_NEGATIVE))
+            field_bitmaps["negative"] = negative
+            field_bitmaps["positive"] = ~negative & ~np.isin(values, list(_UNKNOWN))
+        bitmaps[field] = field_bitmaps
+
+    ecog = {}
+    if "Performance_Status" in df.columns:
+        scores = ecog_scores(df["Performance_Status"]).fillna(-1).astype(int).to_numpy()
+        ecog = {int(score): scores == score for score in np.unique(scores) if score >= 0}
+
+    if "Patient_ID" in df.columns:
+        ids = df["Patient_ID"].astype(str).to_numpy()
+    else:
+        ids = np.arange(len(df)).astype(str)
+    return CohortIndex(bitmaps, ecog, ids)
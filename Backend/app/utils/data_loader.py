@@ -1,49 +1,181 @@
 import pandas as pd
 import os
+import time
+import logging
+import threading
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
+from app.utils.date_normalizer import normalize_dates
+from app.utils.snapshot_cache import load_snapshot, save_snapshot
+from app.utils.sheets_sync import SheetsSync
+from app.utils.telemetry import timed
 
-# Adjust path purely for local fallback or reference
-csv_path = os.path.join(os.getcwd(), "data/Actual_Dataset.csv")
+logger = logging.getLogger(__name__)
+
+# Adjust path purely for local fallback or reference (DATASET_CSV_PATH overrides, e.g. for benchmarks)
+csv_path = os.getenv("DATASET_CSV_PATH", os.path.join(os.getcwd(), "data/Actual_Dataset.csv"))
 # Path to service account key
 creds_path = os.path.join(os.getcwd(), "service_account.json")
 # Sheet Name (could be in env, default to "Actual_Dataset")
 SHEET_NAME = os.getenv("GOOGLE_SHEET_NAME", "Actual_Dataset")
+# Seconds between background Sheet revision checks (each check is a Drive API round trip)
+SHEET_CHECK_INTERVAL = float(os.getenv("GOOGLE_SHEET_CHECK_INTERVAL", "30"))
+# Seconds between attempts while the Sheet has never loaded; requests use the CSV in between
+SHEET_RETRY_INTERVAL = float(os.getenv("GOOGLE_SHEET_RETRY_INTERVAL", "60"))
 
-def load_data():
+
+class DatasetSnapshot:
     """
-    Loads patient data.
-    Priority 1: Google Sheets (if service_account.json exists)
-    Priority 2: Local CSV (data/Actual_Dataset.csv)
+    Immutable view of the dataset at one point in time.
+    Treat `df` as read-only - it is shared by every request holding this snapshot.
+    `dates` holds the typed date columns (see date_normalizer), aligned row-for-row with `df`.
     """
-    # 1. Try Google Sheets
-    if os.path.exists(creds_path):
+
+    def __init__(self, df, version, fingerprint, source, dates=None):
+        self.df = df
+        self.dates = dates if dates is not None else normalize_dates(df)
+        self.version = version
+        self.fingerprint = fingerprint
+        self.source = source
+        self.loaded_at = time.time()
+        self._derived = {}
+        # Re-entrant: builders may derive other values (e.g. documents use the lab table)
+        self._derived_lock = threading.RLock()
+
+    def derive(self, key, builder):
+        """
+        Returns a value computed once per snapshot (indexes, projections...).
+        `builder` receives the snapshot and is only called on first access.
+        """
         try:
-            scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-            creds = ServiceAccountCredentials.from_json_keyfile_name(creds_path, scope)
-            client = gspread.authorize(creds)
-            
-            # Open Sheet
-            # Note: This requires the sheet to be shared with the client_email in json
-            sheet = client.open(SHEET_NAME).sheet1
-            
-            # Get all records
-            data = sheet.get_all_records()
-            df = pd.DataFrame(data)
-            print(f"Successfully loaded data from Google Sheet: {SHEET_NAME}")
-            return df
-        except Exception as e:
-            print(f"Google Sheet load failed (falling back to CSV): {e}")
-
-    # 2. Fallback to Local CSV
-    try:
+            return self._derived[key]
+        except KeyError:
+            pass
+        with self._derived_lock:
+            if key not in self._derived:
+                self._derived[key] = builder(self)
+            return self._derived[key]
+
+
+class DatasetStore:
+    """
+    Process-wide dataset cache.
+    The source is only re-read when its fingerprint changes (CSV mtime/size or Sheet revision).
+    Sheet revisions are checked in the background (see SheetsSync), so requests never wait on the Sheets API after the first load.
+    A new snapshot is fully built before it replaces the current one, so readers never see a half-loaded frame.
+    """
+
+    def __init__(self, sheet_client_factory=None):
+        self._snapshot = None
+        self._version = 0
+        self._refresh_lock = threading.Lock()
+        # An injected client factory (e.g. FakeSheetsClient) enables Sheets without service_account.json
+        self._sheets_configured = sheet_client_factory is not None
+        self.sheets = SheetsSync(
+            sheet_client_factory or self._sheet_client,
+            SHEET_NAME,
+            check_interval=SHEET_CHECK_INTERVAL,
+            on_update=self._on_sheet_update,
+        )
+
+    def _sheet_client(self):
+        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+        creds = ServiceAccountCredentials.from_json_keyfile_name(creds_path, scope)
+        return gspread.authorize(creds)
+
+    def _csv_fingerprint(self):
         abs_path = os.path.abspath(csv_path)
         if not os.path.exists(abs_path):
             raise FileNotFoundError(f"Dataset not found at: {abs_path}")
-            
-        df = pd.read_csv(abs_path)
-        print("Loaded data from local CSV.")
-        return df
-    except Exception as e:
-        print(f"Error loading data: {str(e)}")
-        raise e
+        stat = os.stat(abs_path)
+        return f"csv:{abs_path}:{stat.st_mtime_ns}:{stat.st_size}"
+
+    def _publish(self, df, fingerprint, source):
+        # Normalize before swapping so readers only ever see a complete snapshot
+        dates = normalize_dates(df)
+        self._version += 1
+        self._snapshot = DatasetSnapshot(df, self._version, fingerprint, source, dates)
+        return self._snapshot
+
+    def _on_sheet_update(self, fingerprint, df):
+        # Called from the background sync thread once a new revision is fully loaded
+        with self._refresh_lock:
+            if self._snapshot is None or self._snapshot.fingerprint != fingerprint:
+                self._publish(df, fingerprint, "sheet")
+
+    def _refresh_from_sheet(self, current):
+        loaded = self.sheets.current
+        if loaded is None:
+            # First load has nothing to serve yet, so it waits for the sheet - but a failing sheet is
+            # only retried every SHEET_RETRY_INTERVAL, not by every request under the refresh lock
+            if time.time() - self.sheets.last_attempt < SHEET_RETRY_INTERVAL:
+                raise RuntimeError(f"Google Sheet unavailable, retrying later ({self.sheets.last_error})")
+            self.sheets.sync()
+            loaded = self.sheets.current
+        else:
+            # Stale-while-revalidate: serve the last good data, check the revision in the background
+            self.sheets.revalidate_in_background()
+
+        # One read of the (fingerprint, df) pair, so the published snapshot is never a mix of revisions
+        fingerprint, df = loaded
+        if current is None or current.fingerprint != fingerprint:
+            return self._publish(df, fingerprint, "sheet")
+        return current
+
+    def _refresh_from_csv(self, current):
+        fingerprint = self._csv_fingerprint()
+        if current is not None and current.fingerprint == fingerprint:
+            return current
+
+        with timed("dataset", source="csv"):
+            df = load_snapshot(fingerprint)
+            if df is not None:
+                logger.info("Loaded data from dataset snapshot.", extra={"fingerprint": fingerprint})
+                return self._publish(df, fingerprint, "csv")
+
+            df = pd.read_csv(os.path.abspath(csv_path))
+            logger.info("Loaded data from local CSV.", extra={"path": os.path.abspath(csv_path), "rows": len(df)})
+            save_snapshot(df, fingerprint, "csv")
+            return self._publish(df, fingerprint, "csv")
+
+    def get_snapshot(self):
+        """
+        Returns the current snapshot, reloading the source first if it changed.
+        Priority 1: Google Sheets (if service_account.json exists)
+        Priority 2: Local CSV (data/Actual_Dataset.csv)
+        """
+        with self._refresh_lock:
+            current = self._snapshot
+
+            # 1. Try Google Sheets
+            if self._sheets_configured or os.path.exists(creds_path):
+                try:
+                    return self._refresh_from_sheet(current)
+                except Exception as e:
+                    logger.warning("Google Sheet load failed (falling back to CSV).", extra={"error": str(e)})
+
+            # 2. Fallback to Local CSV
+            try:
+                return self._refresh_from_csv(current)
+            except Exception as e:
+                if current is not None:
+                    # Keep serving the last good snapshot rather than failing every request
+                    logger.error("Error refreshing data; serving last good version.", extra={"dataset_version": current.version, "error": str(e)})
+                    return current
+                logger.error("Error loading data.", extra={"error": str(e)})
+                raise e
+
+
+dataset_store = DatasetStore()
+
+
+def get_snapshot():
+    return dataset_store.get_snapshot()
+
+
+def load_data():
+    """
+    Loads patient data.
+    Returns the shared DataFrame of the current snapshot - do not mutate it.
+    """
+    return dataset_store.get_snapshot().df
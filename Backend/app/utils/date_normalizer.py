@@ -0,0 +1,113 @@
+import pandas as pd
+
+# Source column -> (where the date sits in the text, dayfirst)
+# "leading": "2024-01-01 Description" / "12-03-2022"; "trailing_year": "RUL lobectomy 2023"
+DATE_FIELDS = {
+    "Diagnosis_Date": ("leading", True),
+    "Biopsy_Date": ("leading", True),
+    "Latest_Brain_MRI": ("leading", False),
+    "Latest_PET_CT": ("leading", False),
+    "Latest_CT_Chest": ("leading", False),
+    "Treatment_Dates": ("leading", False),
+    "Surgery": ("trailing_year", False),
+}
+
+_YEAR = r'\d{4}'
+_MONTH = r'\d{4}-\d{1,2}'
+_ISO_DAY = r'\d{4}-\d{1,2}-\d{1,2}'
+
+
+def _clean_text(series):
+    text = series.astype(str).str.strip()
+    return text.where(series.notna() & (text.str.lower() != 'nan') & (text != ''))
+
+
+def _parse_tokens(tokens, dayfirst):
+    """Parses date tokens into (datetime, precision). Unparseable tokens give NaT/None."""
+    dates = pd.Series(pd.NaT, index=tokens.index, dtype='datetime64[ns]')
+    precision = pd.Series(None, index=tokens.index, dtype=object)
+    present = tokens.notna()
+    # fillna keeps the .str accessor valid when a column has no values at all
+    filled = tokens.fillna('').astype(str)
+
+    is_year = present & filled.str.fullmatch(_YEAR)
+    is_month = present & filled.str.fullmatch(_MONTH)
+    is_iso = present & filled.str.fullmatch(_ISO_DAY)
+    is_other = present & ~(is_year | is_month | is_iso)
+
+    if is_year.any():
+        dates[is_year] = pd.to_datetime(tokens[is_year], format='%Y', errors='coerce')
+    if is_month.any():
+        dates[is_month] = pd.to_datetime(tokens[is_month], format='%Y-%m', errors='coerce')
+    if is_iso.any():
+        # ISO strings are year-first even in day-first columns
+        dates[is_iso] = pd.to_datetime(tokens[is_iso], format='%Y-%m-%d', errors='coerce')
+    if is_other.any():
+        dates[is_other] = pd.to_datetime(tokens[is_other], format='mixed', dayfirst=dayfirst, errors='coerce')
+
+    parsed = dates.notna()
+    precision[parsed & is_year] = 'year'
+    precision[parsed & is_month] = 'month'
+    precision[parsed & (is_iso | is_other)] = 'day'
+    return dates, precision
+
+
+def normalize_dates(df):
+    """
+    One vectorized pass over every date-bearing column.
+    Returns a frame aligned with `df` holding, per field:
+      <field>            datetime64 (NaT if missing/unparseable)
+      <field>_precision  'day' | 'month' | 'year' | None
+      <field>_token      the raw date token, for display when it could not be parsed
+      <field>_text       description attached to the date (None if there is none)
+    """
+    out = {}
+    for field, (layout, dayfirst) in DATE_FIELDS.items():
+        if field not in df.columns:
+            text = pd.Series(None, index=df.index, dtype=object)
+        else:
+            text = _clean_text(df[field])
+
+        filled = text.fillna('')
+        if layout == "trailing_year":
+            parts = filled.str.extract(r'^(?:(.*?)\s+)?(\d{4})$')
+            token = parts[1].where(text.notna())
+            description = parts[0].where(token.notna(), text)
+        else:
+            parts = filled.str.partition(' ')
+            token = parts[0].where(text.notna())
+            description = parts[2].str.strip(' -:').where(text.notna())
+
+        dates, precision = _parse_tokens(token, dayfirst)
+        out[field] = dates
+        out[f"{field}_precision"] = precision
+        out[f"{field}_token"] = token
+        out[f"{field}_text"] = description.where(description.fillna('') != '')
+
+    return pd.DataFrame(out, index=df.index)
+
+
+def format_date(value, precision):
+    """Display string matching the precision the source gave ('2024-01-05', '2024-01', '2024')."""
+    if precision == 'day':
+        return value.strftime('%Y-%m-%d')
+    if precision == 'month':
+        return value.strftime('%Y-%m')
+    if precision == 'year':
+        return value.strftime('%Y')
+    return ''
+
+
+def date_sort_key(value, precision):
+    """
+    Chronological key for timeline events.
+    Month-only dates sort before any day in that month; year-only dates after any date in that year.
+    Undated events come first.
+    """
+    if precision == 'day':
+        return (value.year, value.month, value.day)
+    if precision == 'month':
+        return (value.year, value.month, 0)
+    if precision == 'year':
+        return (value.year, 13, 32)
+    return (0, 0, 0)
@@ -0,0 +1,139 @@
+import re
+import numpy as np
+import pandas as pd
+
+# Dashboard lab section -> dataset column
+LAB_PANELS = {"cbc": "CBC", "cmp": "CMP", "electrolytes": "Electrolytes"}
+
+# "Hb10.8" -> ("Hb", "10.8"): label is everything before the first digit
+_LABEL_VALUE = re.compile(r'^(\D*)(\d.*)$', re.DOTALL)
+_NUMBER = re.compile(r'(-?\d+(?:\.\d+)?)')
+
+
+def parse_lab_text(text_data):
+    """
+    Parses one lab string like "Hb10.8 WBC3.4 Plt165" or "Sodium: 140|Potassium: 4.2".
+    Returns list of { label, value, is_abnormal }. Same rules as the column-wide parser below.
+    """
+    if not text_data or str(text_data).lower() == 'nan':
+        return []
+    text_data = str(text_data)
+
+    # Try splitting by pipe first if structure exists
+    parts = text_data.replace(';', '|').replace(',', '|').split('|')
+    # If no pipes, maybe it's space separated like "Hb10.8 WBC3.4"
+    if len(parts) == 1 and ' ' in text_data:
+        parts = text_data.split(' ')
+
+    items = []
+    for p in parts:
+        p = p.strip()
+        if not p:
+            continue
+        if ':' in p:
+            label, val = p.split(':', 1)
+        else:
+            match = _LABEL_VALUE.match(p)
+            label, val = match.groups() if match else (p, "")
+        items.append({"label": label.strip(), "value": val.strip(), "is_abnormal": False})
+    return items
+
+
+def _parse_column(text):
+    """Column-wide version of parse_lab_text. Returns (row, label, raw value) per token."""
+    text = text.astype(str)
+    present = (text != '') & (text.str.lower() != 'nan')
+    text = text[present]
+
+    normalized = text.str.replace(';', '|', regex=False).str.replace(',', '|', regex=False)
+    has_sep = normalized.str.contains('|', regex=False)
+    tokens = normalized.str.split('|', regex=False).where(has_sep, text.str.split(' ', regex=False))
+
+    tokens = tokens.explode().str.strip()
+    tokens = tokens[tokens.notna() & (tokens != '')]
+
+    has_colon = tokens.str.contains(':', regex=False)
+    by_colon = tokens.str.partition(':')
+    by_digit = tokens.str.extract(_LABEL_VALUE)
+
+    label = by_colon[0].where(has_colon, by_digit[0].fillna(tokens)).str.strip()
+    value = by_colon[2].where(has_colon, by_digit[1].fillna('')).str.strip()
+    return pd.DataFrame({"row": tokens.index.to_numpy(), "label": label.to_numpy(), "raw": value.to_numpy()})
+
+
+class LabTable:
+    """
+    Long-format lab table for one dataset version:
+    row (position in the snapshot), patient_id, panel, label, value (float or NaN), raw (value text).
+    """
+
+    def __init__(self, table):
+        self.table = table
+        rows = table["row"].to_numpy()
+        # Table is sorted by row, so each patient's labs are one contiguous slice
+        if len(rows):
+            starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+            ends = np.r_[starts[1:], len(rows)]
+            self._slices = {int(rows[s]): (int(s), int(e)) for s, e in zip(starts, ends)}
+        else:
+            self._slices = {}
+
+    def for_row(self, pos):
+        """Lab sections for one patient in the dashboard shape."""
+        labs = {panel: [] for panel in LAB_PANELS}
+        bounds = self._slices.get(pos)
+        if bounds is None:
+            return labs
+        part = self.table.iloc[bounds[0]:bounds[1]]
+        for panel, label, raw in zip(part["panel"], part["label"], part["raw"]):
+            labs[panel].append({"label": label, "value": raw, "is_abnormal": False})
+        return labs
+
+    def by_row(self, n_rows):
+        """for_row of every row 0..n_rows-1, from one pass over the table."""
+        labs = [{panel: [] for panel in LAB_PANELS} for _ in range(n_rows)]
+        table = self.table
+        for pos, panel, label, raw in zip(table["row"].tolist(), table["panel"], table["label"], table["raw"]):
+            labs[pos][panel].append({"label": label, "value": raw, "is_abnormal": False})
+        return labs
+
+    def query(self, label=None, panel=None):
+        """Cohort-level slice, e.g. every patient's Hb. Label match is case-insensitive."""
+        mask = np.ones(len(self.table), dtype=bool)
+        if label is not None:
+            mask &= (self.table["label"].str.lower() == label.lower()).to_numpy()
+        if panel is not None:
+            mask &= (self.table["panel"] == panel).to_numpy()
+        return self.table[mask]
+
+
+def build_lab_table(snapshot):
+    df = snapshot.df
+    frames = []
+    for order, (panel, column) in enumerate(LAB_PANELS.items()):
+        if column not in df.columns:
+            continue
+        parsed = _parse_column(df[column].reset_index(drop=True))
+        parsed["panel"] = panel
+        parsed["panel_order"] = order
+        frames.append(parsed)
+
+    if frames:
+        table = pd.concat(frames, ignore_index=True)
+        # Stable sort keeps token order within each panel
+        table = table.sort_values(["row", "panel_order"], kind="stable").reset_index(drop=True)
+    else:
+        table = pd.DataFrame({
+            "row": pd.Series(dtype=int),
+            "label": pd.Series(dtype=object),
+            "raw": pd.Series(dtype=object),
+            "panel": pd.Series(dtype=object),
+        })
+
+    if "Patient_ID" in df.columns:
+        table["patient_id"] = df["Patient_ID"].astype(str).to_numpy()[table["row"].to_numpy(dtype=int)]
+    else:
+        table["patient_id"] = table["row"].astype(str)
+    table["value"] = pd.to_numeric(table["raw"].str.extract(_NUMBER, expand=False), errors="coerce")
+    table["panel"] = table["panel"].astype("category")
+    return LabTable(table[["row", "patient_id", "panel", "label", "value", "raw"]])
@@ -0,0 +1,42 @@
+import dataclasses
+import json
+import numpy as np
+from fastapi.responses import JSONResponse
+from app.utils.telemetry import timed
+
+# orjson is optional: it serializes the slotted records (see patient_records) natively and several times
+# faster than the stdlib; without it the same output comes from json.dumps
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+def _default(value):
+    # Types neither encoder handles natively
+    if dataclasses.is_dataclass(value):
+        return {field: getattr(value, field) for field in value.__dataclass_fields__}
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def dumps(content):
+    """Compact UTF-8 JSON bytes for API payloads (records, dicts, lists, numpy scalars)."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+    # Same output as orjson, except NaN is rejected here (as JSONResponse does) where orjson writes null
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Default response class: encodes with `dumps`, timed as the "serialize" stage.
+    Endpoints on hot paths return it directly, which also skips FastAPI's jsonable_encoder pass.
+    """
+
+    def render(self, content):
+        with timed("serialize"):
+            return dumps(content)
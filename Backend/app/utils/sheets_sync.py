@@ -0,0 +1,192 @@
+import time
+import logging
+import threading
+import pandas as pd
+from gspread.utils import numericise_all
+from app.utils.snapshot_cache import load_snapshot, save_snapshot
+from app.utils.telemetry import timed
+
+logger = logging.getLogger(__name__)
+
+
+class SheetsSync:
+    """
+    Keeps one authorized Sheets client and the last good copy of the sheet.
+    sync() checks the spreadsheet revision first and only downloads values when it changed.
+    revalidate_in_background() lets requests keep serving the last good data while a refresh runs.
+
+    The Sheets API has no per-range change feed, so a new revision costs one values fetch;
+    rows are then diffed against the previous fetch so unchanged rows are not re-processed,
+    and the changed row ranges are reported.
+    """
+
+    def __init__(self, client_factory, sheet_name, check_interval=30.0, on_update=None):
+        self.client_factory = client_factory
+        self.sheet_name = sheet_name
+        self.check_interval = check_interval
+        self.on_update = on_update
+        # (fingerprint, df) of the last good fetch, replaced as one value so readers never pair a new
+        # fingerprint with old rows
+        self.current = None
+        self.last_check = 0.0
+        self.last_attempt = 0.0
+        self.last_error = None
+        self.changed_ranges = []
+        self._client = None
+        self._spreadsheet = None
+        self._rows = []
+        self._records = {}
+        self._sync_lock = threading.Lock()
+        self._refreshing = False
+
+    @property
+    def fingerprint(self):
+        return self.current[0] if self.current is not None else None
+
+    @property
+    def df(self):
+        return self.current[1] if self.current is not None else None
+
+    def _open(self):
+        # Authorize and open once; both are reused for every later check
+        if self._spreadsheet is None:
+            if self._client is None:
+                self._client = self.client_factory()
+            # Note: This requires the sheet to be shared with the client_email in json
+            self._spreadsheet = self._client.open(self.sheet_name)
+        return self._spreadsheet
+
+    def _revision(self, spreadsheet):
+        # Drive "modifiedTime" changes on every edit of the spreadsheet
+        if hasattr(spreadsheet, "get_lastUpdateTime"):
+            return spreadsheet.get_lastUpdateTime()
+        return spreadsheet.lastUpdateTime
+
+    def _changed_ranges(self, rows):
+        """1-based sheet row ranges (header is row 1) that differ from the previous fetch."""
+        ranges = []
+        start = None
+        for i in range(max(len(rows), len(self._rows))):
+            changed = i >= len(rows) or i >= len(self._rows) or rows[i] != self._rows[i]
+            if changed and start is None:
+                start = i
+            elif not changed and start is not None:
+                ranges.append((start + 2, i + 1))
+                start = None
+        if start is not None:
+            ranges.append((start + 2, max(len(rows), len(self._rows)) + 1))
+        return ranges
+
+    def _to_frame(self, values):
+        # Same conversion as Worksheet.get_all_records(), reusing records of unchanged rows
+        if not values:
+            return pd.DataFrame(), [], {}
+        header, rows = values[0], [tuple(row) for row in values[1:]]
+        records = {}
+        data = []
+        for row in rows:
+            record = records.get(row) or self._records.get(row)
+            if record is None:
+                record = dict(zip(header, numericise_all(list(row), empty2zero=False, default_blank="")))
+            records[row] = record
+            data.append(record)
+        return pd.DataFrame(data, columns=header), rows, records
+
+    def sync(self):
+        """
+        Checks the revision and fetches the sheet if it changed.
+        Returns (fingerprint, df) for new data, or None if the revision is unchanged.
+        """
+        with self._sync_lock:
+            self.last_attempt = time.time()
+            try:
+                spreadsheet = self._open()
+                revision = self._revision(spreadsheet)
+            except Exception as e:
+                # Expired credentials or a closed session: re-authorize on the next attempt
+                self._client = None
+                self._spreadsheet = None
+                self.last_error = str(e)
+                raise
+            self.last_check = time.time()
+            fingerprint = f"sheet:{self.sheet_name}:{revision}"
+            if fingerprint == self.fingerprint:
+                return None
+
+            with timed("dataset", source="sheet"):
+                df = load_snapshot(fingerprint)
+                if df is None:
+                    values = spreadsheet.sheet1.get_all_values()
+                    df, rows, records = self._to_frame(values)
+                    self.changed_ranges = self._changed_ranges(rows)
+                    self._rows, self._records = rows, records
+                    logger.info("Loaded data from Google Sheet.", extra={"sheet": self.sheet_name, "revision": revision, "changed_rows": self.changed_ranges})
+                    save_snapshot(df, fingerprint, "sheet")
+                else:
+                    # The raw rows behind the snapshot are unknown, so the whole sheet counts as changed,
+                    # and the next fetch is diffed against nothing rather than an older revision
+                    self.changed_ranges = [(2, len(df) + 1)] if len(df) else []
+                    self._rows, self._records = [], {}
+                    logger.info("Loaded Google Sheet revision from dataset snapshot.", extra={"sheet": self.sheet_name, "revision": revision})
+
+            self.current = (fingerprint, df)
+            self.last_error = None
+            return fingerprint, df
+
+    def revalidate_in_background(self):
+        """Starts a revision check if one is due; never blocks the caller."""
+        if self._refreshing or time.time() - self.last_check < self.check_interval:
+            return False
+        self._refreshing = True
+        threading.Thread(target=self._background_sync, name="sheets-sync", daemon=True).start()
+        return True
+
+    def _background_sync(self):
+        try:
+            result = self.sync()
+            if result is not None and self.on_update is not None:
+                self.on_update(*result)
+        except Exception as e:
+            self.last_error = str(e)
+            self.last_check = time.time()
+            logger.warning("Google Sheet refresh failed (serving last good data).", extra={"sheet": self.sheet_name, "error": str(e)})
+        finally:
+            self._refreshing = False
+
+
+class FakeSheetsClient:
+    """
+    In-memory stand-in for an authorized gspread client, for tests and offline runs.
+    `set_values` replaces the sheet contents and bumps the revision like an edit would.
+    """
+
+    def __init__(self, values):
+        self.spreadsheet = _FakeSpreadsheet(values)
+        self.open_calls = 0
+
+    def open(self, name):
+        self.open_calls += 1
+        return self.spreadsheet
+
+    def set_values(self, values):
+        self.spreadsheet.sheet1.values = [list(row) for row in values]
+        self.spreadsheet.revision += 1
+
+
+class _FakeWorksheet:
+    def __init__(self, values):
+        self.values = [list(row) for row in values]
+        self.fetches = 0
+
+    def get_all_values(self):
+        self.fetches += 1
+        return [list(row) for row in self.values]
+
+
+class _FakeSpreadsheet:
+    def __init__(self, values):
+        self.sheet1 = _FakeWorksheet(values)
+        self.revision = 1
+
+    def get_lastUpdateTime(self):
+        return f"rev-{self.revision}"
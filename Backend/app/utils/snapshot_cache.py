@@ -0,0 +1,106 @@
+import os
+import json
+import time
+import hashlib
+import logging
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # Snapshots are an optimisation; without pyarrow we always parse the source
+    pa = None
+    feather = None
+
+logger = logging.getLogger(__name__)
+
+# Binary snapshots of the parsed dataset, keyed by source fingerprint
+SNAPSHOT_DIR = os.getenv("DATASET_SNAPSHOT_DIR", os.path.join(os.getcwd(), "data/.snapshots"))
+# Snapshots kept on disk (older ones are pruned after each write)
+SNAPSHOT_KEEP = int(os.getenv("DATASET_SNAPSHOT_KEEP", "3"))
+# Bump when the on-disk layout changes
+SNAPSHOT_FORMAT = 1
+
+
+def _paths(fingerprint):
+    name = hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:16]
+    base = os.path.join(SNAPSHOT_DIR, name)
+    return base + ".feather", base + ".json"
+
+
+def _schema(df):
+    return {str(col): str(dtype) for col, dtype in df.dtypes.items()}
+
+
+def load_snapshot(fingerprint):
+    """
+    Returns the DataFrame stored for `fingerprint`, or None if there is no valid snapshot.
+    The Arrow file is memory-mapped, so workers on one host share the page cache.
+    """
+    if feather is None:
+        return None
+    data_path, meta_path = _paths(fingerprint)
+    if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+        return None
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("format") != SNAPSHOT_FORMAT or meta.get("fingerprint") != fingerprint:
+            return None
+        df = feather.read_table(data_path, memory_map=True).to_pandas()
+        if _schema(df) != meta.get("schema"):
+            logger.info("Dataset snapshot schema mismatch; re-reading source.", extra={"fingerprint": fingerprint})
+            return None
+        return df
+    except Exception as e:
+        logger.warning("Dataset snapshot unreadable; re-reading source.", extra={"fingerprint": fingerprint, "error": str(e)})
+        return None
+
+
+def save_snapshot(df, fingerprint, source):
+    """
+    Writes `df` as an Arrow/Feather file plus a JSON sidecar (fingerprint, schema).
+    The file is read back and compared before it is kept, so a snapshot never changes what requests see.
+    """
+    if feather is None:
+        return False
+    data_path, meta_path = _paths(fingerprint)
+    try:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        tmp_path = data_path + ".tmp"
+        feather.write_feather(table, tmp_path, compression="uncompressed")
+
+        if not feather.read_table(tmp_path).to_pandas().equals(df):
+            os.remove(tmp_path)
+            logger.info("Dataset snapshot does not round-trip exactly; not caching it.", extra={"fingerprint": fingerprint})
+            return False
+
+        os.replace(tmp_path, data_path)
+        meta = {
+            "format": SNAPSHOT_FORMAT,
+            "fingerprint": fingerprint,
+            "source": source,
+            "rows": len(df),
+            "schema": _schema(df),
+            "created_at": time.time(),
+        }
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+        _prune()
+        return True
+    except Exception as e:
+        # Mixed-type columns (e.g. from Sheets) may not convert to Arrow; the source path still works
+        logger.info("Dataset snapshot not written.", extra={"fingerprint": fingerprint, "error": str(e)})
+        return False
+
+
+def _prune():
+    metas = [os.path.join(SNAPSHOT_DIR, f) for f in os.listdir(SNAPSHOT_DIR) if f.endswith(".json")]
+    metas.sort(key=os.path.getmtime, reverse=True)
+    for meta_path in metas[SNAPSHOT_KEEP:]:
+        for path in (meta_path, meta_path[:-len(".json")] + ".feather"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# "json" (one object per line, for log shipping) or "text"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+# Histogram buckets in seconds: sub-millisecond lookups up to slow model calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 60.0)
+
+# Attributes every LogRecord has; anything else was passed through `extra=` and is logged as a field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def configure_logging():
+    handler = logging.StreamHandler()
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+
+
+class Histogram:
+    """
+    Prometheus-style histogram (cumulative buckets, sum, count) keyed by label values.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def _labels(self, key, extra=None):
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: {"buckets": list(s["buckets"]), "sum": s["sum"], "count": s["count"]} for key, s in self._series.items()}
+        for key, s in sorted(series.items()):
+            for bound, count in zip(self.buckets, s["buckets"]):
+                lines.append(f"{self.name}_bucket{self._labels(key, ('le', repr(bound)))} {count}")
+            lines.append(f"{self.name}_bucket{self._labels(key, ('le', '+Inf'))} {s['count']}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {s['sum']}")
+            lines.append(f"{self.name}_count{self._labels(key)} {s['count']}")
+        return "\n".join(lines)
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status"),
+)
+STAGE_DURATION = Histogram(
+    "stage_duration_seconds", "Time spent in one processing stage.", ("stage", "source"),
+)
+MODEL_ATTEMPT_DURATION = Histogram(
+    "model_attempt_duration_seconds", "Latency of one LLM call by model and outcome.", ("model", "outcome"),
+)
+METRICS = [REQUEST_DURATION, STAGE_DURATION, MODEL_ATTEMPT_DURATION]
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in METRICS) + "\n"
+
+
+# Stage timings of the current request: list of (name, seconds, description) or None outside a request
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def start_request_timings():
+    timings = []
+    _request_timings.set(timings)
+    return timings
+
+
+def _add_timing(name, seconds, description=None):
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds, description))
+
+
+@contextmanager
+def timed(stage, source=""):
+    """Times a block as `stage`: recorded in the stage histogram and the current request's Server-Timing."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_DURATION.observe(elapsed, stage=stage, source=source)
+        _add_timing(stage, elapsed)
+
+
+def record_model_attempt(model, outcome, seconds):
+    MODEL_ATTEMPT_DURATION.observe(seconds, model=model, outcome=outcome)
+    _add_timing("model", seconds, f"{model} {outcome}")
+
+
+def server_timing_header(timings, total=None):
+    """
+    Server-Timing value: one entry per stage (repeated stages summed), one per model attempt, then total.
+    """
+    entries = []
+    summed = {}
+    for name, seconds, description in timings:
+        if description is None:
+            summed[name] = summed.get(name, 0.0) + seconds
+            if name not in entries:
+                entries.append(name)
+        else:
+            entries.append((name, seconds, description))
+    parts = []
+    for entry in entries:
+        if isinstance(entry, tuple):
+            name, seconds, description = entry
+            parts.append(f'{name};desc="{description}";dur={seconds * 1000:.1f}')
+        else:
+            parts.append(f"{entry};dur={summed[entry] * 1000:.1f}")
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
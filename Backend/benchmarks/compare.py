@@ -0,0 +1,57 @@
+"""
+Compares two benchmark result files.
+
+    python -m benchmarks.compare old.json new.json [--threshold 10]
+
+Exits with status 1 if any scenario's p50/p99 latency grew, or its throughput fell, by more than the threshold (%).
+"""
+import argparse
+import json
+import sys
+
+# Metric -> True if larger is better
+METRICS = {"p50_ms": False, "p99_ms": False, "throughput_rps": True}
+
+
+def compare(old, new, threshold):
+    rows = []
+    regressions = []
+    for scenario, new_stats in new["scenarios"].items():
+        old_stats = old["scenarios"].get(scenario)
+        if old_stats is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            before, after = old_stats.get(metric), new_stats.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            worse = -change if higher_is_better else change
+            rows.append((scenario, metric, before, after, change))
+            if worse > threshold:
+                regressions.append((scenario, metric, change))
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed regression in percent")
+    args = parser.parse_args()
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    print(f"{old['meta'].get('commit')} -> {new['meta'].get('commit')}")
+    rows, regressions = compare(old, new, args.threshold)
+    for scenario, metric, before, after, change in rows:
+        print(f"{scenario:<22} {metric:<15} {before:>10} -> {after:>10}  ({change:+.1f}%)")
+    for scenario, metric, change in regressions:
+        print(f"REGRESSION: {scenario} {metric} {change:+.1f}%")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
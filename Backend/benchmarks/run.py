@@ -0,0 +1,175 @@
+"""
+Load scenarios against the API, with a synthetic cohort and the stub LLM.
+
+    python -m benchmarks.run --rows 10000 --concurrency 32 --requests 1000
+    python -m benchmarks.compare benchmarks/results/<old>.json benchmarks/results/<new>.json
+
+The app runs in-process behind httpx's ASGI transport (no network), with its dataset, snapshot
+directory and AI cache pointed at a scratch directory. Results are written as JSON, one file per run,
+named by time and git commit.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS = ["minimal_page", "minimal_search_sort", "full_details_cold", "full_details_warm"]
+
+
+def _git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain"], cwd=BENCH_DIR, capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except Exception:
+        return None, None
+
+
+def _summarize(latencies, statuses, wall):
+    latencies = np.array(latencies)
+    errors = sum(1 for status in statuses if status >= 400)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 1) if wall else None,
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 2),
+        "p90_ms": round(float(np.percentile(latencies, 90)) * 1000, 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 2),
+        "mean_ms": round(float(latencies.mean()) * 1000, 2),
+        "max_ms": round(float(latencies.max()) * 1000, 2),
+    }
+
+
+async def _load(client, make_request, total, concurrency):
+    """Runs `total` requests from `concurrency` workers. Returns (latencies, statuses, wall seconds)."""
+    latencies, statuses = [], []
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            method, url, params = make_request(i)
+            started = time.perf_counter()
+            response = await client.request(method, url, params=params)
+            latencies.append(time.perf_counter() - started)
+            statuses.append(response.status_code)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+async def run_scenarios(args, uids, stub_models):
+    import httpx
+    from main import app
+    from app.services.ai_cache import ai_cache
+    from app.services.patient_service import LIST_FIELDS
+
+    rng = random.Random(args.seed)
+    results = {}
+    started = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        startup = time.perf_counter() - started
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            hot = rng.sample(uids, min(len(uids), 50))
+            scenarios = {
+                "minimal_page": lambda i: ("GET", "/getMinimalPatientInfo", {"limit": 100, "offset": rng.randrange(0, max(1, len(uids) - 100))}),
+                "minimal_search_sort": lambda i: ("GET", "/getMinimalPatientInfo", {
+                    "search": f"patient {rng.randrange(0, 1000)}", "sort_by": rng.choice(LIST_FIELDS), "limit": 100,
+                }),
+                "full_details_cold": lambda i: ("GET", "/getFullPatientDetails", {"uid": rng.choice(uids)}),
+                "full_details_warm": lambda i: ("GET", "/getFullPatientDetails", {"uid": hot[i % len(hot)]}),
+            }
+            for name in args.scenarios:
+                if name == "full_details_cold":
+                    ai_cache.clear()
+                if name == "full_details_warm":
+                    # Fill the cache for the hot set first so the measured requests are all hits
+                    for uid in hot:
+                        await client.get("/getFullPatientDetails", params={"uid": uid})
+                calls_before = sum(stub_models.calls.values())
+                latencies, statuses, wall = await _load(client, scenarios[name], args.requests, args.concurrency)
+                results[name] = _summarize(latencies, statuses, wall)
+                results[name]["model_calls"] = sum(stub_models.calls.values()) - calls_before
+                print(f"{name}: {json.dumps(results[name])}")
+    return results, startup
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the patient API under concurrent load.")
+    parser.add_argument("--rows", type=int, default=1000, help="synthetic cohort size (100 - 100000)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--scenarios", nargs="+", default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument("--model-latency", type=float, default=0.05, help="stub LLM latency in seconds")
+    parser.add_argument("--model-jitter", type=float, default=0.02)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="stub failure rate for every model")
+    parser.add_argument("--profile", help="JSON file with a per-model stub profile (overrides the three options above)")
+    parser.add_argument("--out", help="result file (default benchmarks/results/<time>-<commit>.json)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="risa-bench-")
+    from benchmarks.synthetic_cohort import write_cohort
+    csv = write_cohort(args.rows, os.path.join(workdir, "cohort.csv"), seed=args.seed)
+
+    # Must be set before the app modules are imported; they read configuration at import time
+    os.environ.update({
+        "DATASET_CSV_PATH": csv,
+        "DATASET_SNAPSHOT_DIR": os.path.join(workdir, ".snapshots"),
+        "AI_CACHE_PATH": os.path.join(workdir, "ai_cache.sqlite"),
+        "GEMINI_API_KEY": "stub",
+        "AI_PREGENERATE": "0",
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+    })
+    # Without credentials the loader goes straight to the CSV
+    os.chdir(workdir)
+
+    if args.profile:
+        with open(args.profile) as f:
+            profile = json.load(f)
+    else:
+        profile = {"*": {"latency": args.model_latency, "jitter": args.model_jitter, "failure_rate": args.failure_rate}}
+    from benchmarks.stub_genai import install
+    stub_models = install(profile, seed=args.seed)
+
+    import pandas as pd
+    uids = pd.read_csv(csv, usecols=["Patient_ID"])["Patient_ID"].astype(str).tolist()
+    results, startup = asyncio.run(run_scenarios(args, uids, stub_models))
+
+    commit, dirty = _git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "dirty": dirty,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "rows": args.rows,
+            "seed": args.seed,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "stub_profile": profile,
+            "startup_seconds": round(startup, 3),
+        },
+        "scenarios": results,
+    }
+    out = args.out or os.path.join(BENCH_DIR, "results", f"{time.strftime('%Y%m%d-%H%M%S')}-{commit or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(out)
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(BENCH_DIR))
+    main()
@@ -0,0 +1,100 @@
+"""
+Per-request cost of producing a /getFullPatientDetails body, without HTTP or the AI path.
+
+    python -m benchmarks.serialization --rows 2000 --samples 2000
+
+Compares the dict path the endpoint used to take (document copy + raw row dict, then FastAPI's
+jsonable_encoder and the stdlib encoder) with the current one (shared slotted record, no raw row,
+serialization.dumps). Reports microseconds and allocated bytes per request.
+"""
+import argparse
+import dataclasses
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _as_dict(value):
+    # The document shape the service built before the records existed
+    if dataclasses.is_dataclass(value):
+        return {field: _as_dict(getattr(value, field)) for field in value.__dataclass_fields__}
+    if isinstance(value, dict):
+        return {key: _as_dict(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_as_dict(item) for item in value]
+    return value
+
+
+def _measure(func, positions):
+    started = time.perf_counter()
+    for pos in positions:
+        func(pos)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    for pos in positions[:200]:
+        func(pos)
+    _, peak = tracemalloc.get_traced_memory()
+    total = sum(stat.size for stat in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+    return {
+        "us_per_request": round(elapsed / len(positions) * 1e6, 1),
+        "peak_kib_per_200": round(peak / 1024, 1),
+        "retained_kib_per_200": round(total / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark building and serializing patient documents.")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--samples", type=int, default=2000, help="requests measured per path")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="risa-bench-")
+    from benchmarks.synthetic_cohort import write_cohort
+    csv = write_cohort(args.rows, os.path.join(workdir, "cohort.csv"), seed=args.seed)
+    os.environ.update({
+        "DATASET_CSV_PATH": csv,
+        "DATASET_SNAPSHOT_DIR": os.path.join(workdir, ".snapshots"),
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+    })
+    os.chdir(workdir)
+
+    from fastapi.encoders import jsonable_encoder
+    from app.services.patient_service import PatientService
+    from app.utils.data_loader import get_snapshot
+    from app.utils.serialization import dumps, orjson
+
+    service = PatientService()
+    service.warm()
+    snapshot = get_snapshot()
+    rng = random.Random(args.seed)
+    positions = [rng.randrange(len(snapshot.df)) for _ in range(args.samples)]
+    dict_documents = [_as_dict(details.record) for details in service.iter_all_patient_details()]
+
+    def dict_path(pos):
+        doc = dict_documents[pos]
+        details = dict(doc)
+        details["header"] = dict(doc["header"])
+        details["raw_data"] = snapshot.df.iloc[pos].to_dict()
+        details.pop("raw_data")
+        return json.dumps(jsonable_encoder(details), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+    def record_path(pos):
+        return dumps(service._details_at(snapshot, pos).record)
+
+    results = {"dict_jsonable_encoder": _measure(dict_path, positions), "record_dumps": _measure(record_path, positions)}
+    results["meta"] = {"rows": args.rows, "samples": args.samples, "orjson": orjson is not None, "python": sys.version.split()[0]}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(BENCH_DIR))
+    main()
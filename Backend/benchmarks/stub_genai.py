@@ -0,0 +1,76 @@
+"""
+Local stand-in for `google.genai.Client`, so benchmarks exercise the model chain without network or quota.
+
+Latency and failure rate are configured per model; answers have the shape the real API returns
+(`.text`, `.usage_metadata`), JSON for schema-constrained calls and bullets otherwise.
+"""
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+# Model -> behaviour; "*" applies to models not listed
+DEFAULT_PROFILE = {
+    "*": {"latency": 0.05, "jitter": 0.02, "failure_rate": 0.0},
+}
+
+
+class StubModels:
+    def __init__(self, profile, seed):
+        self.profile = profile
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = {}
+
+    def _behaviour(self, model):
+        return {**DEFAULT_PROFILE["*"], **self.profile.get("*", {}), **self.profile.get(model, {})}
+
+    def generate_content(self, model, contents, config=None):
+        behaviour = self._behaviour(model)
+        with self._lock:
+            self.calls[model] = self.calls.get(model, 0) + 1
+            delay = max(0.0, self._rng.gauss(behaviour["latency"], behaviour["jitter"]))
+            fail = self._rng.random() < behaviour["failure_rate"]
+        time.sleep(delay)
+        if fail:
+            raise RuntimeError(f"stub: {model} unavailable")
+
+        if config is not None and getattr(config, "response_mime_type", None) == "application/json":
+            text = json.dumps({
+                "insights": [f"Stub insight {i} from {model}." for i in range(1, 6)],
+                "alerts": [f"Stub alert {i} from {model}." for i in range(1, 4)],
+            })
+        else:
+            text = "\n".join(f"* Stub point {i} from {model}." for i in range(1, 6))
+        usage = SimpleNamespace(
+            prompt_token_count=len(str(contents)) // 4,
+            candidates_token_count=len(text) // 4,
+            thoughts_token_count=0,
+        )
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+
+class StubClient:
+    """Drop-in for genai.Client(api_key=...): every client shares the same StubModels."""
+
+    models = None
+
+    def __init__(self, api_key=None, **kwargs):
+        pass
+
+    def close(self):
+        pass
+
+
+def install(profile=None, seed=0):
+    """
+    Routes the Gemini provider's genai.Client to the stub. Returns the StubModels, whose `calls` counts requests per model.
+    Must run before the app lifespan creates the provider.
+    """
+    from app.services import llm_provider
+
+    models = StubModels(profile or DEFAULT_PROFILE, seed)
+    client_class = type("StubClient", (StubClient,), {"models": models})
+    llm_provider.genai.Client = client_class
+    return models
@@ -0,0 +1,197 @@
+"""
+Synthetic cohorts in the Actual_Dataset.csv schema, for benchmarks.
+
+    python -m benchmarks.synthetic_cohort --rows 10000 --out data/bench/cohort_10000.csv
+
+Values follow the formats the real sheet uses: pipe-separated lists, the three lab string styles,
+day-first diagnosis/biopsy dates, "YYYY-MM-DD result" imaging fields, "procedure YYYY" surgeries
+and "start to end" treatment ranges, with a share of blank cells. Same seed -> same file.
+"""
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+MUTATIONS = ["EGFR", "ALK", "ROS1", "KRAS", "BRAF", "MET_Exon14", "RET", "HER2", "NTRK"]
+MUTATION_VALUES = {
+    "EGFR": ["L858R", "Exon 19 deletion", "T790M"],
+    "ALK": ["EML4-ALK fusion"],
+    "ROS1": ["CD74-ROS1 fusion"],
+    "KRAS": ["G12C", "G12D", "G12V"],
+    "BRAF": ["V600E"],
+    "MET_Exon14": ["Exon 14 skipping"],
+    "RET": ["KIF5B-RET fusion"],
+    "HER2": ["Exon 20 insertion", "Amplification"],
+    "NTRK": ["ETV6-NTRK3 fusion"],
+}
+
+
+def _pick(rng, n, values, p=None):
+    return rng.choice(np.array(values, dtype=object), size=n, p=p)
+
+
+def _blank(rng, values, rate):
+    # Blank cells as the sheet exports them (read back as NaN)
+    values = values.astype(object)
+    values[rng.random(len(values)) < rate] = ""
+    return values
+
+
+def _pipe_list(rng, n, vocabulary, max_items=3, none_rate=0.3):
+    counts = rng.integers(1, max_items + 1, size=n)
+    # A random permutation per row; the first `count` entries are that row's items
+    order = rng.random((n, len(vocabulary))).argsort(axis=1)
+    vocabulary = np.array(vocabulary, dtype=object)
+    out = np.array(["|".join(vocabulary[row[:count]]) for row, count in zip(order, counts)], dtype=object)
+    out[rng.random(n) < none_rate] = "None"
+    return out
+
+
+def _dates(rng, n, start="2019-01-01", days=5 * 365):
+    return pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, size=n), unit="D")
+
+
+def _labs(rng, n):
+    hb = rng.normal(12.5, 1.8, n).round(1)
+    wbc = rng.normal(6.5, 2.5, n).clip(0.5).round(1)
+    plt = rng.normal(240, 80, n).clip(10).astype(int)
+    na = rng.normal(139, 3, n).astype(int)
+    k = rng.normal(4.2, 0.5, n).round(1)
+    creat = rng.normal(0.9, 0.3, n).clip(0.3).round(2)
+    alt = rng.normal(30, 15, n).clip(5).astype(int)
+    cbc = np.array([f"Hb{a} WBC{b} Plt{c}" for a, b, c in zip(hb, wbc, plt)], dtype=object)
+    cmp_ = np.array([f"Creatinine: {a}|ALT: {b}|Sodium: {c}" for a, b, c in zip(creat, alt, na)], dtype=object)
+    electrolytes = np.array([f"Na {a}; K {b}" for a, b in zip(na, k)], dtype=object)
+    return cbc, cmp_, electrolytes
+
+
+def _imaging(rng, n, findings):
+    dates = _dates(rng, n, start="2022-01-01", days=3 * 365)
+    layout = rng.random(n)
+    text = _pick(rng, n, findings)
+    out = np.empty(n, dtype=object)
+    for i in range(n):
+        if layout[i] < 0.6:
+            out[i] = f"{dates[i]:%Y-%m-%d} {text[i]}"
+        elif layout[i] < 0.8:
+            out[i] = f"{dates[i]:%Y-%m-%d} - {text[i]}"
+        else:
+            out[i] = f"{dates[i]:%Y-%m}"
+    return _blank(rng, out, 0.1)
+
+
+def generate_cohort(rows, seed=0):
+    """DataFrame of `rows` synthetic patients with every column the dashboard reads."""
+    rng = np.random.default_rng(seed)
+    n = rows
+    diagnosis = _pick(rng, n, ["NSCLC", "SCLC", "Mesothelioma", "Carcinoid"], p=[0.75, 0.15, 0.05, 0.05])
+    diagnosed = _dates(rng, n, start="2018-01-01", days=5 * 365)
+    biopsied = diagnosed + pd.to_timedelta(rng.integers(-20, 30, size=n), unit="D")
+    tx_start = diagnosed + pd.to_timedelta(rng.integers(20, 120, size=n), unit="D")
+    tx_end = tx_start + pd.to_timedelta(rng.integers(60, 700, size=n), unit="D")
+    encounter = tx_end + pd.to_timedelta(rng.integers(0, 90, size=n), unit="D")
+    response = _pick(rng, n, ["CR", "PR", "SD", "PD"], p=[0.1, 0.35, 0.3, 0.25])
+    cbc, cmp_, electrolytes = _labs(rng, n)
+    surgery_year = diagnosed.year + rng.integers(0, 2, size=n)
+    procedure = _pick(rng, n, ["RUL lobectomy", "LLL lobectomy", "Wedge resection", "Pneumonectomy"])
+
+    data = {
+        "Patient_ID": [f"P{i:06d}" for i in range(n)],
+        "Name": [f"Synthetic Patient {i}" for i in range(n)],
+        "Age": rng.integers(28, 90, size=n),
+        "Sex": _pick(rng, n, ["M", "F"]),
+        "Primary_Diagnosis": diagnosis,
+        "Histologic_Type": _pick(rng, n, ["Adenocarcinoma", "Squamous cell carcinoma", "Large cell", "Small cell"]),
+        "Performance_Status": np.array([f"ECOG {v}" for v in rng.choice(5, size=n, p=[0.3, 0.35, 0.2, 0.1, 0.05])], dtype=object),
+        "Last_Encounter_Date": np.array([f"{d:%Y-%m-%d}" for d in encounter], dtype=object),
+        "Initial_TNM_Stage": _pick(rng, n, ["T1N0M0", "T2N1M0", "T3N2M0", "T4N3M1a"]),
+        "Current_TNM_Stage": _pick(rng, n, ["T1N0M0", "T2N1M1", "T3N2M1b", "T4N3M1c"]),
+        "Response": response,
+        "RECIST": np.where(rng.random(n) < 0.8, response, _pick(rng, n, ["SD", "PD"])),
+        "Recurrence_Status": _pick(rng, n, ["No recurrence", "Local recurrence", "Distant recurrence"]),
+        "Metastatic_Status": _pick(rng, n, ["Yes", "No"], p=[0.55, 0.45]),
+        "New_Lesions": _pick(rng, n, ["Yes", "No"], p=[0.2, 0.8]),
+        "Metastatic_Sites": _pipe_list(rng, n, ["Liver", "Bone", "Brain", "Adrenal", "Contralateral lung"], none_rate=0.45),
+        "Lesion_Count_Size": np.array([f"{c} lesions, largest {s} cm" for c, s in zip(rng.integers(1, 8, n), rng.normal(2.5, 1, n).clip(0.3).round(1))], dtype=object),
+        "Radiology_Keywords": _pipe_list(rng, n, ["nodule", "effusion", "consolidation", "lymphadenopathy", "sclerotic lesion"]),
+        "Radiology_Trend": _pick(rng, n, ["Improving", "Stable", "Worsening"]),
+        "Radiology_Trends_Longitudinal": _pick(rng, n, ["Stable over 3 scans", "Initial response then growth", "Steady improvement"]),
+        "Diagnosis_Date": np.array([f"{d:%d-%m-%Y}" for d in diagnosed], dtype=object),
+        "Biopsy_Date": _blank(rng, np.array([f"{d:%d-%m-%Y}" for d in biopsied], dtype=object), 0.05),
+        "Biopsy_Site": _pick(rng, n, ["Lung", "Lymph node", "Liver", "Pleura"]),
+        "Latest_Brain_MRI": _imaging(rng, n, ["No mets", "Stable small lesion", "New enhancing lesion"]),
+        "Latest_PET_CT": _imaging(rng, n, ["stable", "decreased uptake", "new FDG-avid nodes"]),
+        "Latest_CT_Chest": _imaging(rng, n, ["Partial response", "Stable disease", "Progression"]),
+        "Surgery": _blank(rng, np.array([f"{p} {y}" for p, y in zip(procedure, surgery_year)], dtype=object), 0.5),
+        "Treatment_Dates": np.array([f"{a:%Y-%m-%d} to {b:%Y-%m-%d}" for a, b in zip(tx_start, tx_end)], dtype=object),
+        "Regimen": _pick(rng, n, ["Osimertinib", "Carboplatin/Pemetrexed", "Pembrolizumab", "Alectinib", "Cisplatin/Etoposide"]),
+        "Current_Line": rng.integers(1, 5, size=n),
+        "Treatment_Response_Timeline": _pick(rng, n, ["PR at 3mo", "SD at 3mo, PD at 9mo", "CR at 6mo", "PD at 2mo"]),
+        "Prior_Therapies": _pipe_list(rng, n, ["Carboplatin", "Docetaxel", "Radiation", "Nivolumab"], none_rate=0.4),
+        "Reason_For_Change": _blank(rng, _pick(rng, n, ["Progression", "Toxicity", "Patient preference"]), 0.4),
+        "Treatment_Plan_Summary": _pick(rng, n, ["Continue current line", "Switch at progression", "Maintenance therapy"]),
+        "Disease_Course_Summary": _pick(rng, n, ["Initial response, now stable", "Slow progression on therapy", "Durable response"]),
+        "CBC": cbc,
+        "CMP": cmp_,
+        "Electrolytes": _blank(rng, electrolytes, 0.05),
+        "Renal_Flag": _pick(rng, n, ["Yes", "No"], p=[0.15, 0.85]),
+        "Liver_Flag": _pick(rng, n, ["Yes", "No"], p=[0.1, 0.9]),
+        "Abnormal_Labs": _pipe_list(rng, n, ["Anemia", "Neutropenia", "Hyponatremia", "Elevated ALT"], none_rate=0.4),
+        "Lab_Flag_Trend": _pick(rng, n, ["Stable", "Improving", "Worsening", "Progressive anemia"]),
+        "Toxicities": _pipe_list(rng, n, ["Rash", "Diarrhea", "Fatigue", "Neuropathy", "Pneumonitis"], none_rate=0.4),
+        "Ambiguous_Pathology": _pick(rng, n, ["Yes", "No"], p=[0.05, 0.95]),
+        "Diabetes": _pick(rng, n, ["No", "Type 2", "Type 1"], p=[0.75, 0.22, 0.03]),
+        "Hypertension": _pick(rng, n, ["Yes", "No"]),
+        "Heart_Disease": _pick(rng, n, ["Yes", "No"], p=[0.2, 0.8]),
+        "COPD_Asthma": _pick(rng, n, ["No", "COPD", "Asthma"], p=[0.7, 0.2, 0.1]),
+        "Other_Comorbidities": _blank(rng, _pick(rng, n, ["Hypothyroidism", "CKD stage 2", "Atrial fibrillation"]), 0.6),
+        "Smoking_Status": _pick(rng, n, ["Never", "Former, 30 pack-years", "Current, 20 pack-years"]),
+        "Pathology_Diagnosis_Text": _pick(rng, n, ["Invasive adenocarcinoma, acinar predominant", "Squamous cell carcinoma, keratinizing", "Small cell carcinoma"]),
+        "Tumor_Grade": _pick(rng, n, ["G1", "G2", "G3"]),
+        "Margin_Status": _pick(rng, n, ["R0", "R1", "Not applicable"]),
+        "Histopathologic_Features": _pipe_list(rng, n, ["lymphovascular invasion", "pleural invasion", "necrosis", "solid pattern"]),
+        "Pathology_Keywords": _pick(rng, n, ["TTF-1 positive", "p40 positive", "synaptophysin positive"]),
+        "IHC_Markers": _pick(rng, n, ["TTF-1+, Napsin A+", "p40+, CK5/6+", "Synaptophysin+, Chromogranin+"]),
+        "Num_Pathology_Reports": rng.integers(1, 5, size=n),
+        "PDL1_Percent": np.array([f"{v}%" for v in rng.choice([0, 1, 5, 20, 50, 80, 95], size=n)], dtype=object),
+        "TMB": np.array([f"{v} mut/Mb" for v in rng.gamma(2, 4, n).round(1)], dtype=object),
+        "MSI": _pick(rng, n, ["MSS", "MSI-H"], p=[0.97, 0.03]),
+        "ctDNA_Findings": _blank(rng, _pick(rng, n, ["EGFR L858R detected", "No alterations detected", "KRAS G12C at 2% VAF"]), 0.3),
+        "Actionable_Mutation_Summary": _pick(rng, n, ["No actionable alterations", "Targetable driver present"]),
+        "New_Mutations": _blank(rng, _pick(rng, n, ["T790M", "C797S", "MET amplification"]), 0.8),
+        "Biomarker_Trend": _pick(rng, n, ["stable CEA", "rising CEA", "falling CEA", "increasing CYFRA 21-1"]),
+        "Biomarker_Trends_Longitudinal": _pick(rng, n, ["CEA 4.1 -> 6.8 -> 9.2", "CEA 12 -> 5 -> 3", "Stable across 4 draws"]),
+        "CEA": rng.gamma(2, 3, n).round(1),
+        "CA19_9": rng.gamma(2, 15, n).round(1),
+        "Other_Tumor_Markers": _blank(rng, _pick(rng, n, ["CYFRA 21-1: 3.2", "NSE: 18", "ProGRP: 60"]), 0.5),
+        "Pathology_Links": [f"https://records.example.org/pathology/{i}" for i in range(n)],
+        "Radiology_Links": [f"https://records.example.org/radiology/{i}" for i in range(n)],
+        "Genomic_Links": [f"https://records.example.org/genomics/{i}" for i in range(n)],
+        "Provider_Notes": _pick(rng, n, ["Tolerating therapy well.", "Discussed goals of care.", "Reports mild fatigue."]),
+    }
+
+    # Mostly negative drivers, at most one positive per patient (as in real NSCLC panels)
+    positive = rng.choice(len(MUTATIONS) + 1, size=n, p=[0.2, 0.05, 0.02, 0.25, 0.03, 0.03, 0.02, 0.02, 0.01] + [0.37])
+    for j, gene in enumerate(MUTATIONS):
+        values = np.full(n, "Negative", dtype=object)
+        hit = positive == j
+        values[hit] = _pick(rng, int(hit.sum()), MUTATION_VALUES[gene])
+        data[gene] = _blank(rng, values, 0.03)
+
+    return pd.DataFrame(data)
+
+
+def write_cohort(rows, path, seed=0):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    generate_cohort(rows, seed=seed).to_csv(path, index=False)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic cohort CSV in the Actual_Dataset schema.")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+    out = args.out or os.path.join("data", "bench", f"cohort_{args.rows}.csv")
+    print(write_cohort(args.rows, out, seed=args.seed))
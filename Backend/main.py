@@ -1,11 +1,63 @@
-from fastapi import FastAPI
+import os
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.endpoints import router
+from fastapi.middleware.gzip import GZipMiddleware
+from app.api.endpoints import router, patient_service
+from app.services.llm_provider import create_provider, set_provider
+from app.utils.telemetry import (
+    REQUEST_DURATION, configure_logging, server_timing_header, start_request_timings,
+)
+from app.utils.serialization import FastJSONResponse
 from dotenv import load_dotenv
 
 load_dotenv()
+configure_logging()
+logger = logging.getLogger("main")
+
+@asynccontextmanager
+async def lifespan(app):
+    # One long-lived LLM client for the process (AI_PROVIDER selects gemini, fake or a local server)
+    provider = create_provider()
+    set_provider(provider)
+
+    # Materialize patient documents before serving traffic
+    try:
+        await asyncio.to_thread(patient_service.warm)
+    except Exception as e:
+        logger.warning("Startup warm-up failed (documents will build on first request).", extra={"error": str(e)})
+
+    # Optional background job that fills the AI cache for the whole cohort
+    pregen_task = None
+    if os.getenv("AI_PREGENERATE", "").lower() in ("1", "true", "yes"):
+        from app.services.pregeneration import pregenerator
+        pregen_task = asyncio.create_task(pregenerator.run_forever())
+    yield
+    if pregen_task is not None:
+        pregen_task.cancel()
+    set_provider(None)
+    provider.close()
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    # Stages timed during the request (see telemetry.timed) are reported in Server-Timing
+    timings = start_request_timings()
+    started = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
 
-app = FastAPI()
+    route = request.scope.get("route")
+    REQUEST_DURATION.observe(
+        elapsed, method=request.method, route=getattr(route, "path", "unmatched"), status=response.status_code
+    )
+    # Streaming responses only cover the work done before their first byte
+    response.headers["Server-Timing"] = server_timing_header(timings, elapsed)
+    return response
 
 app.add_middleware(
     CORSMiddleware,
@@ -13,7 +65,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "Server-Timing", "ETag", "X-Patient-Version"],
 )
+# Large JSON bodies (patient lists, full details) compress well; small ones are not worth it
+app.add_middleware(GZipMiddleware, minimum_size=int(os.getenv("GZIP_MIN_SIZE", "1024")))
 
 app.include_router(router)
 
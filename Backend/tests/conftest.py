@@ -0,0 +1,45 @@
+import threading
+import pytest
+from app.services import ai_service
+from app.services.ai_cache import AICache
+from app.services.llm_provider import LLMProvider, LLMResponse
+from app.services.model_health import ModelCircuitBreaker
+
+
+class ScriptedProvider(LLMProvider):
+    """Answers from a list, one item per call; an Exception item is raised. Records every call."""
+
+    name = "scripted"
+
+    def __init__(self, answers, delay=None):
+        self.answers = list(answers)
+        self.calls = []
+        # Set to hold calls until released (for single-flight tests)
+        self.release = threading.Event() if delay else None
+        self.delay = delay
+
+    def generate(self, model, prompt, timeout, response_schema=None):
+        self.calls.append((model, prompt))
+        if self.release is not None:
+            self.release.wait(self.delay)
+        answer = self.answers.pop(0) if len(self.answers) > 1 else self.answers[0]
+        if isinstance(answer, Exception):
+            raise answer
+        return LLMResponse(answer)
+
+
+@pytest.fixture
+def scripted_provider(monkeypatch):
+    """
+    AIService with a fresh circuit breaker and a memory-only cache.
+    Call the fixture with the answers to install a ScriptedProvider and get it back.
+    """
+    monkeypatch.setattr(ai_service, "model_breaker", ModelCircuitBreaker())
+    monkeypatch.setattr(ai_service, "ai_cache", AICache(path=None))
+
+    def install(answers, delay=None):
+        provider = ScriptedProvider(answers, delay)
+        monkeypatch.setattr(ai_service, "get_provider", lambda: provider)
+        return provider
+
+    return install
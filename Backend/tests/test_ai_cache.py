@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+import pytest
+from app.services import ai_cache as ai_cache_module
+from app.services.ai_cache import AICache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(ai_cache_module, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def _key(kind, fields):
+    return AICache.make_key(kind, "v1", fields)
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = AICache(path=str(tmp_path / "cache.sqlite"), ttl=60)
+    key = _key("insight", {"Name": "Alice"})
+    cache.set(key, ["a"], patient_id="P1")
+    clock[0] += 59
+    assert cache.get(key) == ["a"]
+    clock[0] += 2
+    assert cache.get(key) is None
+    assert cache.created_at(key) is None
+    assert cache.stats["expired"] == 1
+    # Expired entries are removed from the disk tier too
+    assert cache.get_stats()["disk_entries"] == 0
+
+
+def test_memory_tier_is_lru_and_falls_back_to_disk(tmp_path, clock):
+    cache = AICache(path=str(tmp_path / "cache.sqlite"), ttl=60, max_entries=2)
+    keys = [_key("insight", {"Name": name}) for name in ("A", "B", "C")]
+    cache.set(keys[0], 0)
+    cache.set(keys[1], 1)
+    assert cache.get(keys[0]) == 0  # A is now the most recent
+    cache.set(keys[2], 2)  # evicts B
+    assert cache.stats["evictions"] == 1
+    assert cache.get(keys[0]) == 0 and cache.stats["memory_hits"] == 2
+    assert cache.get(keys[1]) == 1 and cache.stats["disk_hits"] == 1
+
+
+def test_memory_only_cache_without_path(clock):
+    cache = AICache(path=None, ttl=60, max_entries=1)
+    first, second = _key("insight", {"n": 1}), _key("insight", {"n": 2})
+    cache.set(first, "x")
+    cache.set(second, "y")
+    assert cache.get(first) is None and cache.get(second) == "y"
+
+
+def test_changed_row_invalidates_the_patients_old_entries(tmp_path, clock):
+    cache = AICache(path=str(tmp_path / "cache.sqlite"), ttl=60)
+    old = _key("insight", {"Age": 61})
+    cache.set(old, ["old"], patient_id="P1")
+    cache.set(_key("alert", {"Age": 61}), ["alert"], patient_id="P1")
+    cache.set(_key("insight", {"Age": 62}), ["new"], patient_id="P1")
+    assert cache.stats["invalidated"] == 1
+    # Only the same kind is dropped, and only on disk until the memory entry is gone
+    cache._memory.clear()
+    assert cache.get(old) is None
+    assert cache.get(_key("alert", {"Age": 61})) == ["alert"]
+
+
+def test_invalidate_patient_drops_every_kind(tmp_path, clock):
+    cache = AICache(path=str(tmp_path / "cache.sqlite"), ttl=60)
+    cache.set(_key("insight", {"x": 1}), 1, patient_id="P1")
+    cache.set(_key("alert", {"x": 1}), 2, patient_id="P1")
+    cache.set(_key("insight", {"x": 2}), 3, patient_id="P2")
+    assert cache.invalidate_patient("P1") == 2
+    assert cache.known_patients("insight") == {"P2"}
+    assert cache.get(_key("insight", {"x": 2})) == 3
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+from app.services.alert_rules import ALERT_RULES, evaluate_rules
+from app.services.ai_service import AIService
+from app.utils.cohort_index import build_cohort_index, ecog_scores
+from app.utils.data_loader import DatasetSnapshot
+
+
+def _row_wise_alerts(patient_data):
+    # The per-row rules the table replaced (ECOG aside, see test_ecog_range_takes_the_worst_score)
+    alerts = []
+    if str(patient_data.get('Metastatic_Status', '')).lower() == 'yes':
+        alerts.append({"category": "Disease", "message": "Metastatic disease present", "level": "high"})
+    if str(patient_data.get('New_Lesions', '')).lower() == 'yes':
+        alerts.append({"category": "Disease", "message": "New lesions identified", "level": "high"})
+    if str(patient_data.get('Response', '')).upper() == 'PD' or str(patient_data.get('RECIST', '')).upper() == 'PD':
+        alerts.append({"category": "Disease", "message": "Radiographic progression", "level": "high"})
+    ecog_str = str(patient_data.get('Performance_Status', ''))
+    ecog_val = int(''.join(filter(str.isdigit, ecog_str))) if any(c.isdigit() for c in ecog_str) else 0
+    if ecog_val >= 2:
+        alerts.append({"category": "Functional", "message": "Reduced functional reserve", "level": "medium"})
+    if str(patient_data.get('Liver_Flag', '')).lower() == 'yes':
+        alerts.append({"category": "Safety", "message": "Hepatic dysfunction", "level": "medium"})
+    if str(patient_data.get('Renal_Flag', '')).lower() == 'yes':
+        alerts.append({"category": "Safety", "message": "Renal impairment", "level": "medium"})
+    toxicities = str(patient_data.get('Toxicities', ''))
+    if toxicities and toxicities.lower() != 'nan' and toxicities.lower() != 'none':
+        alerts.append({"category": "Tolerance", "message": "Treatment-related toxicities documented", "level": "medium"})
+    if str(patient_data.get('Ambiguous_Pathology', '')).lower() == 'yes':
+        alerts.append({"category": "Data", "message": "Pathology uncertainty", "level": "low"})
+    return alerts
+
+
+def _cohort(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+
+    def pick(*choices):
+        return rng.choice(np.array(choices, dtype=object), size=n)
+
+    return pd.DataFrame({
+        "Metastatic_Status": pick("Yes", "yes", "No", None, ""),
+        "New_Lesions": pick("Yes", "YES", "No", np.nan),
+        "Response": pick("PD", "pd", "PR", "SD", None),
+        "RECIST": pick("PD", "CR", "", np.nan),
+        "Performance_Status": pick("ECOG 0", "ECOG 1", "ECOG 2", "ECOG 3", "4", "", None),
+        "Liver_Flag": pick("Yes", "No", None),
+        "Renal_Flag": pick("yes", "No", ""),
+        "Toxicities": pick("Neuropathy|Fatigue", "None", "none", "", np.nan, "nan"),
+        "Ambiguous_Pathology": pick("Yes", "No", None),
+    })
+
+
+def test_rule_table_matches_row_wise_rules():
+    df = _cohort()
+    matrix = evaluate_rules(df)
+    for pos, row in enumerate(df.to_dict('records')):
+        assert matrix.alerts_for(pos) == _row_wise_alerts(row), row
+
+
+def test_missing_columns_fire_nothing():
+    matrix = evaluate_rules(pd.DataFrame({"Name": ["A", "B"]}))
+    assert not matrix.matrix.any()
+    assert AIService.generate_clinical_alerts({"Name": "A"}) == []
+
+
+def test_single_row_path_matches_the_matrix():
+    df = _cohort(50, seed=1)
+    matrix = evaluate_rules(df)
+    for pos, row in enumerate(df.to_dict('records')):
+        assert AIService.generate_clinical_alerts(row) == matrix.alerts_for(pos)
+
+
+def test_ecog_range_takes_the_worst_score():
+    scores = ecog_scores(["ECOG 1-2", "ECOG 0-1", "2", "ECOG 1", "unknown", None])
+    assert scores.tolist()[:4] == [2.0, 1.0, 2.0, 1.0]
+    assert np.isnan(scores.iloc[4]) and np.isnan(scores.iloc[5])
+
+    df = pd.DataFrame({"Patient_ID": ["A", "B", "C"], "Performance_Status": ["ECOG 1-2", "ECOG 0-1", "ECOG 3"]})
+    ecog_rule = [rule["id"] for rule in ALERT_RULES].index("ecog")
+    fired = evaluate_rules(df).matrix[:, ecog_rule]
+    assert fired.tolist() == [True, False, True]
+
+    # The cohort filter and the alert agree on who has ECOG >= 2
+    index = build_cohort_index(DatasetSnapshot(df, 1, "test:1", "csv"))
+    assert index.match(ecog_min=2).tolist() == fired.tolist()
@@ -0,0 +1,69 @@
+import json
+import pytest
+from app.services import ai_service
+from app.services.ai_service import COMBINED_SCHEMA, AIService
+from app.services.model_health import Deadline
+
+ROW = {"Patient_ID": "P1", "Name": "Alice", "Response": "PD", "Performance_Status": "ECOG 2"}
+INSIGHTS = [f"Insight {i}." for i in range(1, 6)]
+ALERTS = [f"Alert {i}." for i in range(1, 5)]
+VALID = json.dumps({"insights": INSIGHTS, "alerts": ALERTS})
+
+
+def test_parse_accepts_fenced_json_and_normalizes_items():
+    text = "```json\n" + json.dumps({"insights": [f"* {i}  " for i in INSIGHTS], "alerts": ALERTS + ["Alert 5."]}) + "\n```"
+    result = AIService._parse_combined(text)
+    assert result["insights"] == INSIGHTS
+    # Extra alerts are cut to the maximum
+    assert result["alerts"] == ALERTS
+
+
+@pytest.mark.parametrize("text, error", [
+    ("no json here", "not a JSON object"),
+    ('{"insights": [', "not a JSON object"),
+    ('{"insights": ["a",]}', "invalid JSON"),
+    (json.dumps({"insights": INSIGHTS}), '"alerts" must be a list'),
+    (json.dumps({"insights": INSIGHTS[:4], "alerts": ALERTS}), '"insights" needs at least 5'),
+    (json.dumps({"insights": INSIGHTS, "alerts": ["", "  ", "Alert 1."]}), '"alerts" needs at least 3'),
+])
+def test_parse_rejects_unusable_responses(text, error):
+    with pytest.raises(ValueError, match=error):
+        AIService._parse_combined(text)
+
+
+def test_invalid_answer_is_repaired_on_the_same_model(scripted_provider):
+    provider = scripted_provider(['{"insights": ["only one"], "alerts": []}', VALID])
+    result = AIService._generate_combined(ROW, provider, Deadline(10))
+    assert result == {"insights": INSIGHTS, "alerts": ALERTS}
+    (first_model, first_prompt), (second_model, repair_prompt) = provider.calls
+    assert first_model == second_model
+    assert "could not be used" in repair_prompt and '"insights" needs at least 5' in repair_prompt
+
+
+def test_failed_repair_moves_to_the_next_model(scripted_provider):
+    provider = scripted_provider(["not json", "still not json", VALID])
+    result = AIService._generate_combined(ROW, provider, Deadline(10))
+    assert result["insights"] == INSIGHTS
+    models = [model for model, _ in provider.calls]
+    assert models[0] == models[1] != models[2]
+
+
+def test_combined_miss_caches_both_outputs(scripted_provider):
+    scripted_provider([VALID])
+    insights, alerts = AIService._combined_on_miss(ROW, Deadline(10))
+    assert (insights, alerts) == (INSIGHTS, ALERTS)
+    assert ai_service.ai_cache.get(AIService.insight_cache_key(ROW)) == INSIGHTS
+    assert ai_service.ai_cache.get(AIService.alert_cache_key(ROW)) == ALERTS
+
+
+def test_combined_failure_falls_back_without_caching(scripted_provider):
+    scripted_provider([RuntimeError("down")])
+    insights, alerts = AIService._combined_on_miss(ROW, Deadline(10))
+    assert insights == AIService._get_fallback_insight()
+    assert alerts == AIService._rule_based_alert_messages(ROW) and "Radiographic progression" in alerts
+    assert ai_service.ai_cache.get(AIService.insight_cache_key(ROW)) is None
+
+
+def test_schema_matches_the_limits():
+    assert COMBINED_SCHEMA["properties"]["insights"]["minItems"] == 5
+    assert COMBINED_SCHEMA["properties"]["alerts"]["maxItems"] == 4
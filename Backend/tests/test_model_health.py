@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+import pytest
+from app.services import model_health
+from app.services.model_health import ModelCircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(model_health, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_closed_open_half_open_closed(clock):
+    breaker = ModelCircuitBreaker(failure_threshold=2, cooldown=60)
+    assert breaker.allow("m")
+    breaker.record_failure("m", 0.1, RuntimeError("boom"))
+    assert breaker.allow("m")
+    breaker.record_failure("m", 0.1, RuntimeError("boom"))
+    assert breaker.get_status()["m"]["state"] == "open"
+    assert not breaker.allow("m")
+
+    clock[0] += 61
+    assert breaker.get_status()["m"]["state"] == "half_open"
+    assert breaker.allow("m")
+    # Only one trial at a time
+    assert not breaker.allow("m")
+    breaker.record_success("m", 0.1)
+    assert breaker.get_status()["m"]["state"] == "closed"
+    assert breaker.allow("m") and breaker.allow("m")
+
+
+def test_failed_half_open_trial_reopens(clock):
+    breaker = ModelCircuitBreaker(failure_threshold=1, cooldown=60)
+    breaker.record_failure("m", 0.1)
+    clock[0] += 61
+    assert breaker.allow("m")
+    breaker.record_failure("m", 0.1)
+    assert breaker.get_status()["m"]["state"] == "open"
+    assert not breaker.allow("m")
+
+
+def test_latency_skip_expires_after_cooldown(clock):
+    breaker = ModelCircuitBreaker(failure_threshold=2, cooldown=60)
+    breaker.record_success("slow", 30.0)
+    assert not breaker.allow("slow", budget=20)
+    # A bigger budget still gets it
+    assert breaker.allow("slow", budget=40)
+
+    clock[0] += 30
+    assert not breaker.allow("slow", budget=20)
+    clock[0] += 31
+    # One trial refreshes the estimate; the model is fast again, so it is no longer skipped
+    assert breaker.allow("slow", budget=20)
+    assert not breaker.allow("slow", budget=20)
+    breaker.record_success("slow", 1.0)
+    clock[0] += 1
+    breaker.record_success("slow", 1.0)
+    breaker.record_success("slow", 1.0)
+    assert breaker.allow("slow", budget=20)
+
+
+def test_still_slow_after_trial_is_skipped_for_another_cooldown(clock):
+    breaker = ModelCircuitBreaker(failure_threshold=2, cooldown=60)
+    breaker.record_success("slow", 30.0)
+    assert not breaker.allow("slow", budget=20)
+    clock[0] += 61
+    assert breaker.allow("slow", budget=20)
+    breaker.record_success("slow", 30.0)
+    assert not breaker.allow("slow", budget=20)
+    clock[0] += 61
+    assert breaker.allow("slow", budget=20)
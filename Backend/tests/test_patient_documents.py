@@ -0,0 +1,44 @@
+import pandas as pd
+from app.services.alert_rules import build_alert_matrix
+from app.services.patient_service import PatientService
+from app.utils.data_loader import DatasetSnapshot
+from app.utils.lab_parser import build_lab_table
+
+ROWS = [
+    {"Patient_ID": "P1", "Name": "Alice", "Age": 61, "Sex": "F", "CBC": "Hb10.8 WBC3.4", "Diagnosis_Date": "2023-04-01"},
+    {"Patient_ID": "P2", "Name": "Bob", "Age": 70, "Sex": "M", "CBC": "", "Diagnosis_Date": ""},
+]
+
+
+def _documents(service, df, version):
+    return service._build_documents(DatasetSnapshot(df, version, f"test:{version}", "csv"))["documents"]
+
+
+def test_unchanged_rows_reuse_their_document():
+    service = PatientService()
+    first = _documents(service, pd.DataFrame(ROWS), 1)
+    edited = pd.DataFrame(ROWS)
+    edited.loc[1, "Age"] = 71
+    second = _documents(service, edited, 2)
+    assert second[0] is first[0]
+    assert second[1] is not first[1] and second[1].header.age == 71
+
+
+def test_renamed_column_rebuilds_documents():
+    service = PatientService()
+    first = _documents(service, pd.DataFrame(ROWS), 1)
+    assert first[0].header.sex == "F"
+    renamed = _documents(service, pd.DataFrame(ROWS).rename(columns={"Sex": "Gender"}), 2)
+    assert renamed[0].header.sex == ""
+
+
+def test_bulk_build_matches_single_row_build():
+    service = PatientService()
+    snapshot = DatasetSnapshot(pd.DataFrame(ROWS), 1, "test:1", "csv")
+    bulk = service._build_documents(snapshot)["documents"]
+    labs = snapshot.derive("lab_table", build_lab_table)
+    alerts = snapshot.derive("alert_matrix", build_alert_matrix)
+    for pos in range(len(ROWS)):
+        # The per-row path _details_at falls back to
+        assert bulk[pos] == service._build_row(snapshot, pos, labs, alerts)
+    assert [lab["label"] for lab in bulk[0].evidence.labs["cbc"]] == ["Hb", "WBC"]
@@ -0,0 +1,45 @@
+import asyncio
+from types import SimpleNamespace
+from app.services import pregeneration
+from app.services.pregeneration import InsightPregenerator
+
+
+def test_only_one_process_holds_the_pregeneration_lock(tmp_path):
+    path = str(tmp_path / "ai_cache.sqlite.pregen.lock")
+    # flock locks belong to the open file, so two instances behave like two workers
+    leader, other = InsightPregenerator(lock_path=path), InsightPregenerator(lock_path=path)
+    assert leader.acquire_leadership()
+    assert leader.acquire_leadership()
+    assert not other.acquire_leadership()
+
+    leader.release_leadership()
+    assert other.acquire_leadership()
+    other.release_leadership()
+
+
+def test_standby_worker_does_not_generate(tmp_path, monkeypatch):
+    path = str(tmp_path / "pregen.lock")
+    leader, standby = InsightPregenerator(lock_path=path), InsightPregenerator(lock_path=path)
+    assert leader.acquire_leadership()
+    runs = []
+
+    async def run_once():
+        runs.append(1)
+
+    monkeypatch.setattr(standby, "run_once", run_once)
+    monkeypatch.setattr(pregeneration, "get_snapshot", lambda: SimpleNamespace(version=1))
+
+    async def scenario():
+        task = asyncio.ensure_future(standby.run_forever(interval=0.01))
+        await asyncio.sleep(0.05)
+        assert standby.status["state"] == "standby"
+        leader.release_leadership()
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    # Took over once the leader let go, then released the lock when cancelled
+    assert runs == [1]
+    assert leader.acquire_leadership()
+    leader.release_leadership()
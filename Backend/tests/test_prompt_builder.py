@@ -0,0 +1,24 @@
+from app.services.prompt_builder import MIN_VALUE_CHARS, build_patient_context
+
+
+def test_many_long_fields_fit_the_budget():
+    row = {f"Field_{i}": "x" * 500 for i in range(40)}
+    context = build_patient_context(row, budget=50)
+    assert context.estimated_tokens() <= 50
+    assert context.truncated and context.dropped
+
+
+def test_values_one_past_the_floor_are_dropped_not_reshortened():
+    # Shortening a MIN_VALUE_CHARS + 1 value gives the same length back; this used to loop forever
+    row = {f"Field_{i}": "y" * (MIN_VALUE_CHARS + 1) for i in range(10)}
+    context = build_patient_context(row, budget=30)
+    assert context.estimated_tokens() <= 30
+    assert context.truncated == []
+    assert context.dropped
+
+
+def test_protected_fields_are_kept_whole():
+    row = {"Name": "n" * 400, "Notes": "z" * 4000}
+    context = build_patient_context(row, budget=120, protected=("Name",))
+    assert context.fields["Name"] == "n" * 400
+    assert "Notes" not in context.fields or len(context.fields["Notes"]) < 4000
@@ -0,0 +1,64 @@
+import pandas as pd
+from app.services.patient_service import PatientService
+from app.services.section_sync import SECTIONS, SectionTracker
+from app.utils.data_loader import DatasetSnapshot
+
+ROW = {"Patient_ID": "P1", "Name": "Alice", "Age": 61, "Sex": "F", "Response": "PR", "Smoking_Status": "Never"}
+
+
+def _record(version=1, **changes):
+    df = pd.DataFrame([{**ROW, **changes}])
+    return PatientService()._build_documents(DatasetSnapshot(df, version, f"test:{version}", "csv"))["documents"][0]
+
+
+def test_without_since_every_section_is_sent(tmp_path):
+    tracker = SectionTracker(path=str(tmp_path / "history.sqlite"))
+    delta = tracker.delta(_record())
+    assert delta["full"] is True and delta["since"] is None
+    assert list(delta["sections"]) == list(SECTIONS)
+
+
+def test_only_changed_sections_are_sent(tmp_path):
+    tracker = SectionTracker(path=str(tmp_path / "history.sqlite"))
+    first = tracker.delta(_record())
+
+    same = tracker.delta(_record(), first["version"])
+    assert same["full"] is False and same["sections"] == {}
+    assert same["version"] == first["version"]
+
+    changed = tracker.delta(_record(Smoking_Status="Former"), first["version"])
+    assert changed["full"] is False
+    assert list(changed["sections"]) == ["comorbidities"]
+    assert changed["sections"]["comorbidities"].smoking_history == "Former"
+    assert changed["version"] != first["version"]
+
+
+def test_ai_output_is_part_of_the_version(tmp_path):
+    tracker = SectionTracker(path=str(tmp_path / "history.sqlite"))
+    base = _record()
+    first = tracker.delta(base.with_ai(["insight"], ["alert"]))
+    delta = tracker.delta(base.with_ai(["new insight"], ["alert"]), first["version"])
+    assert list(delta["sections"]) == ["cross_domain_insights"]
+
+
+def test_unknown_version_gets_the_full_document(tmp_path):
+    tracker = SectionTracker(path=str(tmp_path / "history.sqlite"))
+    delta = tracker.delta(_record(), "0123456789abcdef")
+    assert delta["full"] is True and list(delta["sections"]) == list(SECTIONS)
+
+
+def test_versions_are_shared_through_the_disk_tier(tmp_path):
+    path = str(tmp_path / "history.sqlite")
+    version = SectionTracker(path=path).delta(_record())["version"]
+    # Another worker (or a restart): empty memory tier, same file
+    other = SectionTracker(path=path)
+    delta = other.delta(_record(Age=62), version)
+    assert delta["full"] is False and list(delta["sections"]) == ["header"]
+
+
+def test_memory_only_tracker_forgets_evicted_versions():
+    tracker = SectionTracker(max_entries=1, path=None)
+    first = tracker.delta(_record())["version"]
+    tracker.delta(_record(Age=62))
+    assert tracker.lookup(first) is None
+    assert tracker.delta(_record(), first)["full"] is True
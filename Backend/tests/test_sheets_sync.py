@@ -0,0 +1,101 @@
+import pandas as pd
+import pytest
+from app.utils import data_loader, snapshot_cache
+from app.utils.data_loader import DatasetStore
+from app.utils.sheets_sync import FakeSheetsClient, SheetsSync
+
+HEADER = ["Patient_ID", "Name", "Age"]
+
+
+@pytest.fixture(autouse=True)
+def scratch_paths(tmp_path, monkeypatch):
+    # Keep snapshots and the CSV fallback out of the working tree
+    monkeypatch.setattr(snapshot_cache, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    csv = tmp_path / "dataset.csv"
+    pd.DataFrame([{"Patient_ID": "C1", "Name": "From CSV", "Age": 50}]).to_csv(csv, index=False)
+    monkeypatch.setattr(data_loader, "csv_path", str(csv))
+
+
+def test_revision_bump_is_fetched_and_published():
+    client = FakeSheetsClient([HEADER, ["P1", "Alice", "61"], ["P2", "Bob", ""]])
+    store = DatasetStore(sheet_client_factory=lambda: client)
+
+    first = store.get_snapshot()
+    assert first.source == "sheet"
+    assert first.df["Name"].tolist() == ["Alice", "Bob"]
+
+    client.set_values([HEADER, ["P1", "Alice", "61"], ["P2", "Bob", "70"]])
+    # What revalidate_in_background runs on its thread: fetch the new revision, then publish it
+    store.sheets._background_sync()
+
+    second = store.get_snapshot()
+    assert second.version == first.version + 1
+    assert second.fingerprint == store.sheets.fingerprint != first.fingerprint
+    assert second.df["Age"].tolist() == [61, 70]
+    assert store.sheets.changed_ranges == [(3, 3)]
+    # The client is authorized and the sheet opened only once
+    assert client.open_calls == 1
+
+
+def test_snapshot_pairs_fingerprint_with_its_rows():
+    client = FakeSheetsClient([HEADER, ["P1", "Alice", "61"]])
+    store = DatasetStore(sheet_client_factory=lambda: client)
+    store.get_snapshot()
+
+    client.set_values([HEADER, ["P1", "Alicia", "61"]])
+    # New data fetched but on_update not run yet: the next request publishes it itself
+    store.sheets.sync()
+    store.sheets.last_check = float("inf")  # no second background check
+
+    snapshot = store.get_snapshot()
+    assert snapshot.fingerprint == store.sheets.fingerprint
+    assert snapshot.df["Name"].tolist() == ["Alicia"]
+
+    # The late on_update sees the same fingerprint and does not publish again
+    store._on_sheet_update(*store.sheets.current)
+    assert store.get_snapshot() is snapshot
+
+
+def test_failing_first_load_is_retried_at_most_once_per_interval(monkeypatch):
+    calls = []
+
+    def broken_factory():
+        calls.append(1)
+        raise ConnectionError("sheets down")
+
+    store = DatasetStore(sheet_client_factory=broken_factory)
+    for _ in range(3):
+        assert store.get_snapshot().source == "csv"
+    assert len(calls) == 1
+
+    monkeypatch.setattr(data_loader, "SHEET_RETRY_INTERVAL", 0)
+    store.get_snapshot()
+    assert len(calls) == 2
+
+
+def test_revision_loaded_from_snapshot_resets_the_row_diff():
+    client = FakeSheetsClient([HEADER, ["P1", "Alice", "61"], ["P2", "Bob", "70"]])
+    sheets = SheetsSync(lambda: client, "Cohort")
+    sheets.sync()
+
+    # Another worker already fetched revision 2 and saved its snapshot
+    revision_2 = [HEADER, ["P1", "Alice", "62"], ["P2", "Bob", "70"]]
+    client.set_values(revision_2)
+    other = SheetsSync(lambda: client, "Cohort")
+    other.sync()
+    fetches = client.spreadsheet.sheet1.fetches
+
+    _, df = sheets.sync()
+    assert client.spreadsheet.sheet1.fetches == fetches
+    assert df["Age"].tolist() == [62, 70]
+    assert sheets.changed_ranges == [(2, 3)]
+
+    # Revision 3 puts P1 back to its revision 1 value: diffed against revision 1 it would look unchanged.
+    # The rows behind the snapshot are unknown, so every row is reported once, then diffs are exact again.
+    client.set_values([HEADER, ["P1", "Alice", "61"], ["P2", "Bob", "71"]])
+    _, df = sheets.sync()
+    assert sheets.changed_ranges == [(2, 3)]
+    assert df["Age"].tolist() == [61, 71]
+    client.set_values([HEADER, ["P1", "Alice", "61"], ["P2", "Bob", "72"]])
+    sheets.sync()
+    assert sheets.changed_ranges == [(3, 3)]
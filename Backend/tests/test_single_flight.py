@@ -0,0 +1,113 @@
+import asyncio
+import threading
+from app.services import ai_service
+from app.services.ai_service import AIService
+from app.services.model_health import Deadline
+
+
+class BlockingGeneration:
+    """Stands in for an *_on_miss function: blocks until released, counts its calls."""
+
+    def __init__(self, result="generated", error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, *args):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+async def _wait_started(generation):
+    await asyncio.to_thread(generation.started.wait, 5)
+
+
+def test_concurrent_callers_share_one_generation():
+    generation = BlockingGeneration()
+
+    async def scenario():
+        callers = [asyncio.ensure_future(AIService._single_flight("k", Deadline(5), generation)) for _ in range(5)]
+        await _wait_started(generation)
+        generation.release.set()
+        return await asyncio.gather(*callers)
+
+    assert asyncio.run(scenario()) == ["generated"] * 5
+    assert generation.calls == 1
+    assert not ai_service._ai_inflight
+
+
+def test_failure_reaches_every_caller_and_is_not_kept():
+    generation = BlockingGeneration(error=RuntimeError("model down"))
+
+    async def scenario():
+        callers = [asyncio.ensure_future(AIService._single_flight("k", Deadline(5), generation)) for _ in range(3)]
+        await _wait_started(generation)
+        generation.release.set()
+        return await asyncio.gather(*callers, return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert [str(error) for error in results] == ["model down"] * 3
+    assert generation.calls == 1
+    assert not ai_service._ai_inflight
+
+    # The failed generation is not joined by a later caller; it starts a new one
+    generation.error = None
+    assert asyncio.run(AIService._single_flight("k", Deadline(5), generation)) == "generated"
+    assert generation.calls == 2
+
+
+def test_cancelled_caller_does_not_cancel_the_generation():
+    generation = BlockingGeneration()
+
+    async def scenario():
+        first = asyncio.ensure_future(AIService._single_flight("k", Deadline(5), generation))
+        second = asyncio.ensure_future(AIService._single_flight("k", Deadline(5), generation))
+        await _wait_started(generation)
+        first.cancel()
+        await asyncio.sleep(0)
+        generation.release.set()
+        return first, await second
+
+    first, result = asyncio.run(scenario())
+    assert first.cancelled()
+    assert result == "generated"
+    assert generation.calls == 1
+
+
+def test_caller_waits_only_its_own_deadline():
+    generation = BlockingGeneration()
+
+    async def scenario():
+        owner = asyncio.ensure_future(AIService._single_flight("k", Deadline(5), generation))
+        await _wait_started(generation)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        joiner = await AIService._single_flight("k", Deadline(0.2), generation)
+        waited = loop.time() - started
+        generation.release.set()
+        return joiner, waited, await owner
+
+    joiner, waited, owner = asyncio.run(scenario())
+    # The joiner gets None (its fallback) once its own deadline is spent; the generation finishes for the owner
+    assert joiner is None and waited < 1
+    assert owner == "generated"
+
+
+def test_different_keys_generate_separately():
+    generation = BlockingGeneration()
+    generation.release.set()
+
+    async def scenario():
+        return await asyncio.gather(
+            AIService._single_flight("a", Deadline(5), generation),
+            AIService._single_flight("b", Deadline(5), generation),
+        )
+
+    assert asyncio.run(scenario()) == ["generated", "generated"]
+    assert generation.calls == 2
@@ -24,13 +24,13 @@ export default function PatientDashboard() {
     useEffect(() => {
         if (!params.id) return;
 
+        // The URL param is the patient's name because the list links to /dashboard/[name]
+        // We need to decode it to handle spaces (e.g., "Jane%20Doe" -> "Jane Doe")
+        const nameToFetch = decodeURIComponent(params.id);
+
         const fetchPatient = async () => {
             try {
-                // The URL param is the patient's name because the list links to /dashboard/[name]
-                // We need to decode it to handle spaces (e.g., "Jane%20Doe" -> "Jane Doe")
-                const nameToFetch = decodeURIComponent(params.id);
-
-                const response = await api.get(`/getFullPatientDetails?name=${nameToFetch}`);
+                const response = await api.get('/getFullPatientDetails', { params: { name: nameToFetch } });
                 setPatient(response.data);
             } catch (err) {
                 console.error("Error fetching patient:", err);
@@ -40,7 +40,37 @@ export default function PatientDashboard() {
             }
         };
 
-        fetchPatient();
+        if (typeof EventSource === 'undefined') {
+            fetchPatient();
+            return;
+        }
+
+        // Stream: structured sections render immediately, AI sections fill in as they arrive
+        const url = `${api.defaults.baseURL}/streamFullPatientDetails?name=${encodeURIComponent(nameToFetch)}`;
+        const source = new EventSource(url);
+        let received = false;
+
+        source.addEventListener('sections', (e) => {
+            received = true;
+            setPatient(JSON.parse(e.data));
+            setLoading(false);
+        });
+        source.addEventListener('cross_domain_insights', (e) => {
+            const insights = JSON.parse(e.data);
+            setPatient((prev) => ({ ...prev, cross_domain_insights: insights }));
+        });
+        source.addEventListener('ai_generated_alerts', (e) => {
+            const alerts = JSON.parse(e.data);
+            setPatient((prev) => ({ ...prev, header: { ...prev.header, ai_generated_alerts: alerts } }));
+        });
+        source.addEventListener('done', () => source.close());
+        source.onerror = () => {
+            source.close();
+            // Nothing arrived (e.g. 404 or proxy without streaming) - use the plain endpoint
+            if (!received) fetchPatient();
+        };
+
+        return () => source.close();
     }, [params.id]);
 
     if (loading) {
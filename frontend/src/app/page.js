@@ -6,45 +6,32 @@ import { Search, ArrowUpDown, Activity } from 'lucide-react';
 import api from '../utils/api';
 import clsx from 'clsx';
 
+const PAGE_SIZE = 100;
+
 export default function PatientList() {
   const [patients, setPatients] = useState([]);
-  const [filteredPatients, setFilteredPatients] = useState([]);
+  const [total, setTotal] = useState(0);
   const [loading, setLoading] = useState(true);
   const [search, setSearch] = useState('');
   const [sortConfig, setSortConfig] = useState({ key: null, direction: 'ascending' });
 
+  // Search, sort and paging run on the server; refetch the first page when they change
   useEffect(() => {
-    fetchPatients();
-  }, []);
-
-  useEffect(() => {
-    let result = [...patients];
-
-    if (search) {
-      result = result.filter((p) =>
-        p.name.toLowerCase().includes(search.toLowerCase())
-      );
-    }
+    const timer = setTimeout(() => fetchPatients(0), search ? 250 : 0);
+    return () => clearTimeout(timer);
+  }, [search, sortConfig]);
 
-    if (sortConfig.key) {
-      result.sort((a, b) => {
-        if (a[sortConfig.key] < b[sortConfig.key]) {
-          return sortConfig.direction === 'ascending' ? -1 : 1;
-        }
-        if (a[sortConfig.key] > b[sortConfig.key]) {
-          return sortConfig.direction === 'ascending' ? 1 : -1;
-        }
-        return 0;
-      });
-    }
-
-    setFilteredPatients(result);
-  }, [patients, search, sortConfig]);
-
-  const fetchPatients = async () => {
+  const fetchPatients = async (offset) => {
     try {
-      const response = await api.get('/getMinimalPatientInfo');
-      setPatients(response.data);
+      const params = { limit: PAGE_SIZE, offset };
+      if (search) params.search = search;
+      if (sortConfig.key) {
+        params.sort_by = sortConfig.key;
+        params.order = sortConfig.direction === 'ascending' ? 'asc' : 'desc';
+      }
+      const response = await api.get('/getMinimalPatientInfo', { params });
+      setPatients((prev) => (offset === 0 ? response.data : [...prev, ...response.data]));
+      setTotal(parseInt(response.headers['x-total-count'] || response.data.length, 10));
     } catch (error) {
       console.error('Failed to fetch patients:', error);
     } finally {
@@ -153,7 +140,7 @@ export default function PatientList() {
                 </tr>
               </thead>
               <tbody className="bg-white divide-y divide-slate-200">
-                {filteredPatients.map((patient) => (
+                {patients.map((patient) => (
                   <tr
                     key={patient.uid}
                     className="hover:bg-slate-50 transition-colors duration-150 cursor-pointer group"
@@ -194,11 +181,21 @@ export default function PatientList() {
               </tbody>
             </table>
           </div>
-          {filteredPatients.length === 0 && (
+          {patients.length === 0 && (
             <div className="px-6 py-12 text-center text-slate-500">
               No patients found matching your search.
             </div>
           )}
+          {patients.length < total && (
+            <div className="px-6 py-4 text-center border-t border-slate-200">
+              <button
+                onClick={() => fetchPatients(patients.length)}
+                className="text-sm font-medium text-blue-600 hover:underline"
+              >
+                Load more ({total - patients.length} remaining)
+              </button>
+            </div>
+          )}
         </div>
       </main>
     </div>